@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+壁纸查看次数聚合脚本
+- api/record_view.php 只把查看记录追加到 logs/view_spool/current.log
+- 本脚本每隔N秒领取缓冲文件（改名为 processing-*.log），等待已打开该文件的 PHP 请求写完
+  （宽限期后再获取与 record_view.php 的 LOCK_EX 相同的排他锁）才读取，按 (壁纸ID, IP, 日期) 去重
+- 与 wallpaper_views_log 已有记录比对后，批量插入新记录，并用一条 UPDATE 累加各壁纸的 views
+- 写库成功后才删除缓冲文件；中途失败时文件保留，下次重试，已入库的记录会被去重，不会重复计数
+"""
+import argparse
+import glob
+import os
+import time
+from collections import Counter
+
+import pymysql
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'wallpaper_db',
+    'charset': 'utf8mb4'
+}
+
+SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'view_spool')
+CURRENT_SPOOL = os.path.join(SPOOL_DIR, 'current.log')
+
+# 领取后等待的秒数：改名前已打开 current.log 的 PHP 请求仍会写入领取后的文件
+CLAIM_GRACE_SECONDS = 2
+
+# 聚合间隔（秒）与每批处理的记录数
+DEFAULT_INTERVAL = 60
+BATCH_SIZE = 1000
+
+
+def wait_for_writers(path):
+    """
+    等待仍在向已领取文件追加的写入完成
+    record_view.php 用 file_put_contents(FILE_APPEND | LOCK_EX) 写入：先打开文件再加锁，
+    改名前打开文件的请求会在改名后写入领取的文件。先等待宽限期让这些请求完成打开与加锁，
+    再获取同一把排他锁，拿到锁时所有写入都已结束
+    Args:
+        path (str): 已领取的缓冲文件
+    """
+    time.sleep(CLAIM_GRACE_SECONDS)
+    try:
+        with open(path, 'rb+') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    except OSError as e:
+        print(f"⚠️ 无法锁定缓冲文件 {path}: {e}")
+
+
+def claim_spool_files():
+    """
+    领取待处理的缓冲文件：把 current.log 改名为 processing-时间戳.log
+    之后的查看记录写入新的 current.log；上次失败遗留的 processing 文件一并处理
+    Returns:
+        list: 待处理文件路径
+    """
+    if os.path.exists(CURRENT_SPOOL) and os.path.getsize(CURRENT_SPOOL) > 0:
+        claimed = os.path.join(SPOOL_DIR, f"processing-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}.log")
+        try:
+            os.replace(CURRENT_SPOOL, claimed)
+            wait_for_writers(claimed)
+        except OSError as e:
+            # Windows 下文件正被写入时改名会失败，留到下一轮
+            print(f"⚠️ 缓冲文件暂时无法领取: {e}")
+    return sorted(glob.glob(os.path.join(SPOOL_DIR, 'processing-*.log')))
+
+
+def read_views(paths):
+    """
+    读取缓冲文件并按 (壁纸ID, IP, 日期) 去重
+    Args:
+        paths (list): 缓冲文件路径
+    Returns:
+        tuple: (去重后的记录集合, 原始行数)
+    """
+    views = set()
+    total = 0
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) < 3 or not parts[0].isdigit():
+                    continue
+                total += 1
+                views.add((int(parts[0]), parts[1], parts[2]))
+    return views, total
+
+
+def filter_new_views(cursor, batch):
+    """
+    去掉 wallpaper_views_log 中已存在的记录
+    Args:
+        cursor: 数据库游标
+        batch (list): [(壁纸ID, IP, 日期), ...]
+    Returns:
+        list: 尚未入库的记录
+    """
+    wallpaper_ids = sorted({view[0] for view in batch})
+    dates = sorted({view[2] for view in batch})
+    cursor.execute(
+        f"""SELECT wallpaper_id, ip_address, view_date FROM wallpaper_views_log
+            WHERE wallpaper_id IN ({','.join(['%s'] * len(wallpaper_ids))})
+              AND view_date IN ({','.join(['%s'] * len(dates))})""",
+        wallpaper_ids + dates
+    )
+    existing = {(int(row[0]), row[1], str(row[2])) for row in cursor.fetchall()}
+    return [view for view in batch if view not in existing]
+
+
+def apply_views(conn, views):
+    """
+    在一个事务内写入新查看记录并累加 views
+    Args:
+        conn: 数据库连接
+        views (set): 去重后的查看记录
+    Returns:
+        Counter: {壁纸ID: 新增查看次数}
+    """
+    deltas = Counter()
+    ordered = sorted(views)
+    with conn.cursor() as cursor:
+        for start in range(0, len(ordered), BATCH_SIZE):
+            new_views = filter_new_views(cursor, ordered[start:start + BATCH_SIZE])
+            if not new_views:
+                continue
+            cursor.executemany(
+                "INSERT IGNORE INTO wallpaper_views_log (wallpaper_id, ip_address, view_date) VALUES (%s, %s, %s)",
+                new_views
+            )
+            deltas.update(view[0] for view in new_views)
+
+        # 每批壁纸只执行一条 UPDATE，按ID顺序加锁
+        items = sorted(deltas.items())
+        for start in range(0, len(items), BATCH_SIZE):
+            batch = items[start:start + BATCH_SIZE]
+            cases = ' '.join(['WHEN %s THEN %s'] * len(batch))
+            params = [value for item in batch for value in item]
+            params += [wallpaper_id for wallpaper_id, _ in batch]
+            cursor.execute(
+                f"""UPDATE wallpapers SET views = views + CASE id {cases} ELSE 0 END
+                    WHERE id IN ({','.join(['%s'] * len(batch))})""",
+                params
+            )
+    conn.commit()
+    return deltas
+
+
+def aggregate_once():
+    """
+    执行一轮聚合
+    Returns:
+        bool: 是否成功（没有待处理记录也算成功）
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    paths = claim_spool_files()
+    if not paths:
+        return True
+
+    views, total = read_views(paths)
+    conn = None
+    try:
+        if views:
+            conn = pymysql.connect(autocommit=False, **DB_CONFIG)
+            deltas = apply_views(conn, views)
+            print(f"👀 {time.strftime('%H:%M:%S')} 读取 {total} 条查看记录，去重后 {len(views)} 条，"
+                  f"新增 {sum(deltas.values())} 次查看，涉及 {len(deltas)} 张壁纸")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"❌ 查看次数写入失败，缓冲文件保留待重试: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+    for path in paths:
+        os.remove(path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='聚合壁纸查看记录并批量写入数据库')
+    parser.add_argument('-i', '--interval', type=int, default=DEFAULT_INTERVAL,
+                        help=f'聚合间隔秒数 (默认: {DEFAULT_INTERVAL})')
+    parser.add_argument('--once', action='store_true', help='只执行一轮后退出（适合计划任务）')
+    args = parser.parse_args()
+
+    if args.once:
+        aggregate_once()
+        return
+
+    print(f"🚀 查看次数聚合已启动，每 {args.interval} 秒处理一次，Ctrl+C 退出")
+    try:
+        while True:
+            aggregate_once()
+            time.sleep(max(1, args.interval))
+    except KeyboardInterrupt:
+        print("\n👋 已停止")
+
+
+if __name__ == '__main__':
+    main()
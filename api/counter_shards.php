@@ -0,0 +1,157 @@
+<?php
+/**
+ * 点赞/收藏计数分片
+ * 每张壁纸的计数增量分散写入 wallpaper_counter_shards 的多行（随机分片），并发点赞不会争抢 wallpapers 表同一行的锁；
+ * reconcile_counters.py 定期把分片增量合并回 wallpapers.likes / wallpapers.favorites，并与原始点赞/收藏记录核对。
+ * 读取计数 = 基础值 + 该壁纸分片增量之和（主键范围扫描，最多 COUNTER_SHARD_COUNT 行）。
+ */
+
+define('COUNTER_SHARD_COUNT', 16);
+
+/**
+ * 计数名与 wallpapers 基础字段、原始记录表的对应关系
+ */
+const COUNTER_DEFINITIONS = [
+    'likes' => ['column' => 'likes', 'table' => 'wallpaper_likes'],
+    'favorites' => ['column' => 'favorites', 'table' => 'wallpaper_favorites'],
+];
+
+/**
+ * 给壁纸计数加上增量（写入随机分片）
+ * 分片表不存在时（尚未运行 reconcile_counters.py）回退为直接更新 wallpapers 表字段
+ * @param mysqli $db 数据库连接
+ * @param int $wallpaperId 壁纸ID
+ * @param string $counter 计数名（likes / favorites）
+ * @param int $delta 增量（+1 / -1）
+ * @return bool 是否写入成功
+ */
+function bumpCounterShard($db, $wallpaperId, $counter, $delta) {
+    if (!isset(COUNTER_DEFINITIONS[$counter])) {
+        return false;
+    }
+    $shard = mt_rand(0, COUNTER_SHARD_COUNT - 1);
+    try {
+        $stmt = $db->prepare(
+            "INSERT INTO wallpaper_counter_shards (wallpaper_id, counter, shard, delta) VALUES (?, ?, ?, ?)
+             ON DUPLICATE KEY UPDATE delta = delta + VALUES(delta)"
+        );
+        if ($stmt) {
+            $stmt->bind_param('isii', $wallpaperId, $counter, $shard, $delta);
+            $ok = $stmt->execute();
+            $stmt->close();
+            if ($ok) {
+                return true;
+            }
+        }
+    } catch (mysqli_sql_exception $e) {
+        if (function_exists('sendDebugLog')) {
+            sendDebugLog("计数分片写入失败，回退到直接更新: " . $e->getMessage(), 'wallpaper_debug_log.txt', 'append', 'counter_shard_fail');
+        }
+    }
+
+    // 回退：直接更新基础字段（favorites 字段可能尚未创建）
+    $column = COUNTER_DEFINITIONS[$counter]['column'];
+    try {
+        $stmt = $db->prepare("UPDATE wallpapers SET `{$column}` = GREATEST(CAST(`{$column}` AS SIGNED) + ?, 0) WHERE id = ?");
+        if (!$stmt) {
+            return false;
+        }
+        $stmt->bind_param('ii', $delta, $wallpaperId);
+        $ok = $stmt->execute();
+        $stmt->close();
+        return $ok;
+    } catch (mysqli_sql_exception $e) {
+        return false;
+    }
+}
+
+/**
+ * 读取壁纸当前计数：基础值 + 分片增量之和
+ * 分片表或基础字段不存在时回退为统计原始记录表
+ * @param mysqli $db 数据库连接
+ * @param int $wallpaperId 壁纸ID
+ * @param string $counter 计数名（likes / favorites）
+ * @return int 计数值
+ */
+function getCounterValue($db, $wallpaperId, $counter) {
+    if (!isset(COUNTER_DEFINITIONS[$counter])) {
+        return 0;
+    }
+    $column = COUNTER_DEFINITIONS[$counter]['column'];
+    try {
+        $stmt = $db->prepare(
+            "SELECT w.`{$column}` + COALESCE((
+                 SELECT SUM(s.delta) FROM wallpaper_counter_shards s
+                 WHERE s.wallpaper_id = w.id AND s.counter = ?
+             ), 0)
+             FROM wallpapers w WHERE w.id = ?"
+        );
+        if ($stmt) {
+            $stmt->bind_param('si', $counter, $wallpaperId);
+            $stmt->execute();
+            $stmt->bind_result($value);
+            $found = $stmt->fetch();
+            $stmt->close();
+            if ($found) {
+                return max(0, intval($value));
+            }
+        }
+    } catch (mysqli_sql_exception $e) {
+        // 分片表或字段缺失，走下面的回退
+    }
+
+    $table = COUNTER_DEFINITIONS[$counter]['table'];
+    $stmt = $db->prepare("SELECT COUNT(*) FROM `{$table}` WHERE wallpaper_id = ?");
+    $stmt->bind_param('i', $wallpaperId);
+    $stmt->execute();
+    $stmt->bind_result($count);
+    $stmt->fetch();
+    $stmt->close();
+    return intval($count);
+}
+
+/**
+ * 给一页壁纸的计数加上尚未合并的分片增量（列表接口只读到 wallpapers 的基础值）
+ * 只按本页ID分组汇总分片表，分片表不存在时保持基础值不变
+ * @param mysqli $db 数据库连接
+ * @param array $rows 壁纸行（含 id 和计数字段），原地修改
+ * @param string $counter 计数名（likes / favorites）
+ */
+function applyCounterShardDeltas($db, array &$rows, $counter) {
+    if (empty($rows) || !isset(COUNTER_DEFINITIONS[$counter])) {
+        return;
+    }
+    $column = COUNTER_DEFINITIONS[$counter]['column'];
+    $ids = array_values(array_unique(array_map(function ($row) { return intval($row['id']); }, $rows)));
+    $placeholders = implode(',', array_fill(0, count($ids), '?'));
+    $deltas = [];
+    try {
+        $stmt = $db->prepare(
+            "SELECT wallpaper_id, COALESCE(SUM(delta), 0) AS pending FROM wallpaper_counter_shards
+             WHERE counter = ? AND wallpaper_id IN ({$placeholders})
+             GROUP BY wallpaper_id"
+        );
+        if (!$stmt) {
+            return;
+        }
+        $stmt->bind_param('s' . str_repeat('i', count($ids)), $counter, ...$ids);
+        if ($stmt->execute()) {
+            $result = $stmt->get_result();
+            while ($row = $result->fetch_assoc()) {
+                $deltas[intval($row['wallpaper_id'])] = intval($row['pending']);
+            }
+        }
+        $stmt->close();
+    } catch (mysqli_sql_exception $e) {
+        // 分片表尚未创建，基础值即当前值
+        return;
+    }
+
+    foreach ($rows as &$row) {
+        $id = intval($row['id']);
+        if (isset($deltas[$id]) && isset($row[$column])) {
+            $row[$column] = max(0, intval($row[$column]) + $deltas[$id]);
+        }
+    }
+    unset($row);
+}
@@ -0,0 +1,40 @@
+<?php
+/**
+ * 上传后压缩版本生成队列（目录队列）
+ * 上传接口保存原图并写入数据库后，把任务以JSON文件写入 instance/derivative_queue/pending/，立即返回；
+ * derivative_worker.py 常驻轮询该目录，生成缩略图/预览图并更新 variants.json、list.json，
+ * 通常在上传后几秒内生效，上传请求本身不再等待压缩。
+ */
+
+define('DERIVATIVE_QUEUE_DIR', __DIR__ . '/../instance/derivative_queue');
+
+/**
+ * 把一张新上传的壁纸加入压缩队列
+ * 先写临时文件再改名，worker 不会读到写了一半的任务
+ * @param array $job 任务内容（wallpaper_id、file_path、title、category、width、height 等）
+ * @return bool 是否入队成功
+ */
+function enqueueDerivativeJob($job) {
+    $pendingDir = DERIVATIVE_QUEUE_DIR . '/pending';
+    if (!is_dir($pendingDir) && !@mkdir($pendingDir, 0777, true) && !is_dir($pendingDir)) {
+        return false;
+    }
+    $job['attempts'] = 0;
+    $job['enqueued_at'] = date('Y-m-d H:i:s');
+    $content = json_encode($job, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES);
+    if ($content === false) {
+        return false;
+    }
+
+    // 文件名以微秒时间戳开头，worker 按文件名排序即为入队顺序
+    $name = sprintf('%.6f', microtime(true)) . '-' . intval($job['wallpaper_id'] ?? 0) . '-' . bin2hex(random_bytes(4));
+    $tmpPath = $pendingDir . '/' . $name . '.tmp';
+    if (@file_put_contents($tmpPath, $content, LOCK_EX) === false) {
+        return false;
+    }
+    if (!@rename($tmpPath, $pendingDir . '/' . $name . '.json')) {
+        @unlink($tmpPath);
+        return false;
+    }
+    return true;
+}
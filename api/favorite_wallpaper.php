@@ -4,6 +4,8 @@ ini_set('display_errors', 0); // 关闭错误显示
 error_reporting(E_ALL & ~E_NOTICE & ~E_WARNING); // 仅报告致命错误和解析错误，忽略通知和警告
 require_once '../config.php'; // 引入数据库配置
 require_once 'utils.php'; // 引入新的日志工具文件
+require_once 'counter_shards.php';
+require_once 'user_state_cache.php';
 /**
  * @file favorite_wallpaper.php
  * @brief 收藏壁纸接口
@@ -56,6 +58,10 @@ if ($db->connect_errno) {
 $stmt = $db->prepare('INSERT IGNORE INTO wallpaper_favorites (user_id, wallpaper_id) VALUES (?, ?)');
 $stmt->bind_param('ii', $user_id, $wallpaper_id);
 if ($stmt->execute()) {
+    if ($stmt->affected_rows > 0) {
+        bumpCounterShard($db, $wallpaper_id, 'favorites', 1);
+        invalidateUserStateCache('favorites', $user_id);
+    }
     echo json_encode(['code' => 0, 'msg' => '收藏成功']);
     exit;
 } else {
@@ -32,6 +32,29 @@ if (!$conn) {
 }
 
 try {
+    // 版本号取操作日志的最大ID：每次流放/召回都会写日志，版本不变则结果不变
+    $versionResult = $conn->query("SELECT COALESCE(MAX(id), 0) AS version FROM wallpaper_operation_log");
+    $version = $versionResult ? (int)$versionResult->fetch_assoc()['version'] : 0;
+
+    // 客户端已有当前版本时直接返回304，不再读取流放列表
+    $etag = '"exiled-' . $version . '"';
+    header('ETag: ' . $etag);
+    header('Cache-Control: no-cache');
+    $ifNoneMatch = trim($_SERVER['HTTP_IF_NONE_MATCH'] ?? '');
+    if ($ifNoneMatch === $etag || $ifNoneMatch === 'W/' . $etag) {
+        http_response_code(304);
+        exit();
+    }
+
+    // 优先使用 refresh_exile_status.py 生成的版本化文件，版本落后时回退到数据库查询
+    $exiledFile = __DIR__ . '/../static/data/exiled-ids.json';
+    if (is_file($exiledFile)) {
+        $cached = json_decode(file_get_contents($exiledFile), true);
+        if (is_array($cached) && isset($cached['version'], $cached['data']) && (int)$cached['version'] === $version) {
+            sendResponse(200, '成功获取流放壁纸列表', $cached['data']);
+        }
+    }
+
     // 2024-12-19 修改：查询流放壁纸ID和时间信息，按最新流放时间排序
     $sql = "SELECT wallpaper_id, updated_at FROM wallpaper_exile_status WHERE status = 1 ORDER BY updated_at DESC";
     $result = $conn->query($sql);
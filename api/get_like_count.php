@@ -1,5 +1,6 @@
 <?php
 require_once '../config.php';
+require_once './counter_shards.php';
 header('Content-Type: application/json');
 session_start();
 
@@ -20,12 +21,8 @@ if ($db->connect_errno) {
     exit;
 }
 
-$stmt = $db->prepare('SELECT COUNT(*) FROM wallpaper_likes WHERE wallpaper_id=?');
-$stmt->bind_param('i', $wallpaper_id);
-$stmt->execute();
-$stmt->bind_result($count);
-$stmt->fetch();
-$stmt->close();
+// 基础点赞数 + 分片增量，不再对 wallpaper_likes 做 COUNT
+$count = getCounterValue($db, $wallpaper_id, 'likes');
 $db->close();
 
 echo json_encode(['code' => 0, 'count' => intval($count)]); 
\ No newline at end of file
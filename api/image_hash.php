@@ -0,0 +1,131 @@
+<?php
+/**
+ * 上传图片查重（感知哈希）
+ * 计算方式与 image_hash.py 一致：缩成 9x8 灰度图，比较相邻像素明暗得到64位 dHash（16位十六进制）。
+ * 图库哈希索引由 update_list.py / derivative_worker.py 生成到 instance/image_hash_index.json，
+ * 64位哈希切成4段（每段16位）按取值分桶：距离不超过 r 的哈希至少有一段的距离不超过 r/4，
+ * 查询时每段只探查该半径内的桶并比对桶内候选，不需要和整个图库逐一比较。
+ */
+
+define('IMAGE_HASH_INDEX_PATH', __DIR__ . '/../instance/image_hash_index.json');
+define('IMAGE_HASH_MAX_DISTANCE', 6);
+
+/**
+ * 计算图片的 dHash
+ * @param string $path 图片路径
+ * @return string|null 16位十六进制哈希，GD扩展不可用或图片无法解码时返回null
+ */
+function computeImageDhash($path) {
+    if (!function_exists('imagecreatefromstring')) {
+        return null;
+    }
+    $source = @imagecreatefromstring(file_get_contents($path));
+    if (!$source) {
+        return null;
+    }
+    // 区域平均缩放，与 Python 端 Image.BOX 的结果接近
+    $small = imagecreatetruecolor(9, 8);
+    imagecopyresampled($small, $source, 0, 0, 0, 0, 9, 8, imagesx($source), imagesy($source));
+    imagedestroy($source);
+
+    $hex = '';
+    for ($y = 0; $y < 8; $y++) {
+        $gray = [];
+        for ($x = 0; $x < 9; $x++) {
+            $rgb = imagecolorat($small, $x, $y);
+            $gray[] = ((($rgb >> 16) & 0xFF) * 299 + (($rgb >> 8) & 0xFF) * 587 + ($rgb & 0xFF) * 114) / 1000;
+        }
+        $byte = 0;
+        for ($x = 0; $x < 8; $x++) {
+            $byte = ($byte << 1) | ($gray[$x] > $gray[$x + 1] ? 1 : 0);
+        }
+        $hex .= sprintf('%02x', $byte);
+    }
+    imagedestroy($small);
+    return $hex;
+}
+
+/**
+ * 两个十六进制哈希的汉明距离（逐字节计算，避免64位整数溢出）
+ * @param string $a 哈希A
+ * @param string $b 哈希B
+ * @return int 汉明距离
+ */
+function dhashDistance($a, $b) {
+    $distance = 0;
+    for ($i = 0; $i < 16; $i += 2) {
+        $distance += substr_count(decbin(hexdec(substr($a, $i, 2)) ^ hexdec(substr($b, $i, 2))), '1');
+    }
+    return $distance;
+}
+
+/**
+ * 列出与某段取值汉明距离不超过 radius 的所有取值（含自身）
+ * @param int $part 段取值
+ * @param int $radius 段内半径
+ * @param int $bits 每段位数
+ * @return array 段取值列表
+ */
+function dhashBandNeighbors($part, $radius, $bits) {
+    $results = [$part];
+    $frontier = [[$part, -1]];
+    for ($step = 0; $step < $radius; $step++) {
+        $next = [];
+        foreach ($frontier as list($value, $lastBit)) {
+            for ($bit = $lastBit + 1; $bit < $bits; $bit++) {
+                $flipped = $value ^ (1 << $bit);
+                $results[] = $flipped;
+                $next[] = [$flipped, $bit];
+            }
+        }
+        $frontier = $next;
+    }
+    return $results;
+}
+
+/**
+ * 在图库哈希索引中查找相似壁纸
+ * @param string $hash 16位十六进制哈希
+ * @param int|null $maxDistance 最大汉明距离，默认使用索引中记录的阈值
+ * @return array 相似壁纸 [['id' => 壁纸ID, 'path' => 路径, 'distance' => 距离], ...]，按距离升序；索引不存在时为空
+ */
+function findSimilarWallpapers($hash, $maxDistance = null) {
+    if (!is_file(IMAGE_HASH_INDEX_PATH)) {
+        return [];
+    }
+    $index = json_decode(@file_get_contents(IMAGE_HASH_INDEX_PATH), true);
+    if (!is_array($index) || empty($index['bands']) || !isset($index['entries'])) {
+        return [];
+    }
+    if ($maxDistance === null) {
+        $maxDistance = intval($index['max_distance'] ?? IMAGE_HASH_MAX_DISTANCE);
+    }
+
+    $bandBits = intval($index['band_bits'] ?? 16);
+    $hexDigits = intdiv($bandBits, 4);
+    $bandRadius = intdiv($maxDistance, count($index['bands']));
+
+    $matches = [];
+    $seen = [];
+    foreach ($index['bands'] as $band => $buckets) {
+        $part = hexdec(substr($hash, $band * $hexDigits, $hexDigits));
+        foreach (dhashBandNeighbors($part, $bandRadius, $bandBits) as $neighbor) {
+            $key = sprintf('%0' . $hexDigits . 'x', $neighbor);
+            foreach ($buckets[$key] ?? [] as $id) {
+                if (isset($seen[$id]) || !isset($index['entries'][$id])) {
+                    continue;
+                }
+                $seen[$id] = true;
+                list($candidate, $path) = $index['entries'][$id];
+                $distance = dhashDistance($hash, $candidate);
+                if ($distance <= $maxDistance) {
+                    $matches[] = ['id' => intval($id), 'path' => $path, 'distance' => $distance];
+                }
+            }
+        }
+    }
+    usort($matches, function ($a, $b) {
+        return $a['distance'] - $b['distance'];
+    });
+    return $matches;
+}
@@ -4,6 +4,8 @@ ini_set('display_errors', 0); // 关闭错误显示
 error_reporting(E_ALL & ~E_NOTICE & ~E_WARNING); // 仅报告致命错误和解析错误，忽略通知和警告
 include_once '../config.php';
 include_once './write_log.php'; // 引入日志函数
+include_once './counter_shards.php';
+include_once './user_state_cache.php';
 header('Content-Type: application/json');
 
 if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
@@ -32,6 +34,11 @@ if ($db->connect_errno) {
 $stmt = $db->prepare('INSERT IGNORE INTO wallpaper_likes (ip_address, wallpaper_id) VALUES (?, ?)');
 $stmt->bind_param('si', $ip_address, $wallpaper_id);
 if ($stmt->execute()) {
+    // INSERT IGNORE 未插入（重复点赞）时不计数
+    if ($stmt->affected_rows > 0) {
+        bumpCounterShard($db, $wallpaper_id, 'likes', 1);
+        invalidateUserStateCache('likes', $ip_address);
+    }
     sendDebugLog(json_encode(['code'=>200, 'msg'=>'点赞成功', 'wallpaper_id'=>$wallpaper_id, 'ip_address'=>$ip_address]), 'wallpaper_debug_log.txt', 'append', 'like_success');
     echo json_encode(['code' => 0, 'msg' => '点赞成功']);
 } else {
@@ -0,0 +1,175 @@
+<?php
+/**
+ * 结构化日志（JSON Lines）
+ * 每条日志一行JSON：{"time", "ip", "tag", "wallpaper_id", "data", ...}，写入 logs/<日志名>.jsonl。
+ * - 请求期间只把日志放入内存缓冲，脚本结束时一次性追加写入（支持时先 fastcgi_finish_request 结束响应），不再占用请求耗时
+ * - 当前文件超过 STRUCTURED_LOG_MAX_BYTES 时改名为 <日志名>.<时间>.jsonl 轮转，最多保留 STRUCTURED_LOG_MAX_SEGMENTS 个历史分段
+ * - log_reader.py 按壁纸ID流式建立索引，供 fix_wallpaper_names.py 等脚本按ID直接查找
+ */
+
+define('STRUCTURED_LOG_DIR', __DIR__ . '/../logs/');
+define('STRUCTURED_LOG_MAX_BYTES', 5 * 1024 * 1024);
+define('STRUCTURED_LOG_MAX_SEGMENTS', 10);
+
+/**
+ * 计算日志名对应的 .jsonl 文件路径（兼容旧的 xxx.txt 日志名）
+ * @param string $logfileName 日志文件名，如 wallpaper_debug_log.txt
+ * @return string 当前日志文件路径
+ */
+function structuredLogPath($logfileName) {
+    $base = pathinfo(basename($logfileName), PATHINFO_FILENAME);
+    if ($base === '') {
+        $base = 'wallpaper_debug_log';
+    }
+    return STRUCTURED_LOG_DIR . $base . '.jsonl';
+}
+
+/**
+ * 从日志数据中提取壁纸ID，便于按ID建立索引
+ * @param mixed $data 日志数据
+ * @return int|null 壁纸ID
+ */
+function extractLogWallpaperId($data) {
+    if (!is_array($data)) {
+        return null;
+    }
+    $candidates = [
+        $data['wallpaper']['id'] ?? null,
+        $data['params']['wallpaper_id'] ?? null,
+        $data['wallpaper_id'] ?? null,
+    ];
+    foreach ($candidates as $candidate) {
+        if (is_scalar($candidate) && ctype_digit((string)$candidate)) {
+            return intval($candidate);
+        }
+    }
+    return null;
+}
+
+/**
+ * 写入一条结构化日志（进入缓冲，脚本结束时落盘）
+ * @param mixed $logContent 日志内容（数组、JSON字符串或普通字符串）
+ * @param string $logfileName 日志文件名
+ * @param string $mode 写入模式，append（追加）或 overwrite（清空后写入）
+ * @param string $tag 日志标签
+ * @param array $extra 额外字段（如 user、location、ua）
+ * @return bool 是否已加入缓冲
+ */
+function writeStructuredLog($logContent, $logfileName = 'wallpaper_debug_log.txt', $mode = 'append', $tag = '', $extra = []) {
+    $data = $logContent;
+    if (is_string($logContent) && $logContent !== '' && ($logContent[0] === '{' || $logContent[0] === '[')) {
+        $decoded = json_decode($logContent, true);
+        if (is_array($decoded)) {
+            $data = $decoded;
+        }
+    }
+
+    $record = [
+        'time' => date('Y-m-d H:i:s'),
+        'ip' => $_SERVER['REMOTE_ADDR'] ?? '',
+        'tag' => (string)$tag,
+        'wallpaper_id' => extractLogWallpaperId($data),
+        'data' => $data,
+    ];
+    foreach ($extra as $key => $value) {
+        if ($value !== '' && $value !== null) {
+            $record[$key] = $value;
+        }
+    }
+    $line = json_encode($record, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES | JSON_PARTIAL_OUTPUT_ON_ERROR);
+    if ($line === false) {
+        return false;
+    }
+
+    $path = structuredLogPath($logfileName);
+    $buffer = &structuredLogBuffer();
+    if (!isset($buffer[$path])) {
+        $buffer[$path] = ['overwrite' => false, 'lines' => []];
+    }
+    if ($mode === 'overwrite') {
+        $buffer[$path] = ['overwrite' => true, 'lines' => []];
+    }
+    $buffer[$path]['lines'][] = $line;
+
+    static $registered = false;
+    if (!$registered) {
+        register_shutdown_function('flushStructuredLogs');
+        $registered = true;
+    }
+    return true;
+}
+
+/**
+ * 日志缓冲区（按文件路径分组）
+ * @return array 缓冲区引用
+ */
+function &structuredLogBuffer() {
+    static $buffer = [];
+    return $buffer;
+}
+
+/**
+ * 脚本结束时把缓冲的日志写入文件
+ * 先结束FastCGI响应，写日志不再计入请求耗时
+ */
+function flushStructuredLogs() {
+    $buffer = &structuredLogBuffer();
+    if (empty($buffer)) {
+        return;
+    }
+    if (function_exists('fastcgi_finish_request')) {
+        fastcgi_finish_request();
+    }
+    if (!is_dir(STRUCTURED_LOG_DIR)) {
+        @mkdir(STRUCTURED_LOG_DIR, 0777, true);
+    }
+    foreach ($buffer as $path => $entry) {
+        if ($entry['overwrite']) {
+            @file_put_contents($path, implode("\n", $entry['lines']) . "\n", LOCK_EX);
+            continue;
+        }
+        rotateStructuredLog($path);
+        @file_put_contents($path, implode("\n", $entry['lines']) . "\n", FILE_APPEND | LOCK_EX);
+    }
+    $buffer = [];
+}
+
+/**
+ * 当前日志超过大小上限时改名轮转，并删除超出保留数量的最旧分段
+ * @param string $path 当前日志文件路径
+ */
+function rotateStructuredLog($path) {
+    clearstatcache(true, $path);
+    if (!is_file($path) || filesize($path) < STRUCTURED_LOG_MAX_BYTES) {
+        return;
+    }
+    $base = substr($path, 0, -strlen('.jsonl'));
+    $segment = $base . '.' . date('YmdHis') . '.jsonl';
+    for ($i = 1; file_exists($segment); $i++) {
+        $segment = $base . '.' . date('YmdHis') . '-' . $i . '.jsonl';
+    }
+    // 并发请求可能同时触发轮转，改名失败说明已被其他请求处理
+    if (!@rename($path, $segment)) {
+        return;
+    }
+    $segments = glob($base . '.[0-9]*.jsonl*') ?: [];
+    sort($segments);
+    while (count($segments) > STRUCTURED_LOG_MAX_SEGMENTS) {
+        @unlink(array_shift($segments));
+    }
+}
+
+/**
+ * 清空日志：删除当前文件和所有历史分段
+ * @param string $logfileName 日志文件名
+ * @return string 当前日志文件路径
+ */
+function clearStructuredLog($logfileName) {
+    $path = structuredLogPath($logfileName);
+    $base = substr($path, 0, -strlen('.jsonl'));
+    foreach (glob($base . '.[0-9]*.jsonl*') ?: [] as $segment) {
+        @unlink($segment);
+    }
+    @file_put_contents($path, '', LOCK_EX);
+    return $path;
+}
@@ -3,6 +3,8 @@ ob_start(); // 2024-07-26 新增：启动输出缓冲
 session_start();
 require_once '../config.php';
 require_once './write_log.php';
+require_once './counter_shards.php';
+require_once './user_state_cache.php';
 header('Content-Type: application/json');
 ob_clean(); // 2024-07-26 新增：清除之前的所有输出
 
@@ -57,6 +59,10 @@ if ($count > 0) {
     $stmt_delete = $db->prepare('DELETE FROM wallpaper_favorites WHERE user_id = ? AND wallpaper_id = ?');
     $stmt_delete->bind_param('ii', $user_id, $wallpaper_id);
     if ($stmt_delete->execute()) {
+        if ($stmt_delete->affected_rows > 0) {
+            bumpCounterShard($db, $wallpaper_id, 'favorites', -1);
+            invalidateUserStateCache('favorites', $user_id);
+        }
         sendDebugLog("取消收藏成功: user_id={$user_id}, wallpaper_id={$wallpaper_id}", 'favorite_debug_log.txt', 'append', 'unfavorite_success');
         echo json_encode(['code' => 0, 'msg' => '取消收藏成功', 'action' => 'unfavorited']);
     } else {
@@ -69,6 +75,8 @@ if ($count > 0) {
     $stmt_insert = $db->prepare('INSERT INTO wallpaper_favorites (user_id, wallpaper_id) VALUES (?, ?)');
     $stmt_insert->bind_param('ii', $user_id, $wallpaper_id);
     if ($stmt_insert->execute()) {
+        bumpCounterShard($db, $wallpaper_id, 'favorites', 1);
+        invalidateUserStateCache('favorites', $user_id);
         sendDebugLog("收藏成功: user_id={$user_id}, wallpaper_id={$wallpaper_id}", 'favorite_debug_log.txt', 'append', 'favorite_success');
         echo json_encode(['code' => 0, 'msg' => '收藏成功', 'action' => 'favorited']);
     } else {
@@ -4,6 +4,8 @@ ob_start(); // 2024-07-26 新增：启动输出缓冲
 session_start();
 require_once __DIR__ . '/../config.php';
 require_once __DIR__ . '/write_log.php';
+require_once __DIR__ . '/counter_shards.php';
+require_once __DIR__ . '/user_state_cache.php';
 header('Content-Type: application/json');
 
 if (!isset($_SERVER['REQUEST_METHOD']) || $_SERVER['REQUEST_METHOD'] !== 'POST') { // 2024-07-26 修复：处理 REQUEST_METHOD 未定义警告
@@ -55,11 +57,11 @@ if ($count > 0) {
     $stmt_delete->bind_param('ss', $ip_address, $wallpaper_id);
     if ($stmt_delete->execute()) {
         $action_performed = 'unliked';
-        // 2024-07-26 新增：更新壁纸点赞数
-        $stmt_update_wallpaper = $db->prepare('UPDATE wallpapers SET likes = likes - 1 WHERE id = ?');
-        $stmt_update_wallpaper->bind_param('s', $wallpaper_id);
-        $stmt_update_wallpaper->execute();
-        $stmt_update_wallpaper->close();
+        // 更新壁纸点赞数：写入计数分片，避免并发点赞争抢 wallpapers 同一行
+        if ($stmt_delete->affected_rows > 0) {
+            bumpCounterShard($db, intval($wallpaper_id), 'likes', -1);
+            invalidateUserStateCache('likes', $ip_address);
+        }
 
         sendDebugLog("取消点赞成功: ip_address={$ip_address}, wallpaper_id={$wallpaper_id}", 'like_debug_log.txt', 'append', 'unlike_success');
         ob_clean(); // 2024-07-26 优化：确保在输出前清除所有缓冲内容
@@ -76,11 +78,11 @@ if ($count > 0) {
     $stmt_insert->bind_param('ss', $ip_address, $wallpaper_id);
     if ($stmt_insert->execute()) {
         $action_performed = 'liked';
-        // 2024-07-26 新增：更新壁纸点赞数
-        $stmt_update_wallpaper = $db->prepare('UPDATE wallpapers SET likes = likes + 1 WHERE id = ?');
-        $stmt_update_wallpaper->bind_param('s', $wallpaper_id);
-        $stmt_update_wallpaper->execute();
-        $stmt_update_wallpaper->close();
+        // 更新壁纸点赞数：写入计数分片，避免并发点赞争抢 wallpapers 同一行
+        if ($stmt_insert->affected_rows > 0) {
+            bumpCounterShard($db, intval($wallpaper_id), 'likes', 1);
+            invalidateUserStateCache('likes', $ip_address);
+        }
 
         sendDebugLog("点赞成功: ip_address={$ip_address}, wallpaper_id={$wallpaper_id}", 'like_debug_log.txt', 'append', 'like_success');
         ob_clean(); // 2024-07-26 优化：确保在输出前清除所有缓冲内容
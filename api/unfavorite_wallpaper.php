@@ -4,6 +4,8 @@ ini_set('display_errors', 0);
 error_reporting(E_ALL & ~E_NOTICE & ~E_WARNING);
 require_once '../config.php'; // 引入数据库配置
 require_once 'utils.php';
+require_once 'counter_shards.php';
+require_once 'user_state_cache.php';
 header('Content-Type: application/json');
 
 if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
@@ -37,6 +39,10 @@ if ($db->connect_errno) {
 $stmt = $db->prepare('DELETE FROM wallpaper_favorites WHERE user_id = ? AND wallpaper_id = ?');
 $stmt->bind_param('ii', $user_id, $wallpaper_id);
 if ($stmt->execute()) {
+    if ($stmt->affected_rows > 0) {
+        bumpCounterShard($db, $wallpaper_id, 'favorites', -1);
+        invalidateUserStateCache('favorites', $user_id);
+    }
     echo json_encode(['code' => 0, 'msg' => '取消收藏成功']);
     exit;
 } else {
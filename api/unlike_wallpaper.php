@@ -3,6 +3,8 @@ session_start();
 ini_set('display_errors', 0);
 error_reporting(E_ALL & ~E_NOTICE & ~E_WARNING);
 include_once '../config.php';
+include_once './counter_shards.php';
+include_once './user_state_cache.php';
 header('Content-Type: application/json');
 
 if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
@@ -31,6 +33,10 @@ if ($db->connect_errno) {
 $stmt = $db->prepare('DELETE FROM wallpaper_likes WHERE ip_address = ? AND wallpaper_id = ?');
 $stmt->bind_param('si', $ip_address, $wallpaper_id);
 if ($stmt->execute()) {
+    if ($stmt->affected_rows > 0) {
+        bumpCounterShard($db, $wallpaper_id, 'likes', -1);
+        invalidateUserStateCache('likes', $ip_address);
+    }
     echo json_encode(['code' => 0, 'msg' => '取消点赞成功']);
     exit;
 } else {
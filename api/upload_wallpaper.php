@@ -18,6 +18,8 @@ if ($_SERVER['REQUEST_METHOD'] === 'OPTIONS') {
 
 // 引入数据库连接
 require_once '../config/database.php';
+require_once 'derivative_queue.php';
+require_once 'image_hash.php';
 
 // 启动session
 session_start();
@@ -93,6 +95,14 @@ function generateSafeFileName($originalName) {
     return $timestamp . '_' . $randomString . '.' . $extension;
 }
 
+/**
+ * wallpapers 表是否已有 phash 字段
+ */
+function hasPhashColumn($conn) {
+    $result = $conn->query("SHOW COLUMNS FROM wallpapers LIKE 'phash'");
+    return $result && $result->num_rows > 0;
+}
+
 /**
  * 处理壁纸上传
  */
@@ -126,6 +136,24 @@ function handleWallpaperUpload() {
             sendResponse(400, $validationError);
         }
         
+        // 感知哈希查重：图库中已有相同或高度相似的壁纸时返回409和相似壁纸，
+        // 用户确认不是重复后带 force=1 重新提交即可上传
+        $force = !empty($_POST['force']);
+        $dhash = computeImageDhash($file['tmp_name']);
+        if ($dhash !== null) {
+            $similar = findSimilarWallpapers($dhash);
+            if (!empty($similar)) {
+                if (!$force) {
+                    logMessage("重复上传已拒绝: 与壁纸 {$similar[0]['id']} 相似 (汉明距离 {$similar[0]['distance']})");
+                    sendResponse(409, '图库中已有相同或高度相似的壁纸，确认上传请带 force=1 重新提交', [
+                        'duplicate_of' => $similar[0],
+                        'similar' => $similar
+                    ]);
+                }
+                logMessage("疑似重复上传已放行(force): 与壁纸 {$similar[0]['id']} 相似 (汉明距离 {$similar[0]['distance']})");
+            }
+        }
+        
         // 获取表单数据
         $title = isset($_POST['title']) ? trim($_POST['title']) : '';
         $description = isset($_POST['description']) ? trim($_POST['description']) : '';
@@ -166,31 +194,66 @@ function handleWallpaperUpload() {
         $tagsArray = array_filter(array_map('trim', explode(',', $tags)));
         $tagsString = implode(',', $tagsArray);
         
-        // 保存到数据库
-        $stmt = $conn->prepare("
-            INSERT INTO wallpapers 
-            (user_id, title, description, file_path, file_size, width, height, category, tags, created_at) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NOW())
-        ");
-        
+        // 保存到数据库；有 phash 字段时（update_list.py 首次入库时添加）一并写入感知哈希，
+        // 十六进制 dHash 由 MySQL CONV 转成无符号整数，避免超出PHP整数范围
         $relativePath = 'static/wallpapers/' . $fileName;
-        $stmt->bind_param(
-            'issiisiss',
-            $userId,
-            $title,
-            $description,
-            $relativePath,
-            $file['size'],
-            $width,
-            $height,
-            $category,
-            $tagsString
-        );
+        if ($dhash !== null && hasPhashColumn($conn)) {
+            $stmt = $conn->prepare("
+                INSERT INTO wallpapers 
+                (user_id, title, description, file_path, file_size, width, height, category, tags, phash, created_at) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CONV(?, 16, 10), NOW())
+            ");
+            $stmt->bind_param(
+                'isssiiisss',
+                $userId,
+                $title,
+                $description,
+                $relativePath,
+                $file['size'],
+                $width,
+                $height,
+                $category,
+                $tagsString,
+                $dhash
+            );
+        } else {
+            $stmt = $conn->prepare("
+                INSERT INTO wallpapers 
+                (user_id, title, description, file_path, file_size, width, height, category, tags, created_at) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, NOW())
+            ");
+            $stmt->bind_param(
+                'isssiiiss',
+                $userId,
+                $title,
+                $description,
+                $relativePath,
+                $file['size'],
+                $width,
+                $height,
+                $category,
+                $tagsString
+            );
+        }
         
         if ($stmt->execute()) {
             $wallpaperId = $conn->insert_id;
             logMessage("壁纸保存成功: ID {$wallpaperId}");
             
+            // 缩略图/预览图交给 derivative_worker.py 异步生成，不阻塞上传请求
+            $queued = enqueueDerivativeJob([
+                'wallpaper_id' => $wallpaperId,
+                'file_path' => $relativePath,
+                'title' => $title,
+                'category' => $category,
+                'width' => $width,
+                'height' => $height,
+                'file_size' => $file['size']
+            ]);
+            if (!$queued) {
+                logMessage("压缩任务入队失败: ID {$wallpaperId}，需手动运行 compress_wallpapers.py");
+            }
+            
             sendResponse(200, '壁纸上传成功', [
                 'wallpaper_id' => $wallpaperId,
                 'file_path' => $relativePath,
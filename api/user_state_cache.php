@@ -0,0 +1,68 @@
+<?php
+/**
+ * 重度用户的点赞/收藏集合缓存
+ * precompute_user_states.py 为点赞/收藏数量较多的用户预先生成 instance/user_states/<类型>-<标识哈希>.json，
+ * wallpaper_states.php 命中缓存时直接做集合查找，不再对大表做 EXISTS 查询；
+ * 点赞/收藏状态变化时由对应接口删除该用户的缓存文件，下次预计算前回退到数据库查询。
+ * 预计算读取数据库之后、写入缓存之前发生的变化不会被删除操作覆盖，因此变化时还会写入 <类型>-<标识哈希>.changed
+ * 记录变化时间；缓存的快照时间（snapshot_at，读取数据库之前记录）不晚于该时间时视为过期，不使用。
+ */
+
+define('USER_STATE_CACHE_DIR', __DIR__ . '/../instance/user_states');
+
+/**
+ * 计算用户状态缓存文件路径
+ * @param string $kind 类型（likes 按IP，favorites 按用户ID）
+ * @param string|int $owner 用户标识
+ * @return string 缓存文件路径
+ */
+function userStateCachePath($kind, $owner) {
+    return USER_STATE_CACHE_DIR . '/' . $kind . '-' . sha1((string)$owner) . '.json';
+}
+
+/**
+ * 计算用户最近一次点赞/收藏变化时间的标记文件路径
+ * @param string $kind 类型（likes / favorites）
+ * @param string|int $owner 用户标识
+ * @return string 标记文件路径
+ */
+function userStateChangePath($kind, $owner) {
+    return USER_STATE_CACHE_DIR . '/' . $kind . '-' . sha1((string)$owner) . '.changed';
+}
+
+/**
+ * 读取用户状态缓存
+ * @param string $kind 类型（likes / favorites）
+ * @param string|int $owner 用户标识
+ * @return array|null 以壁纸ID为键的集合，没有缓存或缓存早于用户最近一次变化时返回null
+ */
+function loadUserStateCache($kind, $owner) {
+    $path = userStateCachePath($kind, $owner);
+    if (!is_file($path)) {
+        return null;
+    }
+    $cache = json_decode(@file_get_contents($path), true);
+    if (!is_array($cache) || !isset($cache['ids']) || !is_array($cache['ids']) || !isset($cache['snapshot_at'])) {
+        return null;
+    }
+    $changePath = userStateChangePath($kind, $owner);
+    if (is_file($changePath) && floatval(@file_get_contents($changePath)) >= floatval($cache['snapshot_at'])) {
+        return null;
+    }
+    return array_flip(array_map('intval', $cache['ids']));
+}
+
+/**
+ * 删除用户状态缓存并记录变化时间（点赞/收藏状态变化后调用）
+ * @param string $kind 类型（likes / favorites）
+ * @param string|int $owner 用户标识
+ */
+function invalidateUserStateCache($kind, $owner) {
+    if (is_dir(USER_STATE_CACHE_DIR)) {
+        @file_put_contents(userStateChangePath($kind, $owner), sprintf('%.6F', microtime(true)), LOCK_EX);
+    }
+    $path = userStateCachePath($kind, $owner);
+    if (is_file($path)) {
+        @unlink($path);
+    }
+}
@@ -1,43 +1,22 @@
 <?php
 // 2024-07-31 清理文件以移除潜在的BOM或多余空白字符
 
+require_once __DIR__ . '/structured_log.php';
+
 /**
  * PHP 后端专用的调试日志记录函数
- * 将调试信息写入指定的日志文件。
+ * 以 JSON Lines 格式写入 logs/ 下对应的 .jsonl 文件（缓冲到脚本结束时落盘，见 structured_log.php）。
  *
- * @param mixed $log_data 任何要记录的数据，会被转换为 JSON 字符串
- * @param string $log_file 日志文件名，默认为 'debug.log'
+ * @param mixed $log_data 任何要记录的数据
+ * @param string $log_file 日志文件名，默认为 'wallpaper_debug_log.txt'（实际写入同名 .jsonl）
  * @param string $mode 写入模式，'append'（追加）或 'overwrite'（覆盖），默认为追加
  * @param string $tag 日志标签，用于分类和过滤日志
  */
 function sendDebugLog($log_data, $log_file = 'wallpaper_debug_log.txt', $mode = 'append', $tag = 'debug') {
-    $log_dir = __DIR__ . '/../logs/'; // 日志文件存储在 htdocs/logs/ 目录下
-    if (!is_dir($log_dir)) {
-        mkdir($log_dir, 0777, true);
-    }
-    $filepath = $log_dir . $log_file;
-
-    $timestamp = date('Y-m-d H:i:s');
-    $ip = $_SERVER['REMOTE_ADDR'] ?? 'UNKNOWN_IP';
-    $userAgent = $_SERVER['HTTP_USER_AGENT'] ?? 'UNKNOWN_UA';
-    $referer = $_SERVER['HTTP_REFERER'] ?? 'UNKNOWN_REFERER';
-
-    // 尝试将数据编码为 JSON，如果失败则直接使用 var_export
-    $log_content = json_encode($log_data, JSON_UNESCAPED_UNICODE | JSON_PRETTY_PRINT);
-    if (json_last_error() !== JSON_ERROR_NONE) {
-        $log_content = var_export($log_data, true); // Fallback for non-JSON serializable data
-    }
-
-    $log_entry = sprintf(
-        "==== [%s] [ip:%s] [ua:%s] [referer:%s] [tag:%s] %s ====\n",
-        $timestamp, $ip, $userAgent, $referer, $tag, $log_content
-    );
-
-    if ($mode === 'overwrite') {
-        file_put_contents($filepath, $log_entry, LOCK_EX);
-    } else {
-        file_put_contents($filepath, $log_entry, FILE_APPEND | LOCK_EX);
-    }
+    writeStructuredLog($log_data, is_string($log_file) ? $log_file : 'wallpaper_debug_log.txt', $mode, $tag, [
+        'ua' => $_SERVER['HTTP_USER_AGENT'] ?? '',
+        'referer' => $_SERVER['HTTP_REFERER'] ?? '',
+    ]);
 }
 
 /**
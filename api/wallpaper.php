@@ -12,6 +12,17 @@ ini_set('display_startup_errors', 1);
 
 require_once '../config/database.php';
 require_once 'utils.php'; // 引入utils.php，用于sendDebugLog等工具函数
+require_once 'counter_shards.php'; // 列表中的点赞数需加上未合并的分片增量
+
+// 预生成的随机排列数量，需与 update_list.py 中 RANDOM_INDEX_SLOTS 保持一致
+define('RANDOM_INDEX_SLOTS', 8);
+
+// 排序索引不可用时SQL查询使用的排序，与 update_list.py 的 SORT_ORDERS 一致
+const SORT_ORDER_SQL = [
+    'newest' => 'w.created_at DESC, w.id DESC',
+    'most_viewed' => 'w.views DESC, w.id DESC',
+    'most_liked' => 'w.likes DESC, w.id DESC',
+];
 
 // 设置响应头
 header('Content-Type: application/json');
@@ -128,6 +139,44 @@ function handleListWallpapers() {
     // 流放列表对所有用户可见，但操作权限仍受限制
     // 这里不再检查查看权限，让所有用户都能查看流放列表
 
+    // 传入 cursor 参数（首页为空字符串）时使用游标分页，返回 next_cursor
+    $cursorMode = isset($_GET['cursor']);
+    $cursor = $cursorMode ? decodeCursor($_GET['cursor']) : null;
+    if ($cursorMode && $cursor === false) {
+        sendResponse(400, '无效的分页游标');
+    }
+
+    // 预计算排序索引：正常模式下按指定排序翻页时，直接按偏移截取ID，避免整表排序
+    // 未指定排序时使用会话种子对应的预生成随机排列，同一会话翻页顺序稳定、不重复
+    // 索引生成后有新增、流放、召回或删除的壁纸时索引已过期，回退到下面的SQL查询，新壁纸立即可见
+    $sort = isset($_GET['sort']) ? $_GET['sort'] : '';
+    $randomSeed = getRandomSeed();
+    if ($displayMode === 'normal') {
+        if ($sort === '' || $sort === 'random') {
+            $sortIndex = loadRandomOrder($randomSeed, $category);
+        } else {
+            $sortIndex = loadSortIndex($sort, $category);
+        }
+        if ($sortIndex !== null && isSortIndexCurrent($conn)) {
+            $visibleTotal = countVisibleWallpapers($conn, $category);
+            if ($visibleTotal === $sortIndex['count']) {
+                if ($cursorMode) {
+                    $offset = resolveIndexCursor($sortIndex, $cursor);
+                }
+                listWallpapersByIds($conn, $sortIndex, $limit, $offset, $cursorMode, $visibleTotal);
+                closeDBConnection($conn);
+                return;
+            }
+        }
+    }
+
+    // 游标分页：按 (created_at, id) 定位下一页，不使用OFFSET，深页与首页代价相同
+    if ($cursorMode) {
+        listWallpapersByCursor($conn, $displayMode, $category, $limit, $cursor);
+        closeDBConnection($conn);
+        return;
+    }
+
     // 构建查询基础
     $sql = "SELECT w.id, w.title, w.file_path, w.width, w.height, w.category, w.likes, w.views FROM wallpapers w";
     $countSql = "SELECT COUNT(*) FROM wallpapers w";
@@ -135,17 +184,12 @@ function handleListWallpapers() {
     $params = [];
     $types = "";
 
-    // 联查 wallpaper_exile_status 表
-    $sql .= " LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id";
-    $countSql .= " LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id";
-
-    // 根据 display_mode 添加过滤条件
-    if ($displayMode === 'normal') {
-        // 正常模式：显示未流放的壁纸 (wes.status = 0 或 不存在于wes表)
-        $whereClauses[] = "(wes.status = 0 OR wes.wallpaper_id IS NULL)";
-    } elseif ($displayMode === 'exiled_list') {
-        // 流放列表模式：只显示已流放的壁纸 (wes.status = 1)
-        $whereClauses[] = "wes.status = 1";
+    // 根据 display_mode 添加过滤条件（有 is_visible 字段时不再联查 wallpaper_exile_status 表）
+    list($visibilityJoin, $visibilityWhere) = buildVisibilityFilter($conn, $displayMode);
+    $sql .= $visibilityJoin;
+    $countSql .= $visibilityJoin;
+    if ($visibilityWhere !== null) {
+        $whereClauses[] = $visibilityWhere;
     }
 
     // 处理分类过滤
@@ -162,9 +206,12 @@ function handleListWallpapers() {
     }
 
     // 添加排序
-    if ($displayMode === 'normal') {
-        // 正常模式下，进行随机排序
-        $sql .= " ORDER BY RAND()";
+    if ($displayMode === 'normal' && isset(SORT_ORDER_SQL[$sort])) {
+        // 排序索引不可用或已过期时按同样的排序方式查询
+        $sql .= " ORDER BY " . SORT_ORDER_SQL[$sort];
+    } elseif ($displayMode === 'normal') {
+        // 正常模式下，没有预生成索引时按会话种子随机排序，保证翻页顺序一致
+        $sql .= " ORDER BY RAND(" . intval($randomSeed) . ")";
     } elseif ($displayMode === 'exiled_list') {
         // 流放列表按创建时间倒序
         $sql .= " ORDER BY w.created_at DESC";
@@ -216,6 +263,7 @@ function handleListWallpapers() {
             $row['file_path'] = str_replace('../', '', $row['file_path']);
             $wallpapers[] = $row;
         }
+        applyCounterShardDeltas($conn, $wallpapers, 'likes');
 
         sendResponse(200, '成功获取壁纸列表', [
             'total' => $total,
@@ -229,6 +277,460 @@ function handleListWallpapers() {
     closeDBConnection($conn);
 }
 
+/**
+ * 打开 update_list.py 生成的二进制排序索引（小端 int64 壁纸ID序列）
+ * 只读取文件大小，翻页时按偏移读取一页ID，不解析整个列表
+ * @param string $sort 排序方式（newest / most_viewed / most_liked / random-N）
+ * @param string $category 分类，空或"全部"表示全部分类
+ * @return array|null 索引句柄 ['path', 'count', 'start']，索引不存在或排序方式不支持时返回null
+ */
+function loadSortIndex($sort, $category) {
+    if (!preg_match('/^[a-z0-9_-]+$/', $sort)) {
+        return null;
+    }
+    $indexDir = __DIR__ . '/../static/data/indexes/' . $sort;
+    if (!is_dir($indexDir)) {
+        return null;
+    }
+    $name = (empty($category) || $category === '全部') ? 'all' : md5($category);
+    $indexFile = $indexDir . '/' . $name . '.bin';
+    if (!is_file($indexFile)) {
+        // 该分类下没有壁纸
+        return ['path' => null, 'count' => 0, 'start' => 0];
+    }
+    $size = filesize($indexFile);
+    if ($size === false || $size % 8 !== 0) {
+        sendDebugLog("排序索引无效: {$indexFile}", 'wallpaper_debug_log.txt', 'append');
+        return null;
+    }
+    return ['path' => $indexFile, 'count' => intdiv($size, 8), 'start' => 0];
+}
+
+/**
+ * 判断排序索引是否仍与数据库一致
+ * update_list.py 生成索引时在 indexes/meta.json 记录最大壁纸ID和最大操作日志ID；
+ * 之后上传的壁纸ID更大，流放/召回会写入操作日志，任一项变大说明索引已落后
+ * @param mysqli $conn 数据库连接
+ * @return bool 索引是否可用
+ */
+function isSortIndexCurrent($conn) {
+    static $current = null;
+    if ($current !== null) {
+        return $current;
+    }
+    $current = false;
+    $meta = json_decode(@file_get_contents(__DIR__ . '/../static/data/indexes/meta.json'), true);
+    if (!is_array($meta) || !isset($meta['max_wallpaper_id'], $meta['max_log_id'])) {
+        return $current;
+    }
+    try {
+        $result = $conn->query("SELECT COALESCE(MAX(id), 0) FROM wallpapers");
+        $maxWallpaperId = $result ? intval($result->fetch_row()[0]) : PHP_INT_MAX;
+        $result = $conn->query("SELECT COALESCE(MAX(id), 0) FROM wallpaper_operation_log");
+        $maxLogId = $result ? intval($result->fetch_row()[0]) : 0;
+    } catch (mysqli_sql_exception $e) {
+        return $current;
+    }
+    $current = $maxWallpaperId <= intval($meta['max_wallpaper_id']) && $maxLogId <= intval($meta['max_log_id']);
+    return $current;
+}
+
+/**
+ * 统计正常模式下可见的壁纸数量
+ * 用作列表总数，并与排序索引的条数比对：不一致说明索引生成后有壁纸被删除或变更分类
+ * @param mysqli $conn 数据库连接
+ * @param string $category 分类，空或"全部"表示全部分类
+ * @return int|null 数量，查询失败时返回null
+ */
+function countVisibleWallpapers($conn, $category) {
+    list($visibilityJoin, $visibilityWhere) = buildVisibilityFilter($conn, 'normal');
+    $sql = "SELECT COUNT(*) FROM wallpapers w" . $visibilityJoin . " WHERE " . $visibilityWhere;
+    $byCategory = !empty($category) && $category !== '全部';
+    if ($byCategory) {
+        $sql .= " AND w.category = ?";
+    }
+    $stmt = $conn->prepare($sql);
+    if (!$stmt) {
+        return null;
+    }
+    if ($byCategory) {
+        $stmt->bind_param('s', $category);
+    }
+    $stmt->execute();
+    $stmt->bind_result($total);
+    $stmt->fetch();
+    $stmt->close();
+    return intval($total);
+}
+
+/**
+ * 按位置读取排序索引中的一段ID（位置相对旋转起点，超过末尾时从头接续）
+ * @param array $sortIndex loadSortIndex 返回的索引句柄
+ * @param int $offset 起始位置
+ * @param int $limit 数量
+ * @return array 壁纸ID列表
+ */
+function readSortIndexIds($sortIndex, $offset, $limit) {
+    $count = $sortIndex['count'];
+    $offset = max(0, $offset);
+    $limit = min(max(0, $limit), $count - $offset);
+    if ($limit <= 0) {
+        return [];
+    }
+    $handle = fopen($sortIndex['path'], 'rb');
+    if (!$handle) {
+        return [];
+    }
+    $ids = [];
+    $position = ($sortIndex['start'] + $offset) % $count;
+    while ($limit > 0) {
+        $length = min($limit, $count - $position);
+        fseek($handle, $position * 8);
+        $ids = array_merge($ids, array_values(unpack('P' . $length, fread($handle, $length * 8))));
+        $limit -= $length;
+        $position = 0;
+    }
+    fclose($handle);
+    return $ids;
+}
+
+/**
+ * 随机排列的排序键，需与 update_list.py 中 random_order_key 一致
+ * @param int $slot 排列编号
+ * @param int $wallpaperId 壁纸ID
+ * @return string 32位十六进制MD5
+ */
+function randomOrderKey($slot, $wallpaperId) {
+    return md5($slot . '-' . $wallpaperId);
+}
+
+/**
+ * 获取当前会话的随机排序种子
+ * 请求参数 seed 可指定新种子（例如前端刷新时换一批），否则沿用会话中的种子，首次访问时生成
+ * @return int 随机种子
+ */
+function getRandomSeed() {
+    if (isset($_GET['seed']) && ctype_digit((string)$_GET['seed'])) {
+        $_SESSION['random_seed'] = intval($_GET['seed']);
+    } elseif (!isset($_SESSION['random_seed'])) {
+        $_SESSION['random_seed'] = mt_rand(1, 2147483647);
+    }
+    return $_SESSION['random_seed'];
+}
+
+/**
+ * 按种子选择预生成的随机排列，并把起点旋转到种子对应的位置
+ * 排列按 randomOrderKey 升序排列，起点取第一个排序键不小于种子键的壁纸（二分查找，只读取约 log2(N) 个ID），
+ * 索引重新生成后起点壁纸不变，同一会话继续翻页不会整体错乱
+ * @param int $seed 随机种子
+ * @param string $category 分类，空或"全部"表示全部分类
+ * @return array|null 索引句柄，随机排列文件不存在时返回null
+ */
+function loadRandomOrder($seed, $category) {
+    $slot = $seed % RANDOM_INDEX_SLOTS;
+    $sortIndex = loadSortIndex('random-' . $slot, $category);
+    if ($sortIndex === null || $sortIndex['count'] < 2) {
+        return $sortIndex;
+    }
+    $seedKey = md5('seed-' . intdiv($seed, RANDOM_INDEX_SLOTS));
+    $low = 0;
+    $high = $sortIndex['count'];
+    while ($low < $high) {
+        $middle = intdiv($low + $high, 2);
+        $ids = readSortIndexIds($sortIndex, $middle, 1);
+        if (empty($ids)) {
+            return $sortIndex;
+        }
+        if (strcmp(randomOrderKey($slot, $ids[0]), $seedKey) < 0) {
+            $low = $middle + 1;
+        } else {
+            $high = $middle;
+        }
+    }
+    $sortIndex['start'] = $low % $sortIndex['count'];
+    return $sortIndex;
+}
+
+/**
+ * 按排序索引中的一页ID查询壁纸并输出列表
+ * @param mysqli $conn 数据库连接
+ * @param array $sortIndex loadSortIndex / loadRandomOrder 返回的索引句柄
+ * @param int $limit 每页数量
+ * @param int $offset 偏移量
+ * @param bool $withCursor 是否在结果中返回 next_cursor
+ * @param int|null $total 经可见性过滤后的总数，为null时使用索引条数
+ */
+function listWallpapersByIds($conn, $sortIndex, $limit, $offset, $withCursor = false, $total = null) {
+    $pageIds = array_map('intval', readSortIndexIds($sortIndex, $offset, $limit));
+    $wallpapers = [];
+
+    if (!empty($pageIds)) {
+        // 索引生成后可能有壁纸被流放，这里仍然过滤一次流放状态
+        $placeholders = implode(',', array_fill(0, count($pageIds), '?'));
+        list($visibilityJoin, $visibilityWhere) = buildVisibilityFilter($conn, 'normal');
+        $sql = "SELECT w.id, w.title, w.file_path, w.width, w.height, w.category, w.likes, w.views FROM wallpapers w"
+             . $visibilityJoin
+             . " WHERE w.id IN ({$placeholders}) AND {$visibilityWhere}";
+        $stmt = $conn->prepare($sql);
+        $stmt->bind_param(str_repeat('i', count($pageIds)), ...$pageIds);
+        if (!$stmt->execute()) {
+            sendResponse(500, '获取壁纸列表失败: ' . $stmt->error);
+        }
+        $result = $stmt->get_result();
+        $rowsById = [];
+        while ($row = $result->fetch_assoc()) {
+            $row['file_path'] = str_replace('../', '', $row['file_path']);
+            $rowsById[$row['id']] = $row;
+        }
+        $stmt->close();
+
+        // 按索引顺序输出，IN查询本身不保证顺序
+        foreach ($pageIds as $id) {
+            if (isset($rowsById[$id])) {
+                $wallpapers[] = $rowsById[$id];
+            }
+        }
+        applyCounterShardDeltas($conn, $wallpapers, 'likes');
+    }
+
+    $data = [
+        'total' => $total !== null ? $total : $sortIndex['count'],
+        'wallpapers' => $wallpapers
+    ];
+    if ($withCursor) {
+        $nextOffset = max(0, $offset) + count($pageIds);
+        $data['next_cursor'] = ($nextOffset < $sortIndex['count'] && !empty($pageIds))
+            ? encodeCursor($nextOffset, end($pageIds))
+            : null;
+    }
+    sendResponse(200, '成功获取壁纸列表', $data);
+}
+
+/**
+ * 判断 wallpapers 表是否已有物化的可见性字段 is_visible（由 refresh_exile_status.py 添加并维护）
+ * @param mysqli $conn 数据库连接
+ * @return bool 是否存在
+ */
+function hasVisibilityFlag($conn) {
+    static $hasFlag = null;
+    if ($hasFlag === null) {
+        $result = $conn->query("SHOW COLUMNS FROM wallpapers LIKE 'is_visible'");
+        $hasFlag = $result && $result->num_rows > 0;
+    }
+    return $hasFlag;
+}
+
+/**
+ * 构建按显示模式过滤壁纸的JOIN与WHERE条件
+ * 有 is_visible 字段时直接按字段过滤，可走 (is_visible, category, created_at, id) 覆盖索引；
+ * 否则回退到联查 wallpaper_exile_status 表
+ * @param mysqli $conn 数据库连接
+ * @param string $displayMode 显示模式（normal / exiled_list）
+ * @return array [JOIN子句, WHERE条件（无需过滤时为null）]
+ */
+function buildVisibilityFilter($conn, $displayMode) {
+    if (hasVisibilityFlag($conn)) {
+        if ($displayMode === 'normal') {
+            return ['', 'w.is_visible = 1'];
+        }
+        if ($displayMode === 'exiled_list') {
+            return ['', 'w.is_visible = 0'];
+        }
+        return ['', null];
+    }
+
+    $join = " LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id";
+    if ($displayMode === 'normal') {
+        // 正常模式：显示未流放的壁纸 (wes.status = 0 或 不存在于wes表)
+        return [$join, "(wes.status = 0 OR wes.wallpaper_id IS NULL)"];
+    }
+    if ($displayMode === 'exiled_list') {
+        // 流放列表模式：只显示已流放的壁纸 (wes.status = 1)
+        return [$join, "wes.status = 1"];
+    }
+    return [$join, null];
+}
+
+/**
+ * 流放/召回时同步更新 is_visible 字段，列表立即生效；refresh_exile_status.py 按操作日志定期校正
+ * @param mysqli $conn 数据库连接
+ * @param array $wallpaperIds 壁纸ID列表
+ * @param int $visible 1=可见（召回），0=不可见（流放）
+ */
+function syncVisibilityFlag($conn, $wallpaperIds, $visible) {
+    if (empty($wallpaperIds) || !hasVisibilityFlag($conn)) {
+        return;
+    }
+    $placeholders = implode(',', array_fill(0, count($wallpaperIds), '?'));
+    $stmt = $conn->prepare("UPDATE wallpapers SET is_visible = ? WHERE id IN ({$placeholders})");
+    $params = array_merge([$visible], array_map('intval', $wallpaperIds));
+    $stmt->bind_param(str_repeat('i', count($params)), ...$params);
+    $stmt->execute();
+    $stmt->close();
+}
+
+/**
+ * 编码分页游标（最后一条记录的排序键和ID）
+ * @param mixed $sortKey 排序键
+ * @param int $id 记录ID
+ * @return string URL安全的游标字符串
+ */
+function encodeCursor($sortKey, $id) {
+    return rtrim(strtr(base64_encode(json_encode([$sortKey, $id])), '+/', '-_'), '=');
+}
+
+/**
+ * 解码分页游标
+ * @param string $cursor 游标字符串，空字符串表示第一页
+ * @return array|null|false [排序键, ID]；第一页返回null；格式错误返回false
+ */
+function decodeCursor($cursor) {
+    if ($cursor === '') {
+        return null;
+    }
+    $decoded = json_decode(base64_decode(strtr($cursor, '-_', '+/')), true);
+    if (!is_array($decoded) || count($decoded) !== 2 || !is_numeric($decoded[1])) {
+        return false;
+    }
+    return [$decoded[0], intval($decoded[1])];
+}
+
+/**
+ * 把游标换算为预计算ID列表中的位置
+ * 列表重新生成后位置可能变化，此时按上一页最后一条的ID重新定位
+ * @param array $sortIndex 索引句柄
+ * @param array|null $cursor 解码后的游标
+ * @return int 下一页起始位置
+ */
+function resolveIndexCursor($sortIndex, $cursor) {
+    if ($cursor === null) {
+        return 0;
+    }
+    list($position, $lastId) = $cursor;
+    $position = intval($position);
+    $previous = $position > 0 ? readSortIndexIds($sortIndex, $position - 1, 1) : [];
+    if (!empty($previous) && intval($previous[0]) === $lastId) {
+        return $position;
+    }
+    // 只有索引重新生成后才会走到这里，读取整个列表查找
+    $found = array_search($lastId, readSortIndexIds($sortIndex, 0, $sortIndex['count']));
+    return $found !== false ? $found + 1 : max(0, $position);
+}
+
+/**
+ * 从计数汇总表读取近似总数（由 sync_wallpapers_db.py 维护）
+ * @param mysqli $conn 数据库连接
+ * @param string $scope 计数范围，如 wallpapers:normal:全部、operation_log
+ * @return int|null 总数，汇总表不存在或没有该范围时返回null
+ */
+function getApproxCount($conn, $scope) {
+    try {
+        $stmt = $conn->prepare("SELECT total FROM wallpaper_count_summary WHERE scope = ?");
+        if (!$stmt) {
+            return null;
+        }
+        $stmt->bind_param('s', $scope);
+        $stmt->execute();
+        $stmt->bind_result($total);
+        $found = $stmt->fetch();
+        $stmt->close();
+        return $found ? intval($total) : null;
+    } catch (mysqli_sql_exception $e) {
+        return null;
+    }
+}
+
+/**
+ * 按 (created_at, id) 倒序的游标分页查询壁纸并输出列表
+ * 总数优先取计数汇总表，汇总表缺失时只在第一页执行一次COUNT
+ * @param mysqli $conn 数据库连接
+ * @param string $displayMode 显示模式（normal / exiled_list）
+ * @param string $category 分类，空或"全部"表示全部分类
+ * @param int $limit 每页数量
+ * @param array|null $cursor 解码后的游标，null表示第一页
+ */
+function listWallpapersByCursor($conn, $displayMode, $category, $limit, $cursor) {
+    $whereClauses = [];
+    $params = [];
+    $types = "";
+    list($visibilityJoin, $visibilityWhere) = buildVisibilityFilter($conn, $displayMode);
+    if ($visibilityWhere !== null) {
+        $whereClauses[] = $visibilityWhere;
+    }
+    $allCategories = empty($category) || $category === '全部';
+    if (!$allCategories) {
+        $whereClauses[] = "w.category = ?";
+        $params[] = $category;
+        $types .= "s";
+    }
+    $filterClauses = $whereClauses;
+    $filterParams = $params;
+    $filterTypes = $types;
+
+    if ($cursor !== null) {
+        $whereClauses[] = "(w.created_at < ? OR (w.created_at = ? AND w.id < ?))";
+        array_push($params, $cursor[0], $cursor[0], $cursor[1]);
+        $types .= "ssi";
+    }
+
+    $from = " FROM wallpapers w" . $visibilityJoin;
+    $sql = "SELECT w.id, w.title, w.file_path, w.width, w.height, w.category, w.likes, w.views, w.created_at" . $from;
+    if (!empty($whereClauses)) {
+        $sql .= " WHERE " . implode(" AND ", $whereClauses);
+    }
+    // 多取一条用于判断是否还有下一页
+    $sql .= " ORDER BY w.created_at DESC, w.id DESC LIMIT ?";
+    $params[] = $limit + 1;
+    $types .= "i";
+
+    $stmt = $conn->prepare($sql);
+    $stmt->bind_param($types, ...$params);
+    if (!$stmt->execute()) {
+        sendResponse(500, '获取壁纸列表失败: ' . $stmt->error);
+    }
+    $result = $stmt->get_result();
+    $wallpapers = [];
+    while ($row = $result->fetch_assoc()) {
+        $row['file_path'] = str_replace('../', '', $row['file_path']);
+        $wallpapers[] = $row;
+    }
+    $stmt->close();
+
+    $nextCursor = null;
+    if (count($wallpapers) > $limit) {
+        $wallpapers = array_slice($wallpapers, 0, $limit);
+        $last = end($wallpapers);
+        $nextCursor = encodeCursor($last['created_at'], $last['id']);
+    }
+    foreach ($wallpapers as &$wallpaper) {
+        unset($wallpaper['created_at']);
+    }
+    unset($wallpaper);
+    applyCounterShardDeltas($conn, $wallpapers, 'likes');
+
+    $total = getApproxCount($conn, 'wallpapers:' . $displayMode . ':' . ($allCategories ? '全部' : $category));
+    if ($total === null && $cursor === null) {
+        $countSql = "SELECT COUNT(*)" . $from;
+        if (!empty($filterClauses)) {
+            $countSql .= " WHERE " . implode(" AND ", $filterClauses);
+        }
+        $stmtCount = $conn->prepare($countSql);
+        if (!empty($filterParams)) {
+            $stmtCount->bind_param($filterTypes, ...$filterParams);
+        }
+        $stmtCount->execute();
+        $stmtCount->bind_result($total);
+        $stmtCount->fetch();
+        $stmtCount->close();
+    }
+
+    sendResponse(200, '成功获取壁纸列表', [
+        'total' => $total,
+        'wallpapers' => $wallpapers,
+        'next_cursor' => $nextCursor
+    ]);
+}
+
 /**
  * 处理获取壁纸详情
  */
@@ -266,6 +768,7 @@ function handleGetWallpaperDetails() {
             $wallpaperDetails = $result->fetch_assoc();
             // 修正文件路径
             $wallpaperDetails['file_path'] = str_replace('../', '', $wallpaperDetails['file_path']);
+            $wallpaperDetails['likes'] = getCounterValue($conn, $wallpaperId, 'likes');
 
             // 增加壁纸浏览次数 (可选，可以在这里或前端处理)
             // updateWallpaperViews($conn, $wallpaperId);
@@ -336,6 +839,12 @@ function handleSearchWallpapers() {
     $limit = isset($_GET['limit']) ? intval($_GET['limit']) : 20; // 每页默认20张壁纸
     $offset = ($page - 1) * $limit;
 
+    // 优先使用 build_search_index.py 生成的倒排索引；索引表不存在或切不出词时回退到LIKE模糊匹配
+    $indexed = searchWallpapersByIndex($conn, $query, $limit, $offset);
+    if ($indexed !== null) {
+        sendResponse(200, '搜索成功', $indexed);
+    }
+
     // 构建搜索查询，在标题、描述、标签中进行模糊匹配
     // 使用 CONCAT 和 LIKE 进行模糊匹配
     $searchQuery = "%" . $query . "%";
@@ -358,6 +867,7 @@ function handleSearchWallpapers() {
             $row['file_path'] = str_replace('../', '', $row['file_path']);
             $wallpapers[] = $row;
         }
+        applyCounterShardDeltas($conn, $wallpapers, 'likes');
 
         // TODO: 获取搜索结果总数用于分页信息
 
@@ -370,6 +880,99 @@ function handleSearchWallpapers() {
     closeDBConnection($conn);
 }
 
+/**
+ * 搜索关键词切词，规则与 build_search_index.py 一致
+ * 英文/数字（超长截断）1~2个字母时按前缀查询，更长时拆成相邻的三字母片段，所有片段都命中即为包含该词（前缀或词中间）；
+ * 中文单字保留单字，多字取相邻双字
+ * @param string $text 搜索关键词
+ * @return array 去重后的词列表
+ */
+function tokenizeSearchText($text) {
+    $tokens = [];
+    preg_match_all('/[a-z0-9]+|[\x{3400}-\x{4dbf}\x{4e00}-\x{9fff}]+/u', mb_strtolower($text, 'UTF-8'), $matches);
+    foreach ($matches[0] as $run) {
+        if (preg_match('/^[a-z0-9]/', $run)) {
+            $word = substr($run, 0, 20);
+            if (strlen($word) < 3) {
+                $tokens[] = $word;
+                continue;
+            }
+            for ($i = 0; $i + 3 <= strlen($word); $i++) {
+                $tokens[] = substr($word, $i, 3);
+            }
+            continue;
+        }
+        $length = mb_strlen($run, 'UTF-8');
+        if ($length === 1) {
+            $tokens[] = $run;
+            continue;
+        }
+        for ($i = 0; $i < $length - 1; $i++) {
+            $tokens[] = mb_substr($run, $i, 2, 'UTF-8');
+        }
+    }
+    return array_values(array_unique($tokens));
+}
+
+/**
+ * 通过倒排索引搜索壁纸：所有词都命中的壁纸按权重之和排序
+ * @param mysqli $conn 数据库连接
+ * @param string $query 搜索关键词
+ * @param int $limit 每页数量
+ * @param int $offset 偏移量
+ * @return array|null 壁纸列表；索引不可用时返回null
+ */
+function searchWallpapersByIndex($conn, $query, $limit, $offset) {
+    $tokens = tokenizeSearchText($query);
+    if (empty($tokens)) {
+        return null;
+    }
+
+    $placeholders = implode(',', array_fill(0, count($tokens), '?'));
+    $sql = "
+        SELECT w.id, w.title, w.file_path, w.width, w.height, w.category, w.likes, w.views
+        FROM (
+            SELECT wallpaper_id, SUM(weight) AS score
+            FROM wallpaper_search_index
+            WHERE token IN ({$placeholders})
+            GROUP BY wallpaper_id
+            HAVING COUNT(*) = ?
+            ORDER BY score DESC, wallpaper_id DESC
+            LIMIT ? OFFSET ?
+        ) s
+        JOIN wallpapers w ON w.id = s.wallpaper_id
+        ORDER BY s.score DESC, w.id DESC
+    ";
+    try {
+        $stmt = $conn->prepare($sql);
+        if (!$stmt) {
+            // 索引表尚未生成
+            sendDebugLog("搜索索引不可用，回退到LIKE查询: " . $conn->error, 'wallpaper_debug_log.txt', 'append');
+            return null;
+        }
+        $params = array_merge($tokens, [count($tokens), $limit, $offset]);
+        $stmt->bind_param(str_repeat('s', count($tokens)) . 'iii', ...$params);
+        if (!$stmt->execute()) {
+            sendDebugLog("搜索索引查询失败: " . $stmt->error, 'wallpaper_debug_log.txt', 'append');
+            $stmt->close();
+            return null;
+        }
+    } catch (mysqli_sql_exception $e) {
+        sendDebugLog("搜索索引不可用，回退到LIKE查询: " . $e->getMessage(), 'wallpaper_debug_log.txt', 'append');
+        return null;
+    }
+
+    $result = $stmt->get_result();
+    $wallpapers = [];
+    while ($row = $result->fetch_assoc()) {
+        $row['file_path'] = str_replace('../', '', $row['file_path']);
+        $wallpapers[] = $row;
+    }
+    $stmt->close();
+    applyCounterShardDeltas($conn, $wallpapers, 'likes');
+    return $wallpapers;
+}
+
 /**
  * 处理流放壁纸
  */
@@ -442,6 +1045,7 @@ function handleExileWallpaper($input_data) {
         $stmtLog->bind_param("iii", $wallpaperId, $userId, $oldStatus);
         $stmtLog->execute();
         $stmtLog->close();
+        syncVisibilityFlag($conn, [$wallpaperId], 0);
 
         sendResponse(200, '壁纸已成功流放');
     } else {
@@ -520,6 +1124,7 @@ function handleRecallWallpaper($input_data) {
         $stmtLog->bind_param("iii", $wallpaperId, $userId, $oldStatus);
         $stmtLog->execute();
         $stmtLog->close();
+        syncVisibilityFlag($conn, [$wallpaperId], 1);
 
         sendResponse(200, '壁纸已成功召回');
     } else {
@@ -557,6 +1162,17 @@ function handleAdminGetOperationLogs() {
     $limit = isset($_GET['limit']) ? intval($_GET['limit']) : 20;
     $offset = ($page - 1) * $limit;
 
+    // 传入 cursor 参数时按 (operation_time, id) 游标分页
+    if (isset($_GET['cursor'])) {
+        $cursor = decodeCursor($_GET['cursor']);
+        if ($cursor === false) {
+            sendResponse(400, '无效的分页游标');
+        }
+        listOperationLogsByCursor($conn, $limit, $cursor);
+        closeDBConnection($conn);
+        return;
+    }
+
     $sql = "SELECT * FROM wallpaper_operation_log ORDER BY operation_time DESC LIMIT ? OFFSET ?";
     $stmt = $conn->prepare($sql);
     $stmt->bind_param("ii", $limit, $offset);
@@ -587,6 +1203,56 @@ function handleAdminGetOperationLogs() {
     closeDBConnection($conn);
 }
 
+/**
+ * 按 (operation_time, id) 倒序的游标分页查询操作日志并输出
+ * @param mysqli $conn 数据库连接
+ * @param int $limit 每页数量
+ * @param array|null $cursor 解码后的游标，null表示第一页
+ */
+function listOperationLogsByCursor($conn, $limit, $cursor) {
+    $fetchLimit = $limit + 1;
+    if ($cursor === null) {
+        $stmt = $conn->prepare("SELECT * FROM wallpaper_operation_log ORDER BY operation_time DESC, id DESC LIMIT ?");
+        $stmt->bind_param("i", $fetchLimit);
+    } else {
+        $stmt = $conn->prepare("SELECT * FROM wallpaper_operation_log
+            WHERE operation_time < ? OR (operation_time = ? AND id < ?)
+            ORDER BY operation_time DESC, id DESC LIMIT ?");
+        $stmt->bind_param("ssii", $cursor[0], $cursor[0], $cursor[1], $fetchLimit);
+    }
+    if (!$stmt->execute()) {
+        sendResponse(500, '获取操作日志失败: ' . $stmt->error);
+    }
+    $result = $stmt->get_result();
+    $logs = [];
+    while ($row = $result->fetch_assoc()) {
+        $logs[] = $row;
+    }
+    $stmt->close();
+
+    $nextCursor = null;
+    if (count($logs) > $limit) {
+        $logs = array_slice($logs, 0, $limit);
+        $last = end($logs);
+        $nextCursor = encodeCursor($last['operation_time'], $last['id']);
+    }
+
+    $total = getApproxCount($conn, 'operation_log');
+    if ($total === null && $cursor === null) {
+        $stmtCount = $conn->prepare("SELECT COUNT(*) FROM wallpaper_operation_log");
+        $stmtCount->execute();
+        $stmtCount->bind_result($total);
+        $stmtCount->fetch();
+        $stmtCount->close();
+    }
+
+    sendResponse(200, '成功获取操作日志', [
+        'total' => $total,
+        'logs' => $logs,
+        'next_cursor' => $nextCursor
+    ]);
+}
+
 /**
  * 2024-07-29 新增：处理批量召回壁纸
  */
@@ -654,6 +1320,7 @@ function handleAdminBatchRecall() {
             $stmtLog->execute();
         }
         $stmtLog->close();
+        syncVisibilityFlag($conn, $wallpaperIds, 1);
 
         $conn->commit();
         sendResponse(200, "成功召回 {$updatedRows} 张壁纸");
@@ -750,6 +1417,7 @@ function handleAdminBatchExile() {
             $stmtLog->execute();
         }
         $stmtLog->close();
+        syncVisibilityFlag($conn, $wallpaperIds, 0);
 
         $conn->commit();
         sendResponse(200, "成功流放 " . count($wallpaperIds) . " 张壁纸");
@@ -0,0 +1,103 @@
+<?php
+/**
+ * @file wallpaper_states.php
+ * @brief 批量查询壁纸的点赞/收藏/流放状态
+ * @details
+ *   首页每页卡片只请求一次本接口，代替逐张调用 check_like / check_favorite（或 my_likes / my_favorites）。
+ *   接收 GET 请求：ids=逗号分隔的壁纸ID（最多 WALLPAPER_STATES_MAX_IDS 个）。
+ *   点赞按IP、收藏按登录用户判断；未登录时 favorited 恒为 false。
+ *   返回：{"code": 0, "msg": "success", "data": {"<id>": {"liked": bool, "favorited": bool, "exiled": bool}}}
+ */
+session_start();
+ini_set('display_errors', 0);
+error_reporting(E_ALL & ~E_NOTICE & ~E_WARNING);
+require_once '../config.php';
+require_once 'utils.php';
+require_once 'user_state_cache.php';
+header('Content-Type: application/json; charset=utf-8');
+
+define('WALLPAPER_STATES_MAX_IDS', 200);
+
+if ($_SERVER['REQUEST_METHOD'] !== 'GET') {
+    sendResponse(1, '请求方式错误');
+}
+
+$ids = [];
+foreach (explode(',', $_GET['ids'] ?? '') as $id) {
+    $id = intval($id);
+    if ($id > 0) {
+        $ids[$id] = true;
+    }
+}
+$ids = array_keys($ids);
+if (empty($ids)) {
+    sendResponse(1, '参数错误: ids 不能为空');
+}
+if (count($ids) > WALLPAPER_STATES_MAX_IDS) {
+    sendResponse(1, '参数错误: 一次最多查询 ' . WALLPAPER_STATES_MAX_IDS . ' 张壁纸');
+}
+
+$ip_address = $_SERVER['REMOTE_ADDR'] ?: '127.0.0.1';
+$user_id = 0;
+if (isset($_SESSION['user_id']) && $_SESSION['user_id']) {
+    $user_id = intval($_SESSION['user_id']);
+} elseif (isset($_SESSION['user']['id']) && $_SESSION['user']['id']) {
+    $user_id = intval($_SESSION['user']['id']);
+}
+
+// 重度用户优先使用预计算的集合，命中时SQL中不再查对应的大表
+$likedCache = loadUserStateCache('likes', $ip_address);
+$favoritedCache = $user_id ? loadUserStateCache('favorites', $user_id) : [];
+
+$conn = new mysqli(DB_HOST, DB_USER, DB_PWD, DB_NAME);
+if ($conn->connect_errno) {
+    sendDebugLog(['msg' => '数据库连接失败', 'error' => $conn->connect_error], 'wallpaper_debug_log.txt', 'append', 'wallpaper_states_db_error');
+    sendResponse(500, '数据库连接失败');
+}
+
+$columns = ['w.id', 'IF(wes.status = 1, 1, 0) AS exiled'];
+$types = '';
+$params = [];
+if ($likedCache === null) {
+    $columns[] = 'EXISTS(SELECT 1 FROM wallpaper_likes l WHERE l.wallpaper_id = w.id AND l.ip_address = ?) AS liked';
+    $types .= 's';
+    $params[] = $ip_address;
+}
+if ($favoritedCache === null) {
+    $columns[] = 'EXISTS(SELECT 1 FROM wallpaper_favorites f WHERE f.wallpaper_id = w.id AND f.user_id = ?) AS favorited';
+    $types .= 'i';
+    $params[] = $user_id;
+}
+$placeholders = implode(',', array_fill(0, count($ids), '?'));
+$types .= str_repeat('i', count($ids));
+$params = array_merge($params, $ids);
+
+$sql = "SELECT " . implode(', ', $columns) . "
+        FROM wallpapers w
+        LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id
+        WHERE w.id IN ($placeholders)";
+
+try {
+    $stmt = $conn->prepare($sql);
+    $stmt->bind_param($types, ...$params);
+    $stmt->execute();
+    $result = $stmt->get_result();
+
+    $states = [];
+    while ($row = $result->fetch_assoc()) {
+        $id = intval($row['id']);
+        $states[$id] = [
+            'liked' => $likedCache === null ? (bool)$row['liked'] : isset($likedCache[$id]),
+            'favorited' => $favoritedCache === null ? (bool)$row['favorited'] : isset($favoritedCache[$id]),
+            'exiled' => (bool)$row['exiled']
+        ];
+    }
+    $stmt->close();
+} catch (Exception $e) {
+    sendDebugLog(['msg' => '批量查询壁纸状态失败', 'error' => $e->getMessage()], 'wallpaper_debug_log.txt', 'append', 'wallpaper_states_error');
+    $conn->close();
+    sendResponse(500, '服务器内部错误');
+}
+
+$conn->close();
+sendResponse(0, 'success', (object)$states);
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+壁纸搜索倒排索引构建脚本
+- 对标题、标签、分类、描述和提示词分词：英文/数字按单词的短前缀和三字母片段（支持前缀和词中间匹配），中文按单字和双字
+- 每个词对应一组 (壁纸ID, 权重) 倒排记录，写入 wallpaper_search_index 表
+- 先写入新表再整体替换，重建过程中搜索接口不受影响
+- 新增或修改的壁纸由 derivative_worker.py 发布和 sync_wallpapers_db.py 同步时调用 update_search_index 增量更新，
+  不必等待下一次全量重建；-i 可手动刷新指定壁纸
+- api/wallpaper.php 的搜索接口按同样规则切词，对倒排记录求交集并按权重排序
+"""
+import argparse
+import re
+import time
+from collections import defaultdict
+
+import pymysql
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'wallpaper_db',
+    'charset': 'utf8mb4'
+}
+
+INDEX_TABLE = 'wallpaper_search_index'
+
+# 各字段命中时的权重，标题最重要
+FIELD_WEIGHTS = {
+    'title': 5,
+    'tags': 3,
+    'category': 3,
+    'description': 1,
+    'prompt': 1
+}
+
+# 英文单词只收录长度不超过 PREFIX_MAX_LEN 的前缀和所有 NGRAM_LEN 字母片段，每个单词最多约20条记录；
+# 1~2个字母的搜索词按前缀命中，更长的搜索词拆成三字母片段求交集，前缀和词中间都能命中（如 scape 命中 landscape）
+PREFIX_MAX_LEN = 2
+NGRAM_LEN = 3
+MAX_TOKEN_LEN = 20
+
+INSERT_BATCH_SIZE = 2000
+
+# 与 api/wallpaper.php 中 tokenizeSearchText 的正则保持一致
+TOKEN_PATTERN = re.compile('[a-z0-9]+|[\\u3400-\\u4dbf\\u4e00-\\u9fff]+')
+CJK_PATTERN = re.compile('[\\u3400-\\u4dbf\\u4e00-\\u9fff]')
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS `{table}` (
+        `token` VARCHAR(32) NOT NULL COMMENT '词（小写英文前缀/三字母片段或中文单字/双字）',
+        `wallpaper_id` BIGINT NOT NULL COMMENT '壁纸ID',
+        `weight` SMALLINT NOT NULL DEFAULT 1 COMMENT '命中权重',
+        PRIMARY KEY (`token`, `wallpaper_id`),
+        KEY `idx_wallpaper_id` (`wallpaper_id`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_bin COMMENT='壁纸搜索倒排索引'
+"""
+
+
+def tokenize(text):
+    """
+    把文本切分为索引词
+    英文/数字单词生成长度不超过 PREFIX_MAX_LEN 的前缀和所有 NGRAM_LEN 字母片段；中文连续片段生成单字和相邻双字
+    Args:
+        text (str): 原始文本
+    Returns:
+        set: 索引词集合
+    """
+    tokens = set()
+    if not text:
+        return tokens
+    for run in TOKEN_PATTERN.findall(str(text).lower()):
+        if CJK_PATTERN.match(run):
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            word = run[:MAX_TOKEN_LEN]
+            tokens.update(word[:end] for end in range(1, min(len(word), PREFIX_MAX_LEN) + 1))
+            tokens.update(word[i:i + NGRAM_LEN] for i in range(len(word) - NGRAM_LEN + 1))
+    return tokens
+
+
+def fetch_documents(conn, wallpaper_ids=None):
+    """
+    读取壁纸的可搜索字段以及提示词
+    Args:
+        conn: 数据库连接
+        wallpaper_ids (list): 只读取这些壁纸，None表示全部
+    Returns:
+        dict: {壁纸ID: {字段名: 文本}}
+    """
+    documents = {}
+    where, params, prompt_params = '', (), ()
+    if wallpaper_ids is not None:
+        placeholders = ','.join(['%s'] * len(wallpaper_ids))
+        where = f" WHERE {{column}} IN ({placeholders})"
+        params = tuple(int(wallpaper_id) for wallpaper_id in wallpaper_ids)
+        prompt_params = tuple(str(wallpaper_id) for wallpaper_id in params)
+    with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+        cursor.execute("SELECT id, title, description, tags, category FROM wallpapers"
+                       + where.format(column='id'), params)
+        for row in cursor.fetchall():
+            documents[int(row['id'])] = {
+                'title': row['title'],
+                'description': row['description'],
+                'tags': row['tags'],
+                'category': row['category']
+            }
+        try:
+            cursor.execute("SELECT wallpaper_id, content FROM wallpaper_prompts"
+                           + where.format(column='wallpaper_id'), prompt_params)
+            for row in cursor.fetchall():
+                wallpaper_id = str(row['wallpaper_id'])
+                if wallpaper_id.isdigit() and int(wallpaper_id) in documents:
+                    documents[int(wallpaper_id)]['prompt'] = row['content']
+        except pymysql.err.ProgrammingError:
+            print("⚠️ 未找到 wallpaper_prompts 表，跳过提示词索引")
+    return documents
+
+
+def build_postings(documents):
+    """
+    构建倒排记录，同一壁纸在多个字段命中同一个词时权重累加
+    Args:
+        documents (dict): {壁纸ID: {字段名: 文本}}
+    Returns:
+        dict: {词: {壁纸ID: 权重}}
+    """
+    postings = defaultdict(dict)
+    for wallpaper_id, fields in documents.items():
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS.get(field, 1)
+            for token in tokenize(text):
+                entry = postings[token]
+                entry[wallpaper_id] = entry.get(wallpaper_id, 0) + weight
+    return postings
+
+
+def write_index(conn, postings):
+    """
+    写入新索引表后与旧表原子交换
+    Args:
+        conn: 数据库连接
+        postings (dict): {词: {壁纸ID: 权重}}
+    Returns:
+        int: 写入的倒排记录数
+    """
+    new_table = INDEX_TABLE + '_new'
+    old_table = INDEX_TABLE + '_old'
+    with conn.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL.format(table=INDEX_TABLE))
+        cursor.execute(f"DROP TABLE IF EXISTS `{new_table}`")
+        cursor.execute(f"DROP TABLE IF EXISTS `{old_table}`")
+        cursor.execute(CREATE_TABLE_SQL.format(table=new_table))
+
+        sql = f"INSERT INTO `{new_table}` (token, wallpaper_id, weight) VALUES (%s, %s, %s)"
+        batch = []
+        total = 0
+        for token in sorted(postings):
+            for wallpaper_id, weight in sorted(postings[token].items()):
+                batch.append((token, wallpaper_id, min(weight, 32767)))
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    cursor.executemany(sql, batch)
+                    total += len(batch)
+                    batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            total += len(batch)
+        conn.commit()
+
+        # RENAME TABLE 一次完成两次改名，搜索接口不会看到空表
+        cursor.execute(f"RENAME TABLE `{INDEX_TABLE}` TO `{old_table}`, `{new_table}` TO `{INDEX_TABLE}`")
+        cursor.execute(f"DROP TABLE IF EXISTS `{old_table}`")
+    conn.commit()
+    return total
+
+
+def index_table_exists(conn):
+    """
+    判断索引表是否已由全量构建生成
+    Args:
+        conn: 数据库连接
+    Returns:
+        bool: 是否存在
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SHOW TABLES LIKE %s", (INDEX_TABLE,))
+        return cursor.fetchone() is not None
+
+
+def update_search_index(conn, wallpaper_ids):
+    """
+    增量刷新指定壁纸的倒排记录：先删除旧记录再按当前数据写入，已从数据库删除的壁纸只删除记录
+    索引表尚未生成时不做任何事（搜索接口此时使用LIKE查询）
+    Args:
+        conn: 数据库连接
+        wallpaper_ids (iterable): 新增或修改的壁纸ID
+    Returns:
+        int: 写入的倒排记录数
+    """
+    wallpaper_ids = sorted(set(int(wallpaper_id) for wallpaper_id in wallpaper_ids))
+    if not wallpaper_ids or not index_table_exists(conn):
+        return 0
+    total = 0
+    with conn.cursor() as cursor:
+        for start in range(0, len(wallpaper_ids), INSERT_BATCH_SIZE):
+            batch_ids = wallpaper_ids[start:start + INSERT_BATCH_SIZE]
+            postings = build_postings(fetch_documents(conn, batch_ids))
+            placeholders = ','.join(['%s'] * len(batch_ids))
+            cursor.execute(f"DELETE FROM `{INDEX_TABLE}` WHERE wallpaper_id IN ({placeholders})", batch_ids)
+            rows = [(token, wallpaper_id, min(weight, 32767))
+                    for token, entry in postings.items() for wallpaper_id, weight in entry.items()]
+            for row_start in range(0, len(rows), INSERT_BATCH_SIZE):
+                cursor.executemany(
+                    f"INSERT INTO `{INDEX_TABLE}` (token, wallpaper_id, weight) VALUES (%s, %s, %s)",
+                    rows[row_start:row_start + INSERT_BATCH_SIZE]
+                )
+            total += len(rows)
+    conn.commit()
+    return total
+
+
+def refresh_wallpapers(wallpaper_ids):
+    """
+    打开数据库连接增量刷新指定壁纸的索引，失败只打印警告（下次全量重建时修正）
+    Args:
+        wallpaper_ids (iterable): 新增或修改的壁纸ID
+    Returns:
+        bool: 是否成功
+    """
+    conn = None
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        total = update_search_index(conn, wallpaper_ids)
+    except Exception as e:
+        print(f"⚠️ 搜索索引增量更新失败: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    if total:
+        print(f"🔎 搜索索引已增量更新: {total} 条倒排记录")
+    return True
+
+
+def build_search_index():
+    """
+    从数据库重建搜索倒排索引
+    Returns:
+        bool: 是否成功
+    """
+    start_time = time.time()
+    conn = None
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        documents = fetch_documents(conn)
+        postings = build_postings(documents)
+        total = write_index(conn, postings)
+    except Exception as e:
+        print(f"❌ 搜索索引构建失败: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    print(f"🔎 搜索索引已更新: {len(documents)} 张壁纸，{len(postings)} 个词，"
+          f"{total} 条倒排记录，用时 {time.time() - start_time:.2f} 秒")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建壁纸搜索倒排索引')
+    parser.add_argument('-t', '--tokenize', metavar='TEXT', help='只打印文本的切词结果，用于调试')
+    parser.add_argument('-i', '--ids', nargs='+', type=int, metavar='ID', help='只增量刷新指定壁纸的索引')
+    args = parser.parse_args()
+
+    if args.tokenize is not None:
+        print(' '.join(sorted(tokenize(args.tokenize))))
+        return
+    if args.ids:
+        refresh_wallpapers(args.ids)
+        return
+    build_search_index()
+
+
+if __name__ == '__main__':
+    main()
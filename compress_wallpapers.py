@@ -5,44 +5,118 @@
 文件: compress_wallpapers.py
 描述: 壁纸图片批量压缩工具
 依赖: Pillow库 (pip install Pillow)
-维护: 用于批量压缩wallpapers目录下的图片并保存到preview子目录
+维护: 用于批量压缩wallpapers目录下的图片，按压缩类型分别保存到preview/thumb/large子目录
 '''
 
 import os
 import sys
 import time
-from PIL import Image
+from PIL import Image, ImageMath
 import argparse
 import re
+import io
+import json
+import math
+import hashlib
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import image_hash
 
 # 压缩配置 - 参考自image-compressor.js
+# format: 兜底格式（所有浏览器都支持），formats: 格式阶梯，按优先级排列，当前Pillow不支持的格式自动跳过
+# target_bytes / min_ssim: 启用 --quality-search 时的单图字节预算和SSIM下限，None表示不限制
 CONFIG = {
     # 缩略图配置
     'thumbnail': {
         'max_width': 600,
         'max_height': 450,
         'quality': 92,  # PIL中的质量范围是1-95
-        'format': 'JPEG'
+        'min_quality': 60,
+        'format': 'JPEG',
+        'formats': ['AVIF', 'WEBP', 'JPEG'],
+        'target_bytes': 80 * 1024,
+        'min_ssim': 0.96
     },
     # 预览图配置
     'preview': {
         'max_width': 1200,
         'max_height': 900,
         'quality': 95,
-        'format': 'JPEG'
+        'min_quality': 70,
+        'format': 'JPEG',
+        'formats': ['AVIF', 'WEBP', 'JPEG'],
+        'target_bytes': 250 * 1024,
+        'min_ssim': 0.97
     },
     # 原图配置
     'original': {
         'max_width': 1920,
         'max_height': 1080,
         'quality': 95,
-        'format': 'JPEG'
+        'min_quality': 75,
+        'format': 'JPEG',
+        'formats': ['WEBP', 'JPEG'],
+        'target_bytes': None,
+        'min_ssim': 0.98
     }
 }
 
-# 源目录和目标目录
+# 各输出格式的文件扩展名
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpeg',
+    'WEBP': '.webp',
+    'AVIF': '.avif'
+}
+
+# 是否对每张图按字节预算/SSIM下限二分搜索质量（由 --quality-search 开启）
+QUALITY_SEARCH = False
+
+# SSIM估算使用的灰度图边长上限（参考图只计算一次，每步搜索只需解码并缩小编码结果）
+SSIM_SAMPLE_SIZE = 256
+
+# 网站根目录、源目录和压缩版本输出根目录
+WEB_ROOT = r'f:\XAMPP\htdocs'
 SOURCE_DIR = r'f:\XAMPP\htdocs\static\wallpapers'
-TARGET_DIR = r'f:\XAMPP\htdocs\static\wallpapers\preview'
+OUTPUT_ROOT = r'f:\XAMPP\htdocs\static\wallpapers'
+
+# 各压缩类型的输出子目录，互不覆盖
+# preview 保持原有的 static/wallpapers/preview 位置，兼容前端已有路径
+VARIANT_DIRS = {
+    'thumbnail': 'thumb',
+    'preview': 'preview',
+    'original': 'large'
+}
+
+# 按文件名哈希前缀分片的层数（0表示不分片，每层2个十六进制字符，最多256个子目录）
+SHARD_DEPTH = 0
+
+# 内容寻址存储根目录：content_store.py 把原图按内容哈希存为 ab/cd/<哈希>.<扩展名>
+OBJECT_ROOT = os.path.join(WEB_ROOT, 'static', 'objects')
+
+# 内容寻址布局（由 --content-addressed 开启）：源文件名即内容哈希，压缩版本存为
+# <类型目录>/ab/cd/<源哈希>-<配置摘要>.<格式>，内容或配置变化时URL随之变化，同一URL的内容永不改变
+CONTENT_ADDRESSED = False
+CONFIG_DIGEST_LENGTH = 8
+
+# 增量构建清单，记录每个压缩版本对应的源文件大小、修改时间、内容哈希和所用配置
+# 默认位于当前输出根目录下（随 -o / -c 变化），见 default_manifest_path
+MANIFEST_NAME = 'compress_manifest.db'
+
+# 前端使用的压缩版本路径清单
+VARIANTS_JSON_PATH = os.path.join(WEB_ROOT, 'static', 'data', 'variants.json')
+
+# 前端使用的占位信息清单（主色调、调色板、blurhash）
+PLACEHOLDERS_JSON_PATH = os.path.join(WEB_ROOT, 'static', 'data', 'placeholders.json')
+
+# 占位信息：在已缩放的最小版本上再缩到该边长后计算，调色板取前几种颜色，blurhash 使用 横x纵 个分量
+PLACEHOLDER_SAMPLE_SIZE = 32
+PALETTE_SIZE = 5
+BLURHASH_COMPONENTS = (4, 3)
+
+# 清单批量提交的条数
+MANIFEST_COMMIT_BATCH = 500
 
 # 支持的图片格式
 SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
@@ -61,31 +135,84 @@ def has_chinese(text):
     """检查文本是否包含中文字符"""
     return bool(re.search(r'[\u4e00-\u9fff]', text))
 
-def get_compressed_path(original_path, compress_type):
+def set_output_layout(output_root=None, shard_depth=None, quality_search=None, content_addressed=None):
+    """设置输出目录布局和编码选项
+    
+    多进程模式下也作为进程池的initializer，保证子进程使用与主进程相同的设置。
+    
+    Args:
+        output_root: 压缩版本输出根目录
+        shard_depth: 哈希分片层数
+        quality_search: 是否启用质量搜索
+        content_addressed: 是否使用内容寻址布局
+    """
+    global OUTPUT_ROOT, SHARD_DEPTH, QUALITY_SEARCH, CONTENT_ADDRESSED
+    if output_root is not None:
+        OUTPUT_ROOT = output_root
+    if shard_depth is not None:
+        SHARD_DEPTH = shard_depth
+    if quality_search is not None:
+        QUALITY_SEARCH = quality_search
+    if content_addressed is not None:
+        CONTENT_ADDRESSED = content_addressed
+
+def default_manifest_path():
+    """当前输出根目录下的清单路径，清单始终描述它所在的输出目录树"""
+    return os.path.join(OUTPUT_ROOT, MANIFEST_NAME)
+
+def get_variant_dir(compress_type):
+    """获取某压缩类型的输出目录"""
+    return os.path.join(OUTPUT_ROOT, VARIANT_DIRS.get(compress_type, compress_type))
+
+def get_shard_parts(name):
+    """根据文件名哈希计算分片子目录，如 ['ab', 'cd']；内容寻址布局下文件名本身就是哈希，直接取其前缀"""
+    if CONTENT_ADDRESSED:
+        return [name[0:2], name[2:4]]
+    if SHARD_DEPTH <= 0:
+        return []
+    digest = hashlib.md5(name.encode('utf-8')).hexdigest()
+    return [digest[i * 2:i * 2 + 2] for i in range(SHARD_DEPTH)]
+
+def get_variant_formats(config):
+    """获取压缩类型实际输出的格式列表（按优先级排列，兜底格式始终在最后）"""
+    Image.init()
+    formats = [
+        fmt for fmt in config.get('formats', [])
+        if fmt != config['format'] and fmt in Image.SAVE
+    ]
+    formats.append(config['format'])
+    return formats
+
+def get_compressed_path(original_path, compress_type, fmt=None):
     """构建压缩图片路径
     
     Args:
         original_path: 原图路径
         compress_type: 压缩类型 (thumbnail|preview|original)
+        fmt: 输出格式，默认为配置中的兜底格式
         
     Returns:
-        压缩图片路径
+        压缩图片路径，如 OUTPUT_ROOT/thumb/<name>.jpeg 或分片后的 OUTPUT_ROOT/thumb/ab/<name>.jpeg，
+        内容寻址布局下为 OUTPUT_ROOT/thumb/ab/cd/<源哈希>-<配置摘要>.jpeg
     """
     # 获取文件名和目录
     directory, filename = os.path.split(original_path)
     name, ext = os.path.splitext(filename)
     
-    # 检查是否包含中文
-    if has_chinese(name):
-        print(f"[警告] 检测到中文文件名: {name}，将进行处理")
-    
     # 构建压缩文件名
     config = CONFIG[compress_type]
-    # 根据文档要求，文件名与原图同名，且格式为JPEG，所以不再添加后缀
-    extension = '.' + config['format'].lower() # 获取配置中的格式作为扩展名
+    # 根据文档要求，文件名与原图同名，扩展名由输出格式决定
+    fmt = fmt or config['format']
+    extension = FORMAT_EXTENSIONS.get(fmt, '.' + fmt.lower())
     
     compressed_filename = f"{name}{extension}"
-    return os.path.join(TARGET_DIR, compressed_filename)
+    if CONTENT_ADDRESSED:
+        compressed_filename = f"{name}-{config_digest(compress_type)}{extension}"
+    return os.path.join(get_variant_dir(compress_type), *get_shard_parts(name), compressed_filename)
+
+def to_web_path(file_path):
+    """把本地路径转换为相对网站根目录的URL路径"""
+    return os.path.relpath(file_path, WEB_ROOT).replace(os.sep, '/')
 
 def calculate_compressed_size(original_width, original_height, max_width, max_height):
     """计算压缩后的尺寸
@@ -115,111 +242,972 @@ def calculate_compressed_size(original_width, original_height, max_width, max_he
     
     return width, height
 
-def compress_image(image_path, compress_type='thumbnail', force=False):
-    """压缩图片
+def encode_image(img, fmt, quality):
+    """按指定格式和质量编码图片
+    
+    Args:
+        img: PIL图片对象
+        fmt: 输出格式 (JPEG|WEBP|AVIF)
+        quality: 质量参数
+        
+    Returns:
+        bytes: 编码后的文件内容
+    """
+    buffer = io.BytesIO()
+    if fmt == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=6)
+    elif fmt == 'AVIF':
+        img.save(buffer, 'AVIF', quality=quality, speed=6)
+    else:  # JPEG
+        # 如果原图是RGBA模式（有透明通道），转换为RGB
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def _luma_samples(img, size=SSIM_SAMPLE_SIZE):
+    """缩小到不超过size的灰度图（F模式），用于SSIM估算"""
+    gray = img.convert('L')
+    gray.thumbnail((size, size), Image.BILINEAR)
+    return gray.convert('F')
+
+def _image_product(a, b):
+    """两张F模式图片逐像素相乘（兼容新旧版本Pillow的ImageMath接口）"""
+    if hasattr(ImageMath, 'lambda_eval'):
+        return ImageMath.lambda_eval(lambda args: args['a'] * args['b'], a=a, b=b)
+    return ImageMath.eval('a * b', a=a, b=b)
+
+def calculate_ssim(reference, encoded_bytes, block=8):
+    """估算编码结果相对参考图的结构相似度
+    
+    在缩小后的灰度图上按 block×block 不重叠窗口计算SSIM后取平均，
+    比全图SSIM更能反映局部的块效应和模糊。
+    各窗口的均值、平方均值和乘积均值用BOX缩放一次求出（C实现），不在Python中逐像素循环。
+    
+    Args:
+        reference: _luma_samples返回的参考灰度图
+        encoded_bytes: 编码后的文件内容
+        block: 窗口边长
+        
+    Returns:
+        float: 平均SSIM，1.0表示完全一致
+    """
+    width, height = reference.size
+    with Image.open(io.BytesIO(encoded_bytes)) as decoded:
+        gray = decoded.convert('L')
+        if gray.size != (width, height):
+            gray = gray.resize((width, height), Image.BILINEAR)
+        encoded = gray.convert('F')
+    
+    blocks = (width // block, height // block)
+    if not blocks[0] or not blocks[1]:
+        return 1.0
+    box = (0, 0, blocks[0] * block, blocks[1] * block)
+    
+    def block_means(image):
+        return list(image.resize(blocks, Image.BOX, box=box).getdata())
+    
+    mean_x, mean_y = block_means(reference), block_means(encoded)
+    mean_xx = block_means(_image_product(reference, reference))
+    mean_yy = block_means(_image_product(encoded, encoded))
+    mean_xy = block_means(_image_product(reference, encoded))
+    
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    total = 0.0
+    for mx, my, xx, yy, xy in zip(mean_x, mean_y, mean_xx, mean_yy, mean_xy):
+        var_x, var_y, cov = xx - mx * mx, yy - my * my, xy - mx * my
+        total += ((2 * mx * my + c1) * (2 * cov + c2)) / \
+            ((mx * mx + my * my + c1) * (var_x + var_y + c2))
+    return total / len(mean_x)
+
+def search_quality(img, fmt, config):
+    """二分搜索质量，满足字节预算和SSIM下限
+    
+    字节预算是硬上限：取不超过预算的最高质量；
+    SSIM下限用于简单图片：取满足下限的最低质量。两者同时配置时取较小值。
+    
+    Args:
+        img: 已调整好尺寸的PIL图片对象
+        fmt: 输出格式
+        config: CONFIG中对应压缩类型的配置
+        
+    Returns:
+        tuple: (质量, 编码后的文件内容)
+    """
+    low, high = config.get('min_quality', 60), config['quality']
+    target_bytes, min_ssim = config.get('target_bytes'), config.get('min_ssim')
+    encoded = {}
+    
+    def encode(quality):
+        if quality not in encoded:
+            encoded[quality] = encode_image(img, fmt, quality)
+        return encoded[quality]
+    
+    # 字节预算：满足 size <= target_bytes 的最高质量
+    budget_quality = high
+    if target_bytes and len(encode(high)) > target_bytes:
+        lo, hi = low, high - 1
+        budget_quality = low
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if len(encode(mid)) <= target_bytes:
+                budget_quality = mid
+                lo = mid + 1
+            else:
+                hi = mid - 1
+    
+    # SSIM下限：满足 ssim >= min_ssim 的最低质量
+    ssim_quality = budget_quality
+    if min_ssim:
+        reference = _luma_samples(img)
+        lo, hi = low, budget_quality
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            if calculate_ssim(reference, encode(mid)) >= min_ssim:
+                ssim_quality = mid
+                hi = mid - 1
+            else:
+                lo = mid + 1
+    
+    quality = min(budget_quality, ssim_quality)
+    return quality, encode(quality)
+
+BASE83_CHARACTERS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+def _encode_base83(value, length):
+    """blurhash使用的base83编码"""
+    result = ''
+    for i in range(1, length + 1):
+        digit = (value // (83 ** (length - i))) % 83
+        result += BASE83_CHARACTERS[digit]
+    return result
+
+def _srgb_to_linear(value):
+    """sRGB分量(0-255)转线性亮度(0-1)"""
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+def _linear_to_srgb(value):
+    """线性亮度(0-1)转sRGB分量(0-255)"""
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+def encode_blurhash(img, x_components=4, y_components=3):
+    """计算图片的blurhash字符串
+    
+    Args:
+        img: 已缩小的RGB图片（几十像素即可）
+        x_components: 横向分量数
+        y_components: 纵向分量数
+        
+    Returns:
+        str: blurhash
+    """
+    width, height = img.size
+    pixels = [tuple(_srgb_to_linear(c) for c in rgb) for rgb in img.getdata()]
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                basis_y = math.cos(math.pi * j * y / height)
+                row = y * width
+                for x in range(width):
+                    basis = normalisation * math.cos(math.pi * i * x / width) * basis_y
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+    
+    dc, ac = factors[0], factors[1:]
+    result = _encode_base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(v) for factor in ac for v in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        maximum_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum_value = 0, 1
+    result += _encode_base83(quantised_max, 1)
+    result += _encode_base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        quantised = [
+            max(0, min(18, int(math.copysign(abs(v / maximum_value) ** 0.5, v) * 9 + 9.5)))
+            for v in factor
+        ]
+        result += _encode_base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+    return result
+
+def compute_placeholder(img):
+    """根据已解码（通常已缩放到缩略图尺寸）的图片计算前端占位信息，不再读取原图
+    
+    Args:
+        img: PIL图片对象
+        
+    Returns:
+        dict: {'color': 主色调#rrggbb, 'palette': [按占比排序的颜色], 'blurhash': 字符串}
+    """
+    sample = img.convert('RGB')
+    sample.thumbnail((PLACEHOLDER_SAMPLE_SIZE, PLACEHOLDER_SAMPLE_SIZE), Image.BOX)
+    quantized = sample.quantize(colors=PALETTE_SIZE, method=Image.MEDIANCUT)
+    palette = quantized.getpalette()
+    counts = sorted(quantized.getcolors(), reverse=True)
+    colors = [
+        '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3])
+        for _, index in counts
+    ]
+    return {
+        'color': colors[0],
+        'palette': colors,
+        'blurhash': encode_blurhash(sample, *BLURHASH_COMPONENTS)
+    }
+
+def placeholder_from_file(image_path):
+    """从已有的小尺寸压缩版本计算占位信息（旧版本补算用，JPEG按草稿模式解码）"""
+    with Image.open(image_path) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', (PLACEHOLDER_SAMPLE_SIZE * 2, PLACEHOLDER_SAMPLE_SIZE * 2))
+        return compute_placeholder(img)
+
+def save_variant(img, compressed_path, config, fmt=None):
+    """按配置保存一个压缩版本
+    
+    Args:
+        img: 已调整好尺寸的PIL图片对象
+        compressed_path: 输出路径
+        config: CONFIG中对应压缩类型的配置
+        fmt: 输出格式，默认为配置中的兜底格式
+        
+    Returns:
+        int: 使用的质量参数
+    """
+    fmt = fmt or config['format']
+    if QUALITY_SEARCH and (config.get('target_bytes') or config.get('min_ssim')):
+        quality, data = search_quality(img, fmt, config)
+    else:
+        quality, data = config['quality'], encode_image(img, fmt, config['quality'])
+    
+    # 确保目标目录存在
+    os.makedirs(os.path.dirname(compressed_path), exist_ok=True)
+    with open(compressed_path, 'wb') as f:
+        f.write(data)
+    return quality
+
+def compress_image_variants(image_path, compress_types=None, force=False, placeholder=None):
+    """一次解码原图，生成所有压缩版本
+    
+    按目标尺寸从大到小排序后级联缩放（original→1920→1200→600），
+    每一级都从上一级的结果缩放，而不是从原图重复缩放。
+    JPEG源图通过Image.draft在解码阶段直接按2的幂缩小，4K/8K原图解码开销大幅降低。
+    每一级按格式阶梯（AVIF→WebP→JPEG）分别编码输出。
+    最后一级（最小）的缩放结果顺带用于计算占位信息，不额外解码。
     
     Args:
         image_path: 图片路径
-        compress_type: 压缩类型 (thumbnail|preview|original)
+        compress_types: 压缩类型列表 (thumbnail|preview|original)
         force: 是否强制重新压缩已存在的图片
+        placeholder: 传入dict时，写入本次计算的占位信息（见compute_placeholder）
         
     Returns:
-        bool: 是否成功
+        dict: 成功生成（或已存在而跳过）的版本 {compress_type: {format: compressed_path}}
     """
-    try:
-        # 获取压缩配置
+    if compress_types is None:
+        compress_types = ['thumbnail']
+    
+    # 先过滤掉已存在的版本，全部存在时无需打开原图
+    outputs = {}
+    pending = []
+    for compress_type in compress_types:
         config = CONFIG.get(compress_type, CONFIG['thumbnail'])
-        
-        # 构建压缩图片路径
-        compressed_path = get_compressed_path(image_path, compress_type)
-        
-        # 如果压缩图片已存在且不强制重新压缩，则跳过
-        if os.path.exists(compressed_path) and not force:
-            print(f"[跳过] {compressed_path} 已存在")
+        paths = {
+            fmt: get_compressed_path(image_path, compress_type, fmt)
+            for fmt in get_variant_formats(config)
+        }
+        if not force and all(os.path.exists(path) for path in paths.values()):
+            print(f"[跳过] {paths[config['format']]} 已存在")
             stats['skipped'] += 1
-            return True
-        
-        # 打开原图
+            outputs[compress_type] = paths
+            continue
+        pending.append((compress_type, config, paths))
+    
+    if not pending:
+        return outputs
+    
+    # 检查是否包含中文
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    if has_chinese(name):
+        print(f"[警告] 检测到中文文件名: {name}，将进行处理（可先用 content_store.py 按内容哈希存储）")
+    
+    # 按目标框面积从大到小排序，保证级联缩放时每一级都不小于下一级
+    pending.sort(key=lambda item: item[1]['max_width'] * item[1]['max_height'], reverse=True)
+    
+    try:
+        original_size = os.path.getsize(image_path)
         with Image.open(image_path) as img:
-            # 记录原始文件大小
-            original_size = os.path.getsize(image_path)
-            stats['total_size_before'] += original_size
-            
-            # 计算压缩后的尺寸
-            width, height = calculate_compressed_size(
-                img.width, img.height,
-                config['max_width'], config['max_height']
-            )
-            
-            # 调整图片大小
-            if img.width != width or img.height != height:
-                img = img.resize((width, height), Image.LANCZOS)
-            
-            # 确保目标目录存在
-            os.makedirs(os.path.dirname(compressed_path), exist_ok=True)
+            original_width, original_height = img.size
+            targets = [
+                calculate_compressed_size(
+                    original_width, original_height,
+                    config['max_width'], config['max_height']
+                )
+                for _, config, _ in pending
+            ]
             
-            # 保存压缩图片
-            if config['format'] == 'WEBP':
-                img.save(compressed_path, 'WEBP', quality=config['quality'], method=6)
-            else:  # JPEG
-                # 如果原图是RGBA模式（有透明通道），转换为RGB
-                if img.mode == 'RGBA':
-                    img = img.convert('RGB')
-                img.save(compressed_path, 'JPEG', quality=config['quality'], optimize=True)
+            # JPEG源图：按最大目标尺寸降采样解码，解码结果不小于该尺寸
+            if img.format == 'JPEG':
+                img.draft('RGB', targets[0])
             
-            # 记录压缩后文件大小
-            compressed_size = os.path.getsize(compressed_path)
-            stats['total_size_after'] += compressed_size
-            
-            # 计算压缩比例
-            ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
-            
-            print(f"[成功] {image_path} -> {compressed_path}")
-            print(f"       尺寸: {img.width}x{img.height} -> {width}x{height}")
-            print(f"       大小: {original_size/1024:.1f}KB -> {compressed_size/1024:.1f}KB (节省 {ratio:.1f}%)")
-            
-            stats['success'] += 1
-            return True
+            # 调色板/CMYK等模式无法直接高质量缩放，统一转换一次
+            if img.mode in ('RGB', 'RGBA', 'L'):
+                current = img
+                current.load()
+            elif img.mode in ('LA', 'PA') or 'transparency' in img.info:
+                current = img.convert('RGBA')
+            else:
+                current = img.convert('RGB')
+        
+        for (compress_type, config, paths), (width, height) in zip(pending, targets):
+            try:
+                # 从上一级结果缩放；上一级比目标小时（极端宽高比）保持原样
+                if current.width > width or current.height > height:
+                    current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+                
+                print(f"[成功] {image_path} -> {paths[config['format']]}")
+                print(f"       尺寸: {original_width}x{original_height} -> {current.width}x{current.height}")
+                
+                sizes = []
+                for fmt, compressed_path in paths.items():
+                    quality = save_variant(current, compressed_path, config, fmt)
+                    compressed_size = os.path.getsize(compressed_path)
+                    sizes.append(compressed_size)
+                    
+                    # 计算压缩比例
+                    ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
+                    print(f"       {fmt:<4} q={quality:<3} 大小: {original_size/1024:.1f}KB -> {compressed_size/1024:.1f}KB (节省 {ratio:.1f}%)")
+                
+                # 按浏览器实际会下载的最小格式统计
+                stats['total_size_before'] += original_size
+                stats['total_size_after'] += min(sizes)
+                stats['success'] += 1
+                outputs[compress_type] = paths
+            except Exception as e:
+                print(f"[错误] 压缩 {image_path} ({compress_type}) 失败: {str(e)}")
+                stats['error'] += 1
+        
+        if placeholder is not None:
+            try:
+                placeholder.update(compute_placeholder(current))
+            except Exception as e:
+                print(f"[警告] 计算 {image_path} 的占位信息失败: {str(e)}")
+        return outputs
             
     except Exception as e:
         print(f"[错误] 压缩 {image_path} 失败: {str(e)}")
-        stats['error'] += 1
-        return False
+        stats['error'] += len(pending)
+        return outputs
 
-def process_directory(directory=SOURCE_DIR, compress_types=None, force=False):
-    """处理目录中的所有图片
+def compress_image(image_path, compress_type='thumbnail', force=False):
+    """压缩图片
     
     Args:
-        directory: 要处理的目录
-        compress_types: 要生成的压缩类型列表 ['thumbnail', 'preview', 'original']
+        image_path: 图片路径
+        compress_type: 压缩类型 (thumbnail|preview|original)
         force: 是否强制重新压缩已存在的图片
+        
+    Returns:
+        bool: 是否成功
     """
-    if compress_types is None:
-        compress_types = ['thumbnail', 'preview']
+    return compress_type in compress_image_variants(image_path, [compress_type], force)
+
+def open_manifest(manifest_path=None):
+    """打开（必要时创建）增量构建清单数据库
     
-    # 确保目标目录存在
-    os.makedirs(TARGET_DIR, exist_ok=True)
+    Args:
+        manifest_path: 清单文件路径，默认为当前输出根目录下的 MANIFEST_NAME
+        
+    Returns:
+        sqlite3.Connection: 清单数据库连接
+    """
+    conn = sqlite3.connect(manifest_path or default_manifest_path())
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS variants (
+            source_path TEXT NOT NULL,
+            compress_type TEXT NOT NULL,
+            source_size INTEGER NOT NULL,
+            source_mtime REAL NOT NULL,
+            content_hash TEXT NOT NULL,
+            config TEXT NOT NULL,
+            output_path TEXT NOT NULL,
+            outputs TEXT NOT NULL DEFAULT '{}',
+            variant_meta TEXT NOT NULL DEFAULT '{}',
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (source_path, compress_type)
+        )
+    """)
+    # 旧版清单没有outputs列（多格式输出路径），补上后对应记录会被视为过期并重建
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(variants)")]
+    if 'outputs' not in columns:
+        conn.execute("ALTER TABLE variants ADD COLUMN outputs TEXT NOT NULL DEFAULT '{}'")
+    # 旧版清单没有variant_meta列（各格式的宽高和字节数），生成variants.json时按需补齐
+    if 'variant_meta' not in columns:
+        conn.execute("ALTER TABLE variants ADD COLUMN variant_meta TEXT NOT NULL DEFAULT '{}'")
+    # 每张原图一条占位信息（主色调、调色板、blurhash）
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS placeholders (
+            source_path TEXT PRIMARY KEY,
+            color TEXT NOT NULL,
+            palette TEXT NOT NULL,
+            blurhash TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+    return conn
+
+def load_manifest(conn):
+    """一次性读取整个清单到内存
+    
+    Returns:
+        dict: {source_path: {compress_type: 记录字典}}
+    """
+    manifest = {}
+    cursor = conn.execute("""
+        SELECT source_path, compress_type, source_size, source_mtime,
+               content_hash, config, output_path, outputs
+        FROM variants
+    """)
+    for row in cursor:
+        manifest.setdefault(row[0], {})[row[1]] = {
+            'source_size': row[2],
+            'source_mtime': row[3],
+            'content_hash': row[4],
+            'config': row[5],
+            'output_path': row[6],
+            'outputs': json.loads(row[7] or '{}')
+        }
+    return manifest
+
+def save_manifest_records(conn, records):
+    """写入（覆盖）一批清单记录"""
+    if not records:
+        return
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany("""
+        INSERT OR REPLACE INTO variants (
+            source_path, compress_type, source_size, source_mtime,
+            content_hash, config, output_path, outputs, variant_meta, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (r['source_path'], r['compress_type'], r['source_size'], r['source_mtime'],
+         r['content_hash'], r['config'], r['output_path'],
+         json.dumps(r['outputs'], ensure_ascii=False, sort_keys=True),
+         json.dumps(r.get('variant_meta') or {}, sort_keys=True), now)
+        for r in records
+    ])
+    conn.commit()
+
+def load_placeholder_sources(conn):
+    """已有占位信息的源文件键集合"""
+    return set(row[0] for row in conn.execute("SELECT source_path FROM placeholders"))
+
+def save_placeholders(conn, placeholders):
+    """写入（覆盖）一批占位信息
+    
+    Args:
+        conn: 清单数据库连接
+        placeholders: {source_path: compute_placeholder的结果}
+    """
+    if not placeholders:
+        return
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany("""
+        INSERT OR REPLACE INTO placeholders (source_path, color, palette, blurhash, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, [
+        (source, p['color'], json.dumps(p['palette']), p['blurhash'], now)
+        for source, p in placeholders.items()
+    ])
+    conn.commit()
+
+def config_fingerprint(compress_type):
+    """压缩配置的规范化字符串，配置变化时对应版本需要重建
+    
+    启用质量搜索时计入搜索模式及其字节预算、SSIM下限和采样尺寸，
+    对已有图库开启或关闭 -q 时相应版本会被重建，不需要 --force。
+    """
+    config = dict(CONFIG.get(compress_type, CONFIG['thumbnail']))
+    if QUALITY_SEARCH:
+        config['quality_search'] = {
+            'target_bytes': config.get('target_bytes'),
+            'min_ssim': config.get('min_ssim'),
+            'ssim_sample_size': SSIM_SAMPLE_SIZE
+        }
+    return json.dumps(config, sort_keys=True)
+
+def config_digest(compress_type):
+    """压缩配置的短摘要，内容寻址布局下拼入压缩版本文件名"""
+    return hashlib.sha256(config_fingerprint(compress_type).encode('utf-8')).hexdigest()[:CONFIG_DIGEST_LENGTH]
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_key(file_path):
+    """清单中源文件的统一键"""
+    return os.path.normcase(os.path.abspath(file_path))
+
+def get_variant_paths(file_path, compress_type):
+    """某压缩类型在当前布局和格式阶梯下的全部输出路径 {format: path}"""
+    config = CONFIG.get(compress_type, CONFIG['thumbnail'])
+    return {
+        fmt: get_compressed_path(file_path, compress_type, fmt)
+        for fmt in get_variant_formats(config)
+    }
+
+def entry_paths(entry):
+    """清单记录引用的所有输出文件路径"""
+    return set(entry['outputs'].values()) | {entry['output_path']}
+
+def describe_variant_outputs(paths):
+    """读取一个压缩类型各格式输出的宽高和字节数
     
-    # 遍历目录中的所有文件
-    for root, _, files in os.walk(directory):
-        # 跳过目标目录，避免重复处理或死循环
-        if os.path.normpath(root) == os.path.normpath(TARGET_DIR):
+    同一压缩类型的各格式尺寸相同，只读取一个文件的头信息（不解码像素）。
+    
+    Args:
+        paths: {format: 输出路径}
+        
+    Returns:
+        dict: {format: {'width': 宽, 'height': 高, 'bytes': 字节数}}，文件缺失的格式不包含在内
+    """
+    existing = {fmt: path for fmt, path in paths.items() if os.path.exists(path)}
+    if not existing:
+        return {}
+    width = height = 0
+    for path in existing.values():
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+            break
+        except Exception:
+            continue
+    return {
+        fmt: {'width': width, 'height': height, 'bytes': os.path.getsize(path)}
+        for fmt, path in existing.items()
+    }
+
+def is_variant_fresh(entry, file_stat, compress_type, file_path):
+    """仅凭清单和一次stat判断版本是否最新（不打开文件）
+    
+    输出布局或可用格式变化（如启用分片、Pillow新增AVIF支持）时，
+    清单中的输出路径与当前不一致，也视为过期。
+    """
+    return (
+        entry is not None
+        and entry['source_size'] == file_stat.st_size
+        and entry['source_mtime'] == file_stat.st_mtime
+        and entry['config'] == config_fingerprint(compress_type)
+        and entry['outputs'] == get_variant_paths(file_path, compress_type)
+    )
+
+def collect_image_files(directory=SOURCE_DIR):
+    """收集目录中所有待压缩的图片路径
+    
+    Args:
+        directory: 要处理的目录
+        
+    Returns:
+        list: 图片完整路径列表
+    """
+    # 跳过所有压缩版本输出目录，避免重复处理或死循环
+    variant_dirs = set(os.path.normpath(get_variant_dir(t)) for t in VARIANT_DIRS)
+    image_files = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if os.path.normpath(os.path.join(root, d)) not in variant_dirs]
+        if os.path.normpath(root) in variant_dirs:
             continue
             
         for file in files:
             # 检查文件扩展名
             if not file.lower().endswith(SUPPORTED_FORMATS):
                 continue
+            image_files.append(os.path.join(root, file))
+    return image_files
+
+def process_file(file_path, compress_types, force=False, entries=None, need_placeholder=False):
+    """按清单增量处理单个源文件
+    
+    大小或修改时间变化但内容哈希不变时只刷新清单；
+    清单中没有记录但输出已存在且比源文件新时直接收录，避免首次启用清单时全量重建。
+    重新压缩时顺带计算占位信息；无需压缩但缺少占位信息时从最小的已有版本补算，不读取原图。
+    
+    Args:
+        file_path: 图片路径
+        compress_types: 要生成的压缩类型列表
+        force: 是否强制重新压缩
+        entries: 该源文件已有的清单记录 {compress_type: 记录字典}
+        need_placeholder: 该源文件是否还没有占位信息
+        
+    Returns:
+        tuple: (需要写回清单的记录列表, 新的占位信息dict或None)
+    """
+    entries = entries or {}
+    file_stat = os.stat(file_path)
+    content_hash = None
+    stale_types = []
+    fresh_types = []
+    
+    for compress_type in compress_types:
+        entry = entries.get(compress_type)
+        if force:
+            stale_types.append(compress_type)
+            continue
+        if is_variant_fresh(entry, file_stat, compress_type, file_path):
+            fresh_types.append(compress_type)
+            continue
+        
+        paths = get_variant_paths(file_path, compress_type)
+        if entry is not None and entry['config'] == config_fingerprint(compress_type) \
+                and entry['outputs'] == paths:
+            # 只有大小/时间变了：内容未变则无需重建
+            if content_hash is None:
+                content_hash = file_content_hash(file_path)
+            if content_hash == entry['content_hash'] and all(os.path.exists(p) for p in paths.values()):
+                fresh_types.append(compress_type)
+                continue
+        elif entry is None:
+            # 旧版本遗留的输出：比源文件新则直接收录
+            if all(os.path.exists(p) and os.path.getmtime(p) >= file_stat.st_mtime for p in paths.values()):
+                fresh_types.append(compress_type)
+                continue
+        stale_types.append(compress_type)
+    
+    stats['skipped'] += len(fresh_types)
+    outputs = {}
+    for compress_type in fresh_types:
+        outputs[compress_type] = get_variant_paths(file_path, compress_type)
+    placeholder = {}
+    if stale_types:
+        outputs.update(compress_image_variants(file_path, stale_types, force=True, placeholder=placeholder))
+    if not placeholder and need_placeholder and outputs:
+        smallest = min(outputs, key=lambda t: CONFIG[t]['max_width'] * CONFIG[t]['max_height'])
+        try:
+            placeholder = placeholder_from_file(outputs[smallest][CONFIG[smallest]['format']])
+        except Exception as e:
+            print(f"[警告] 补算 {file_path} 的占位信息失败: {str(e)}")
+    
+    # 只需在记录有变化时写回清单
+    records = []
+    for compress_type, paths in outputs.items():
+        if compress_type in fresh_types and is_variant_fresh(entries.get(compress_type), file_stat, compress_type, file_path):
+            continue
+        if content_hash is None:
+            content_hash = file_content_hash(file_path)
+        records.append({
+            'source_path': source_key(file_path),
+            'compress_type': compress_type,
+            'source_size': file_stat.st_size,
+            'source_mtime': file_stat.st_mtime,
+            'content_hash': content_hash,
+            'config': config_fingerprint(compress_type),
+            'output_path': paths[CONFIG.get(compress_type, CONFIG['thumbnail'])['format']],
+            'outputs': paths,
+            'variant_meta': describe_variant_outputs(paths)
+        })
+    return records, placeholder or None
+
+def compress_file_worker(file_path, compress_types, force=False, entries=None, need_placeholder=False):
+    """子进程任务：处理单个文件的所有压缩类型
+    
+    子进程中的stats是独立副本，每个任务开始前清零，
+    结束后把本任务的统计增量、清单记录和占位信息返回给主进程合并。
+    
+    Args:
+        file_path: 图片路径
+        compress_types: 要生成的压缩类型列表
+        force: 是否强制重新压缩已存在的图片
+        entries: 该源文件已有的清单记录
+        need_placeholder: 该源文件是否还没有占位信息
+        
+    Returns:
+        tuple: (本任务的统计增量, 清单记录列表, 占位信息dict或None)
+    """
+    for key in stats:
+        stats[key] = 0
+    stats['total'] = 1
+    records, placeholder = process_file(file_path, compress_types, force, entries, need_placeholder)
+    return dict(stats), records, placeholder
+
+def merge_stats(worker_stats):
+    """把子进程返回的统计增量合并到全局stats"""
+    for key, value in worker_stats.items():
+        stats[key] += value
+
+def collect_orphans(conn, manifest, live_sources, directory):
+    """清理孤立的压缩版本：源文件已不存在时删除其输出和清单记录
+    
+    同一输出路径仍被其他有效记录引用时只删除记录，不删除文件。
+    
+    Args:
+        conn: 清单数据库连接
+        manifest: load_manifest读取的清单
+        live_sources: 本次扫描到的源文件键集合
+        directory: 本次扫描的目录，只清理该目录下的源文件
+        
+    Returns:
+        int: 删除的输出文件数
+    """
+    prefix = source_key(directory).rstrip(os.sep) + os.sep
+    orphan_sources = [
+        source for source in manifest
+        if source.startswith(prefix) and source not in live_sources
+    ]
+    if not orphan_sources:
+        return 0
+    
+    orphan_set = set(orphan_sources)
+    live_outputs = set(
+        path
+        for source, entries in manifest.items() if source not in orphan_set
+        for entry in entries.values()
+        for path in entry_paths(entry)
+    )
+    removed = 0
+    for source in orphan_sources:
+        for entry in manifest[source].values():
+            for output_path in entry_paths(entry):
+                if output_path in live_outputs or not os.path.exists(output_path):
+                    continue
+                try:
+                    os.remove(output_path)
+                    removed += 1
+                    print(f"[清理] 源文件已删除，移除 {output_path}")
+                except OSError as e:
+                    print(f"[错误] 清理 {output_path} 失败: {str(e)}")
+    conn.executemany("DELETE FROM variants WHERE source_path = ?", [(s,) for s in orphan_sources])
+    conn.executemany("DELETE FROM placeholders WHERE source_path = ?", [(s,) for s in orphan_sources])
+    conn.commit()
+    return removed
+
+def remove_replaced_outputs(conn, replaced_outputs):
+    """删除因输出布局变化而不再被任何清单记录引用的旧输出文件
+    
+    Returns:
+        int: 删除的文件数
+    """
+    if not replaced_outputs:
+        return 0
+    live_outputs = set()
+    for output_path, outputs in conn.execute("SELECT output_path, outputs FROM variants"):
+        live_outputs.add(output_path)
+        live_outputs.update(json.loads(outputs or '{}').values())
+    removed = 0
+    for output_path in set(replaced_outputs):
+        if output_path in live_outputs or not os.path.exists(output_path):
+            continue
+        try:
+            os.remove(output_path)
+            removed += 1
+            print(f"[清理] 输出路径已变更，移除 {output_path}")
+        except OSError as e:
+            print(f"[错误] 清理 {output_path} 失败: {str(e)}")
+    return removed
+
+def write_variants_json(conn, json_path=None):
+    """根据清单生成前端使用的压缩版本清单
+    
+    格式: {原图URL路径: {压缩类型: {格式: {'url', 'width', 'height', 'bytes'}}}}，格式为 avif/webp/jpeg。
+    update_list.py 把它按壁纸合并进列表数据，前端据此直接选出图片地址并生成srcset，无需HEAD探测。
+    旧清单记录缺少宽高/字节数时在此补齐并写回清单。
+    
+    Args:
+        conn: 清单数据库连接
+        json_path: 输出文件路径，默认VARIANTS_JSON_PATH
+    """
+    json_path = json_path or VARIANTS_JSON_PATH
+    variants = {}
+    backfill = []
+    cursor = conn.execute("""
+        SELECT source_path, compress_type, outputs, variant_meta
+        FROM variants ORDER BY source_path
+    """)
+    for source_path, compress_type, outputs, variant_meta in cursor.fetchall():
+        outputs = json.loads(outputs or '{}')
+        meta = json.loads(variant_meta or '{}')
+        if set(meta) != set(outputs):
+            meta = describe_variant_outputs(outputs)
+            backfill.append((json.dumps(meta, sort_keys=True), source_path, compress_type))
+        formats = {}
+        for fmt, path in outputs.items():
+            if fmt not in meta:
+                continue
+            formats[fmt.lower()] = dict(meta[fmt], url=to_web_path(path))
+        if formats:
+            variants.setdefault(to_web_path(source_path), {})[compress_type] = formats
+    
+    if backfill:
+        conn.executemany(
+            "UPDATE variants SET variant_meta = ? WHERE source_path = ? AND compress_type = ?",
+            backfill
+        )
+        conn.commit()
+    
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(variants, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, json_path)
+    print(f"\n压缩版本清单已更新: {json_path} ({len(variants)} 张原图)")
+
+def write_placeholders_json(conn, json_path=None):
+    """根据清单生成前端使用的占位信息清单
+    
+    格式: {原图URL路径: {'color': 主色调, 'palette': [颜色...], 'blurhash': 字符串}}，
+    update_list.py 把它按壁纸合并进列表数据和数据库。
+    
+    Args:
+        conn: 清单数据库连接
+        json_path: 输出文件路径，默认PLACEHOLDERS_JSON_PATH
+    """
+    json_path = json_path or PLACEHOLDERS_JSON_PATH
+    placeholders = {}
+    cursor = conn.execute("SELECT source_path, color, palette, blurhash FROM placeholders ORDER BY source_path")
+    for source_path, color, palette, blurhash in cursor:
+        placeholders[to_web_path(source_path)] = {
+            'color': color,
+            'palette': json.loads(palette or '[]'),
+            'blurhash': blurhash
+        }
+    
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(placeholders, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, json_path)
+    print(f"占位信息清单已更新: {json_path} ({len(placeholders)} 张原图)")
+
+def process_directory(directory=SOURCE_DIR, compress_types=None, force=False, workers=1,
+                      manifest_path=None, gc=True):
+    """处理目录中的所有图片
+    
+    Args:
+        directory: 要处理的目录
+        compress_types: 要生成的压缩类型列表 ['thumbnail', 'preview', 'original']
+        force: 是否强制重新压缩已存在的图片
+        workers: 并行进程数，1表示在当前进程中顺序处理
+        manifest_path: 增量构建清单路径，默认为当前输出根目录下的 MANIFEST_NAME
+        gc: 是否清理源文件已删除的压缩版本
+    """
+    if compress_types is None:
+        compress_types = ['thumbnail', 'preview']
+    
+    # 确保输出目录存在
+    for compress_type in compress_types:
+        os.makedirs(get_variant_dir(compress_type), exist_ok=True)
+    
+    conn = open_manifest(manifest_path)
+    manifest = load_manifest(conn)
+    placeholder_sources = load_placeholder_sources(conn)
+    image_files = collect_image_files(directory)
+    # update_list.py 判定为重复的图片不入库也不压缩，之前生成的压缩版本随后作为孤立版本清理
+    duplicates = image_hash.load_duplicates_report()
+    if duplicates:
+        image_files = [f for f in image_files if os.path.basename(f) not in duplicates]
+        print(f"跳过重复图片: {len(duplicates)} 张")
+    live_sources = set()
+    pending_records = []
+    
+    replaced_outputs = []
+    pending_placeholders = {}
+    
+    def add_records(file_path, records, placeholder):
+        # 记录因布局或格式变化而被替换的旧输出路径，稍后清理
+        for record in records:
+            entry = manifest.get(record['source_path'], {}).get(record['compress_type'])
+            if entry:
+                replaced_outputs.extend(entry_paths(entry) - set(record['outputs'].values()))
+        pending_records.extend(records)
+        if placeholder:
+            pending_placeholders[source_key(file_path)] = placeholder
+        if len(pending_records) + len(pending_placeholders) >= MANIFEST_COMMIT_BATCH:
+            save_manifest_records(conn, pending_records)
+            save_placeholders(conn, pending_placeholders)
+            del pending_records[:]
+            pending_placeholders.clear()
+    
+    # 快速路径：清单记录与stat一致的文件直接跳过，不打开、不提交任务
+    jobs = []
+    for file_path in image_files:
+        key = source_key(file_path)
+        live_sources.add(key)
+        entries = manifest.get(key, {})
+        if not force:
+            try:
+                file_stat = os.stat(file_path)
+            except OSError as e:
+                print(f"[错误] 读取 {file_path} 失败: {str(e)}")
+                stats['total'] += 1
+                stats['error'] += 1
+                continue
+            if key in placeholder_sources and \
+                    all(is_variant_fresh(entries.get(t), file_stat, t, file_path) for t in compress_types):
+                stats['total'] += 1
+                stats['skipped'] += len(compress_types)
+                continue
+        jobs.append((file_path, entries, key not in placeholder_sources))
+    
+    try:
+        if workers <= 1:
+            for file_path, entries, need_placeholder in jobs:
+                # 统计总数
+                stats['total'] += 1
                 
-            # 构建完整路径
-            file_path = os.path.join(root, file)
-            
-            # 统计总数
-            stats['total'] += 1
-            
-            # 对每种压缩类型进行处理
-            for compress_type in compress_types:
-                compress_image(file_path, compress_type, force)
+                # 一次解码生成所有压缩类型
+                try:
+                    add_records(file_path, *process_file(file_path, compress_types, force, entries,
+                                                         need_placeholder))
+                except Exception as e:
+                    print(f"[错误] 处理 {file_path} 失败: {str(e)}")
+                    stats['error'] += 1
+        else:
+            # 多进程模式：按文件分发，每个文件的所有压缩类型在同一进程中完成
+            with ProcessPoolExecutor(max_workers=workers, initializer=set_output_layout,
+                                     initargs=(OUTPUT_ROOT, SHARD_DEPTH, QUALITY_SEARCH,
+                                               CONTENT_ADDRESSED)) as executor:
+                futures = {
+                    executor.submit(compress_file_worker, file_path, compress_types, force, entries,
+                                    need_placeholder): file_path
+                    for file_path, entries, need_placeholder in jobs
+                }
+                for future in as_completed(futures):
+                    try:
+                        worker_stats, records, placeholder = future.result()
+                        merge_stats(worker_stats)
+                        add_records(futures[future], records, placeholder)
+                    except Exception as e:
+                        print(f"[错误] 子进程处理 {futures[future]} 失败: {str(e)}")
+                        stats['total'] += 1
+                        stats['error'] += 1
+        
+        save_manifest_records(conn, pending_records)
+        save_placeholders(conn, pending_placeholders)
+        if gc:
+            removed = collect_orphans(conn, manifest, live_sources, directory)
+            removed += remove_replaced_outputs(conn, replaced_outputs)
+            if removed:
+                print(f"\n已清理 {removed} 个孤立的压缩版本")
+        write_variants_json(conn)
+        write_placeholders_json(conn)
+    finally:
+        conn.close()
 
 def print_stats():
     """打印统计信息"""
@@ -243,21 +1231,48 @@ def main():
     parser.add_argument('-t', '--types', nargs='+', choices=['thumbnail', 'preview', 'original'],
                         default=['preview'], help='要生成的压缩类型')
     parser.add_argument('-f', '--force', action='store_true', help='强制重新压缩已存在的图片')
-    parser.add_argument('-d', '--directory', default=SOURCE_DIR, help='要处理的目录')
+    parser.add_argument('-d', '--directory', default=None,
+                        help='要处理的目录（默认 SOURCE_DIR，内容寻址布局下默认 OBJECT_ROOT）')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='并行进程数，默认1（顺序处理），0表示使用全部CPU核心')
+    parser.add_argument('-m', '--manifest', default=None,
+                        help=f'增量构建清单文件路径（默认: 输出根目录下的 {MANIFEST_NAME}）')
+    parser.add_argument('-o', '--output-root', default=None,
+                        help='压缩版本输出根目录（其下按类型分为 thumb/preview/large，默认与 -d 的默认值相同）')
+    parser.add_argument('-s', '--shard-depth', type=int, default=SHARD_DEPTH,
+                        help='按文件名哈希前缀分片的层数，0表示不分片')
+    parser.add_argument('-q', '--quality-search', action='store_true',
+                        help='按CONFIG中的字节预算(target_bytes)和SSIM下限(min_ssim)逐图二分搜索质量')
+    parser.add_argument('-c', '--content-addressed', action='store_true',
+                        help='内容寻址布局：处理 content_store.py 存入的原图，压缩版本按源哈希和配置摘要命名')
+    parser.add_argument('--no-gc', action='store_true', help='不清理源文件已删除的压缩版本')
     
     args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    directory = args.directory or (OBJECT_ROOT if args.content_addressed else SOURCE_DIR)
+    set_output_layout(args.output_root or (OBJECT_ROOT if args.content_addressed else OUTPUT_ROOT),
+                      args.shard_depth, args.quality_search, args.content_addressed)
     
-    print(f"开始处理目录: {args.directory}")
+    print(f"开始处理目录: {directory}")
     print(f"压缩类型: {', '.join(args.types)}")
     print(f"强制重新压缩: {'是' if args.force else '否'}")
+    print(f"并行进程数: {workers}")
+    print(f"输出目录: {OUTPUT_ROOT} (分片层数: {SHARD_DEPTH})")
+    print(f"内容寻址布局: {'是' if CONTENT_ADDRESSED else '否'}")
+    print(f"清单文件: {args.manifest or default_manifest_path()}")
+    print(f"质量搜索: {'是' if QUALITY_SEARCH else '否'}")
     print("\n开始处理...\n")
     
     start_time = time.time()
-    process_directory(args.directory, args.types, args.force)
+    process_directory(directory, args.types, args.force, workers,
+                      args.manifest or default_manifest_path(), not args.no_gc)
     end_time = time.time()
     
     print_stats()
-    print(f"\n处理完成，耗时: {end_time - start_time:.2f}秒")
+    elapsed = end_time - start_time
+    print(f"\n处理完成，耗时: {elapsed:.2f}秒")
+    if elapsed > 0:
+        print(f"吞吐量: {stats['total'] / elapsed:.2f} 张/秒")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
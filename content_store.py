@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+壁纸原图内容寻址存储
+- static/wallpapers/ 中的原图按用户上传时的文件名平铺存放（常含中文、空格、括号），URL 随改名变化、无法长期缓存
+- 本脚本把每张原图按内容 SHA-256 存入 static/objects/<前2位>/<3-4位>/<哈希>.<扩展名>，
+  文件名到对象的映射记录在 instance/content_store.db，并导出 static/data/content_map.json 供 update_list.py 合并进列表（url 字段）
+- 对象路径只由内容决定：内容不变 URL 永不变化，可配合 static/objects/.htaccess 的远期 Cache-Control 永久缓存；
+  原图改名或重复上传相同内容只新增一条映射，不复制、不重新上传字节
+- 压缩版本按同样的布局生成：compress_wallpapers.py -c（见 手动启动.md）
+- 默认复制原图；--link 改为硬链接，不占额外磁盘，但原图之后不能被原地修改
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
+import compress_wallpapers
+import image_hash
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DB_PATH = os.path.join(BASE_DIR, 'instance', 'content_store.db')
+CONTENT_MAP_JSON_PATH = os.path.join(compress_wallpapers.WEB_ROOT, 'static', 'data', 'content_map.json')
+
+# 对象目录层数（每层取哈希的2个十六进制字符，每个目录最多256个子目录）
+SHARD_LEVELS = 2
+
+# 同一格式的不同扩展名统一存储，避免相同内容因扩展名不同存成两个对象
+EXTENSION_ALIASES = {
+    '.jpg': '.jpeg'
+}
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def object_relpath(content_hash, extension):
+    """
+    对象相对 OBJECT_ROOT 的路径，如 ab/cd/abcdef....jpeg
+    Args:
+        content_hash (str): 内容SHA-256（十六进制）
+        extension (str): 原图扩展名
+    Returns:
+        str: 相对路径
+    """
+    extension = extension.lower()
+    extension = EXTENSION_ALIASES.get(extension, extension)
+    parts = [content_hash[i * 2:i * 2 + 2] for i in range(SHARD_LEVELS)]
+    return os.path.join(*parts, content_hash + extension)
+
+
+def open_store(db_path=None):
+    """
+    打开（必要时创建）映射数据库
+    Args:
+        db_path (str): 数据库路径，默认 STORE_DB_PATH
+    Returns:
+        sqlite3.Connection: 数据库连接
+    """
+    db_path = db_path or STORE_DB_PATH
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS objects (
+            logical_path TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            object_path TEXT NOT NULL,
+            source_size INTEGER NOT NULL,
+            source_mtime REAL NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_objects_hash ON objects (content_hash)")
+    conn.commit()
+    return conn
+
+
+def load_store(conn):
+    """
+    一次性读取全部映射
+    Returns:
+        dict: {原图URL路径: {'content_hash', 'object_path', 'source_size', 'source_mtime'}}
+    """
+    mapping = {}
+    cursor = conn.execute("""
+        SELECT logical_path, content_hash, object_path, source_size, source_mtime FROM objects
+    """)
+    for row in cursor:
+        mapping[row[0]] = {
+            'content_hash': row[1],
+            'object_path': row[2],
+            'source_size': row[3],
+            'source_mtime': row[4]
+        }
+    return mapping
+
+
+def store_file(file_path, link=False):
+    """
+    把一个文件存入对象目录
+    先计算内容哈希，已存在相同内容的对象时（改名、重复上传）不再写入任何字节；
+    新对象先写临时文件再改名，不会留下写了一半的对象
+    Args:
+        file_path (str): 原图路径
+        link (bool): 使用硬链接代替复制（失败时回退为复制）
+    Returns:
+        tuple: (内容哈希, 对象路径)
+    """
+    content_hash = compress_wallpapers.file_content_hash(file_path, CHUNK_SIZE)
+    object_path = os.path.join(compress_wallpapers.OBJECT_ROOT,
+                               object_relpath(content_hash, os.path.splitext(file_path)[1]))
+    if os.path.exists(object_path):
+        return content_hash, object_path
+
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    tmp_path = os.path.join(compress_wallpapers.OBJECT_ROOT, f".ingest-{uuid.uuid4().hex}.tmp")
+    try:
+        linked = False
+        if link:
+            try:
+                os.link(file_path, tmp_path)
+                linked = True
+            except OSError:
+                pass
+        if not linked:
+            shutil.copy2(file_path, tmp_path)
+        os.replace(tmp_path, object_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return content_hash, object_path
+
+
+def ingest_file(conn, file_path, mapping=None, link=False):
+    """
+    存入单个原图并记录映射；大小和修改时间与映射一致且对象存在时直接返回，不读取文件
+    Args:
+        conn: 映射数据库连接
+        file_path (str): 原图路径
+        mapping (dict): load_store 读取的映射，传入时同步更新
+        link (bool): 使用硬链接代替复制
+    Returns:
+        tuple: (对象路径, 是否新写入映射)
+    """
+    logical_path = compress_wallpapers.to_web_path(file_path)
+    file_stat = os.stat(file_path)
+    entry = (mapping or {}).get(logical_path)
+    if entry is None and mapping is None:
+        row = conn.execute(
+            "SELECT object_path, source_size, source_mtime FROM objects WHERE logical_path = ?",
+            (logical_path,)
+        ).fetchone()
+        if row:
+            entry = {'object_path': row[0], 'source_size': row[1], 'source_mtime': row[2]}
+    if entry and entry['source_size'] == file_stat.st_size and entry['source_mtime'] == file_stat.st_mtime \
+            and os.path.exists(entry['object_path']):
+        return entry['object_path'], False
+
+    content_hash, object_path = store_file(file_path, link)
+    conn.execute("""
+        INSERT OR REPLACE INTO objects (
+            logical_path, content_hash, object_path, source_size, source_mtime, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, (logical_path, content_hash, object_path, file_stat.st_size, file_stat.st_mtime,
+          datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    if mapping is not None:
+        mapping[logical_path] = {
+            'content_hash': content_hash,
+            'object_path': object_path,
+            'source_size': file_stat.st_size,
+            'source_mtime': file_stat.st_mtime
+        }
+    return object_path, True
+
+
+def collect_garbage(conn, mapping, live_paths):
+    """
+    删除原图已不存在的映射，以及不再被任何映射引用的对象
+    其压缩版本在下次 compress_wallpapers.py -c 运行时作为孤立版本清理
+    Args:
+        conn: 映射数据库连接
+        mapping (dict): load_store 读取（并经 ingest_file 更新）的映射
+        live_paths (set): 本次扫描到的原图URL路径
+    Returns:
+        tuple: (删除的映射数, 删除的对象数)
+    """
+    stale = [path for path in mapping if path not in live_paths]
+    for path in stale:
+        del mapping[path]
+    conn.executemany("DELETE FROM objects WHERE logical_path = ?", [(path,) for path in stale])
+    conn.commit()
+
+    referenced = set(os.path.normcase(entry['object_path']) for entry in mapping.values())
+    removed = 0
+    for root, dirs, files in os.walk(compress_wallpapers.OBJECT_ROOT):
+        # 只清理哈希分片目录，压缩版本目录由 compress_wallpapers.py 管理
+        if root == compress_wallpapers.OBJECT_ROOT:
+            dirs[:] = [d for d in dirs if d not in compress_wallpapers.VARIANT_DIRS.values()]
+            continue
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.normcase(path) in referenced:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+                print(f"🧹 对象已无引用，移除 {path}")
+            except OSError as e:
+                print(f"❌ 移除 {path} 失败: {e}")
+    return len(stale), removed
+
+
+def write_content_map_json(conn, json_path=None):
+    """
+    导出前端/列表使用的映射：{原图URL路径: 对象URL路径}
+    Args:
+        conn: 映射数据库连接
+        json_path (str): 输出路径，默认 CONTENT_MAP_JSON_PATH
+    Returns:
+        int: 映射条数
+    """
+    json_path = json_path or CONTENT_MAP_JSON_PATH
+    content_map = {
+        logical_path: compress_wallpapers.to_web_path(object_path)
+        for logical_path, object_path in conn.execute(
+            "SELECT logical_path, object_path FROM objects ORDER BY logical_path")
+    }
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    tmp_path = json_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(content_map, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, json_path)
+    return len(content_map)
+
+
+def ingest_directory(directory=None, link=False, gc=True, db_path=None):
+    """
+    把目录中的所有原图存入对象目录并更新映射
+    Args:
+        directory (str): 原图目录，默认 compress_wallpapers.SOURCE_DIR
+        link (bool): 使用硬链接代替复制
+        gc (bool): 是否清理已删除原图的映射和无引用的对象
+        db_path (str): 映射数据库路径
+    Returns:
+        dict: {'total', 'stored', 'skipped', 'error'}
+    """
+    directory = directory or compress_wallpapers.SOURCE_DIR
+    conn = open_store(db_path)
+    try:
+        mapping = load_store(conn)
+        # update_list.py 判定为重复的图片不入库，也不存入对象目录
+        duplicates = image_hash.load_duplicates_report()
+        result = {'total': 0, 'stored': 0, 'skipped': 0, 'error': 0}
+        live_paths = set()
+        for file_path in compress_wallpapers.collect_image_files(directory):
+            if os.path.basename(file_path) in duplicates:
+                continue
+            result['total'] += 1
+            logical_path = compress_wallpapers.to_web_path(file_path)
+            live_paths.add(logical_path)
+            try:
+                object_path, stored = ingest_file(conn, file_path, mapping, link)
+            except OSError as e:
+                print(f"❌ 存入 {file_path} 失败: {e}")
+                result['error'] += 1
+                continue
+            if stored:
+                result['stored'] += 1
+                print(f"📦 {logical_path} -> {compress_wallpapers.to_web_path(object_path)}")
+            else:
+                result['skipped'] += 1
+        conn.commit()
+
+        if gc:
+            # 只清理本次扫描目录下的映射，其他目录的原图不受影响
+            prefix = compress_wallpapers.to_web_path(directory).rstrip('/') + '/'
+            outside = set(path for path in mapping if not path.startswith(prefix))
+            removed_entries, removed_objects = collect_garbage(conn, mapping, live_paths | outside)
+            if removed_entries or removed_objects:
+                print(f"🧹 已清理 {removed_entries} 条映射、{removed_objects} 个对象")
+        count = write_content_map_json(conn)
+        print(f"🗺️ 内容映射已更新: {CONTENT_MAP_JSON_PATH} ({count} 张原图)")
+        return result
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把原图按内容哈希存入 static/objects 并生成映射')
+    parser.add_argument('-d', '--directory', default=compress_wallpapers.SOURCE_DIR, help='原图目录')
+    parser.add_argument('--link', action='store_true', help='使用硬链接代替复制（原图之后不能被原地修改）')
+    parser.add_argument('--no-gc', action='store_true', help='不清理已删除原图的映射和对象')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    result = ingest_directory(args.directory, args.link, not args.no_gc)
+    print(f"✅ 共 {result['total']} 张原图：新存入 {result['stored']}，未变化 {result['skipped']}，"
+          f"失败 {result['error']}，用时 {time.time() - start_time:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
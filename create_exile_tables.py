@@ -56,7 +56,8 @@ def create_tables():
             new_status TINYINT(1) NOT NULL,
             comment TEXT,
             INDEX (wallpaper_id),
-            INDEX (operation_time)
+            INDEX (operation_time),
+            INDEX idx_operation_time_id (operation_time, id)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
         """
         cursor.execute(create_operation_log_table_sql)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上传壁纸压缩版本生成队列 worker
+- api/upload_wallpaper.php 保存原图并入库后，把任务写入 instance/derivative_queue/pending/<时间>-<ID>-<随机>.json 后立即返回
+- 本脚本常驻运行，轮询队列，用有限大小的进程池调用 compress_wallpapers 生成缩略图/预览图
+- 每有任务完成就写回压缩清单、重写 variants.json 和 placeholders.json，并把壁纸条目合并进 list.json 及其分片、刷新排序索引，
+  新上传的壁纸通常几秒内即可使用压缩版本
+- 失败的任务按指数退避放回 pending/ 重试，超过 MAX_ATTEMPTS 次后移入 failed/ 等待人工处理
+- 启动时把上次中断时遗留在 processing/ 中的任务放回 pending/
+- 同一时间只应运行一个 worker（压缩清单和 list.json 由它独占写入）
+- -c 内容寻址模式：先用 content_store.py 把原图按内容哈希存入 static/objects，再按内容寻址布局生成压缩版本
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import build_search_index
+import compress_wallpapers
+import content_store
+import update_list
+
+QUEUE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'derivative_queue')
+PENDING_DIR = os.path.join(QUEUE_DIR, 'pending')
+PROCESSING_DIR = os.path.join(QUEUE_DIR, 'processing')
+FAILED_DIR = os.path.join(QUEUE_DIR, 'failed')
+
+# list.json 与 variants.json 位于同一目录
+DATA_DIR = os.path.dirname(compress_wallpapers.VARIANTS_JSON_PATH)
+
+DEFAULT_TYPES = ['thumbnail', 'preview']
+DEFAULT_WORKERS = 2
+
+# 队列为空时的轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+# 最多尝试次数，第n次失败后等待 RETRY_BASE_DELAY * 2^(n-1) 秒再重试
+MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 10
+
+
+def read_job(path):
+    """
+    读取任务文件
+    Args:
+        path (str): 任务文件路径
+    Returns:
+        dict: 任务内容
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        job = json.load(f)
+    if not isinstance(job, dict):
+        raise ValueError('任务内容不是JSON对象')
+    return job
+
+
+def write_job(path, job):
+    """
+    原子写入任务文件
+    Args:
+        path (str): 任务文件路径
+        job (dict): 任务内容
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def recover_processing():
+    """
+    把上次中断时未完成的任务放回 pending/
+    Returns:
+        int: 恢复的任务数
+    """
+    recovered = 0
+    for name in os.listdir(PROCESSING_DIR):
+        if name.endswith('.json'):
+            os.replace(os.path.join(PROCESSING_DIR, name), os.path.join(PENDING_DIR, name))
+            recovered += 1
+    return recovered
+
+
+def claim_jobs(limit):
+    """
+    按入队顺序领取到期的任务（移动到 processing/）
+    Args:
+        limit (int): 最多领取的任务数
+    Returns:
+        list: [(processing中的任务路径, 任务内容), ...]
+    """
+    claimed = []
+    if limit <= 0:
+        return claimed
+    now = time.time()
+    for name in sorted(os.listdir(PENDING_DIR)):
+        if len(claimed) >= limit:
+            break
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(PENDING_DIR, name)
+        try:
+            job = read_job(path)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            print(f"❌ 任务文件损坏，移入 failed/: {name} ({e})")
+            os.replace(path, os.path.join(FAILED_DIR, name))
+            continue
+        if job.get('not_before', 0) > now:
+            continue
+        target = os.path.join(PROCESSING_DIR, name)
+        try:
+            os.replace(path, target)
+        except FileNotFoundError:
+            continue
+        claimed.append((target, job))
+    return claimed
+
+
+def fail_job(job_path, job, error):
+    """
+    记录失败：未达到最大次数时按指数退避放回 pending/，否则移入 failed/
+    Args:
+        job_path (str): processing 中的任务路径
+        job (dict): 任务内容
+        error: 失败原因
+    """
+    name = os.path.basename(job_path)
+    job['attempts'] = int(job.get('attempts', 0)) + 1
+    job['last_error'] = str(error)
+    if job['attempts'] >= MAX_ATTEMPTS:
+        write_job(os.path.join(FAILED_DIR, name), job)
+        print(f"❌ 壁纸 {job.get('wallpaper_id')} 压缩失败 {job['attempts']} 次，已移入 failed/: {error}")
+    else:
+        delay = RETRY_BASE_DELAY * 2 ** (job['attempts'] - 1)
+        job['not_before'] = time.time() + delay
+        write_job(os.path.join(PENDING_DIR, name), job)
+        print(f"⚠️ 壁纸 {job.get('wallpaper_id')} 压缩失败，{delay} 秒后重试: {error}")
+    os.remove(job_path)
+
+
+def job_source_path(job):
+    """
+    任务对应的原图本地路径
+    Args:
+        job (dict): 任务内容（file_path 为相对网站根目录的路径）
+    Returns:
+        str: 原图路径
+    """
+    relative = str(job.get('file_path') or '').replace('/', os.sep)
+    return os.path.normpath(os.path.join(compress_wallpapers.WEB_ROOT, relative))
+
+
+def build_list_entry(job, source_path):
+    """
+    根据任务和原图元数据生成 list.json 条目（字段与 update_list.py 一致）
+    Args:
+        job (dict): 任务内容
+        source_path (str): 原图路径
+    Returns:
+        dict: 壁纸条目
+    """
+    meta = update_list.get_image_metadata(source_path) or {}
+    filename = os.path.basename(job['file_path'])
+    enqueued_at = str(job.get('enqueued_at') or '')
+    return {
+        'id': int(job['wallpaper_id']),
+        'filename': filename,
+        'path': job['file_path'],
+        'name': job.get('title') or os.path.splitext(filename)[0],
+        'category': job.get('category') or update_list.analyze_filename(filename)['category'],
+        'tags': [],
+        'width': meta.get('width') or int(job.get('width') or 0),
+        'height': meta.get('height') or int(job.get('height') or 0),
+        'size': update_list.format_file_size(meta.get('size_bytes') or int(job.get('file_size') or 0)),
+        'format': meta.get('format', ''),
+        'description': '',
+        'created_at': enqueued_at[:10] or time.strftime('%Y-%m-%d'),
+        'dhash': update_list.get_image_dhash(source_path) or ''
+    }
+
+
+def publish(conn, records, placeholders, entries, store_conn=None):
+    """
+    把本批完成的压缩版本发布给前端：写回清单、重写 variants.json 和 placeholders.json、
+    合并 list.json、刷新排序索引和这些壁纸的搜索索引
+    Args:
+        conn: 压缩清单数据库连接
+        records (list): 清单记录
+        placeholders (dict): {源文件键: 占位信息}
+        entries (list): list.json 条目
+        store_conn: 内容寻址映射数据库连接，内容寻址模式下同时重写 content_map.json
+    """
+    if store_conn is not None:
+        store_conn.commit()
+        content_store.write_content_map_json(store_conn)
+    compress_wallpapers.save_manifest_records(conn, records)
+    compress_wallpapers.save_placeholders(conn, placeholders)
+    compress_wallpapers.write_variants_json(conn)
+    compress_wallpapers.write_placeholders_json(conn)
+    total = update_list.upsert_list_entries(entries, DATA_DIR)
+    update_list.save_meta_cache()
+    update_list.write_sort_indexes(DATA_DIR)
+    # 新壁纸立即可被搜索，不必等待下一次全量重建索引
+    build_search_index.refresh_wallpapers(entry['id'] for entry in entries)
+    print(f"✅ 已发布 {len(entries)} 张新壁纸的压缩版本，当前壁纸总数 {total}")
+
+
+def run_worker(compress_types=None, workers=DEFAULT_WORKERS, once=False, poll_interval=POLL_INTERVAL,
+               content_addressed=False):
+    """
+    持续消费队列
+    Args:
+        compress_types (list): 要生成的压缩类型
+        workers (int): 并行压缩的进程数（同时处理的任务上限）
+        once (bool): 处理完当前到期的任务后退出
+        poll_interval (float): 轮询间隔（秒）
+        content_addressed (bool): 先把原图存入内容寻址存储，再按内容寻址布局生成压缩版本
+    """
+    compress_types = compress_types or DEFAULT_TYPES
+    for directory in (PENDING_DIR, PROCESSING_DIR, FAILED_DIR):
+        os.makedirs(directory, exist_ok=True)
+    recovered = recover_processing()
+    if recovered:
+        print(f"♻️ 恢复上次中断的任务: {recovered} 个")
+
+    store_conn = None
+    if content_addressed:
+        compress_wallpapers.set_output_layout(compress_wallpapers.OBJECT_ROOT, content_addressed=True)
+        store_conn = content_store.open_store()
+    conn = compress_wallpapers.open_manifest()
+    running = {}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=compress_wallpapers.set_output_layout,
+                                 initargs=(compress_wallpapers.OUTPUT_ROOT, compress_wallpapers.SHARD_DEPTH,
+                                           compress_wallpapers.QUALITY_SEARCH,
+                                           compress_wallpapers.CONTENT_ADDRESSED)) as executor:
+            while True:
+                for job_path, job in claim_jobs(workers - len(running)):
+                    source_path = job_source_path(job)
+                    if not job.get('wallpaper_id') or not os.path.isfile(source_path):
+                        # 原图已被删除或任务缺少字段，重试也无法成功
+                        job['attempts'] = MAX_ATTEMPTS - 1
+                        fail_job(job_path, job, f"原图不存在或任务无效: {source_path}")
+                        continue
+                    compress_path = source_path
+                    if store_conn is not None:
+                        try:
+                            compress_path, _ = content_store.ingest_file(store_conn, source_path)
+                        except OSError as e:
+                            fail_job(job_path, job, f"存入内容寻址存储失败: {e}")
+                            continue
+                    future = executor.submit(compress_wallpapers.compress_file_worker, compress_path, compress_types,
+                                             need_placeholder=True)
+                    running[future] = (job_path, job, source_path, compress_path)
+
+                if not running:
+                    if once:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                records, placeholders, entries, finished = [], {}, [], []
+                for future in done:
+                    job_path, job, source_path, compress_path = running.pop(future)
+                    try:
+                        worker_stats, job_records, placeholder = future.result()
+                        if worker_stats.get('error'):
+                            raise RuntimeError(f"{worker_stats['error']} 个压缩版本生成失败")
+                    except Exception as e:
+                        fail_job(job_path, job, e)
+                        continue
+                    records.extend(job_records)
+                    if placeholder:
+                        placeholders[compress_wallpapers.source_key(compress_path)] = placeholder
+                    entries.append(build_list_entry(job, source_path))
+                    finished.append((job_path, job))
+                if not finished:
+                    continue
+
+                try:
+                    publish(conn, records, placeholders, entries, store_conn)
+                except Exception as e:
+                    print(f"❌ 发布压缩版本失败: {e}")
+                    for job_path, job in finished:
+                        fail_job(job_path, job, e)
+                    continue
+                for job_path, _ in finished:
+                    os.remove(job_path)
+    except KeyboardInterrupt:
+        print("\n⏹️ 已停止，未完成的任务下次启动时继续处理")
+    finally:
+        conn.close()
+        if store_conn is not None:
+            store_conn.commit()
+            store_conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='消费上传压缩队列，异步生成压缩版本并更新列表数据')
+    parser.add_argument('-t', '--types', nargs='+', choices=['thumbnail', 'preview', 'original'],
+                        default=DEFAULT_TYPES, help='要生成的压缩类型')
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'并行压缩进程数 (默认: {DEFAULT_WORKERS})')
+    parser.add_argument('-i', '--interval', type=float, default=POLL_INTERVAL,
+                        help=f'队列轮询间隔秒数 (默认: {POLL_INTERVAL})')
+    parser.add_argument('--once', action='store_true', help='处理完当前到期的任务后退出')
+    parser.add_argument('-c', '--content-addressed', action='store_true',
+                        help='把原图存入 static/objects 内容寻址存储，并按内容寻址布局生成压缩版本')
+    args = parser.parse_args()
+
+    print(f"🚀 压缩队列 worker 已启动: {QUEUE_DIR}（类型: {', '.join(args.types)}，进程数: {max(1, args.workers)}）")
+    run_worker(args.types, max(1, args.workers), args.once, max(0.1, args.interval), args.content_addressed)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,23 @@
 """
 壁纸名称修复脚本
 从调试日志中提取原始文件名，更新数据库和list.json文件
+结构化日志索引（log_reader.py）与旧的文本日志合并使用，同一ID两边都有记录时以结构化日志为准
 """
 
+import glob
+import gzip
+import hashlib
 import re
 import json
 import mysql.connector
+import zlib
 from datetime import datetime
 import os
 
+import build_search_index
+import update_list
+from log_reader import LogIndex
+
 # 数据库配置
 DB_CONFIG = {
     'host': 'localhost',
@@ -20,6 +29,17 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# 旧版文本调试日志及其解析断点
+LEGACY_LOG_DIR = 'f:\\XAMPP\\htdocs\\logs'
+LEGACY_LOG_NAME = 'wallpaper_debug_log.txt'
+CHECKPOINT_PATH = 'f:\\XAMPP\\htdocs\\instance\\fix_names_checkpoint.json'
+
+# "- ID:" 行之后查找 "- 原始名称:" 的行数窗口
+LOOKAHEAD_LINES = 9
+
+# 识别同一份日志（轮转改名/压缩后）所用的文件头字节数
+HEAD_BYTES = 4096
+
 # 分类和标签映射
 CATEGORY_TAGS = {
     '风景': ['自然', '山水', '海洋', '森林', '天空', '日落', '日出', '雪景', '春天', '夏天', '秋天', '冬天'],
@@ -85,64 +105,149 @@ def analyze_filename(filename):
     
     return '其他', ['其他']
 
-def parse_debug_log():
-    """解析调试日志，提取ID和原始文件名的映射"""
-    log_file = 'f:\\XAMPP\\htdocs\\logs\\wallpaper_debug_log.txt'
-    id_name_mapping = {}
-    
+def load_structured_names():
+    """从结构化日志索引读取ID和原始文件名的映射，只解析上次之后新追加的日志"""
+    index = LogIndex(log_dir='f:\\XAMPP\\htdocs\\logs', index_dir='f:\\XAMPP\\htdocs\\instance\\log_index')
     try:
-        # 尝试不同的编码格式
-        encodings = ['utf-8', 'gbk', 'gb2312', 'latin-1']
-        content = None
-        
-        for encoding in encodings:
-            try:
-                with open(log_file, 'r', encoding=encoding) as f:
-                    content = f.read()
-                print(f"成功使用 {encoding} 编码读取日志文件")
+        parsed = index.update()
+        index.save()
+    except OSError as e:
+        print(f"读取结构化日志时出错: {e}")
+        return {}
+    id_name_mapping = index.original_names()
+    print(f"结构化日志索引：新解析 {parsed} 条，共 {len(id_name_mapping)} 个带原始名称的壁纸")
+    return id_name_mapping
+
+def decode_log_line(raw):
+    """按行解码日志，依次尝试 utf-8、gbk，最后用 latin-1 兜底"""
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('latin-1')
+
+def list_legacy_segments():
+    """列出旧版文本日志的所有分段（含轮转和gzip压缩的分段），按修改时间从旧到新，当前文件在最后"""
+    current = os.path.join(LEGACY_LOG_DIR, LEGACY_LOG_NAME)
+    rotated = [
+        path for path in glob.glob(os.path.join(LEGACY_LOG_DIR, LEGACY_LOG_NAME + '.*'))
+        + glob.glob(os.path.join(LEGACY_LOG_DIR, os.path.splitext(LEGACY_LOG_NAME)[0] + '.*.txt*'))
+        if os.path.isfile(path) and not path.endswith('.tmp')
+    ]
+    segments = sorted(set(rotated), key=os.path.getmtime)
+    if os.path.exists(current):
+        segments.append(current)
+    return segments
+
+def open_log_segment(path):
+    """以二进制方式打开日志分段，.gz 分段透明解压"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def read_segment_head(path):
+    """读取分段开头（解压后）的若干字节，用于识别轮转/压缩后的同一份日志"""
+    with open_log_segment(path) as f:
+        return f.read(HEAD_BYTES)
+
+def load_parse_checkpoint():
+    """读取旧版日志解析的断点：各分段已解析到的字节偏移、状态机状态和已找到的映射"""
+    if os.path.exists(CHECKPOINT_PATH):
+        try:
+            with open(CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if isinstance(checkpoint.get('segments'), list) and isinstance(checkpoint.get('mapping'), dict):
+                return checkpoint
+        except (OSError, ValueError):
+            pass
+    return {'segments': [], 'mapping': {}}
+
+def save_parse_checkpoint(checkpoint):
+    """原子写入解析断点"""
+    os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+    tmp_path = CHECKPOINT_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+def match_checkpoint_segment(head, entries):
+    """按文件头摘要查找分段对应的断点记录（轮转改名或gzip压缩后仍能对上）"""
+    for entry in entries:
+        head_len = entry['head_len']
+        if len(head) >= head_len and hashlib.sha1(head[:head_len]).hexdigest() == entry['head']:
+            return entry
+    return None
+
+def scan_log_segment(path, offset, state, mapping):
+    """
+    单遍流式扫描一个日志分段（常量内存）
+    状态机：遇到 "- ID:" 行记下ID并开启 LOOKAHEAD_LINES 行的窗口，窗口内遇到 "- 原始名称:" 行即记录映射
+    返回解析结束时的字节偏移（只计入以换行结尾的完整行）
+    """
+    with open_log_segment(path) as f:
+        if offset:
+            f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b'\n'):
                 break
-            except UnicodeDecodeError:
-                continue
-        
-        if content is None:
-            print("无法读取日志文件，尝试所有编码都失败")
-            return id_name_mapping
-            
-        # 直接按行解析，寻找ID和原始名称的配对
-        lines = content.split('\n')
-        
-        current_id = None
-        
-        for i, line in enumerate(lines):
-            # 查找ID行
+            offset += len(raw)
+            line = decode_log_line(raw)
             if '- ID:' in line:
-                current_id = extract_id_from_log_line(line)
-                
-                # 在接下来的几行中查找原始名称
-                for j in range(i+1, min(i+10, len(lines))):
-                    if '- 原始名称:' in lines[j]:
-                        current_name = extract_original_name_from_log_line(lines[j])
-                        if current_id and current_name:
-                            id_name_mapping[current_id] = current_name
-                            print(f"找到映射: {current_id} -> {current_name}")
-                        break
-        
-        # 如果还是没找到，尝试更简单的正则匹配
-        if not id_name_mapping:
-            print("尝试使用正则表达式直接匹配...")
-            # 匹配包含ID和原始名称的模式
-            pattern = r'- ID: (\d+).*?- 原始名称: ([^\n]+)'
-            matches = re.findall(pattern, content, re.DOTALL)
-            
-            for match in matches:
-                wallpaper_id, original_name = match
-                id_name_mapping[wallpaper_id] = original_name.strip()
-                print(f"正则匹配: {wallpaper_id} -> {original_name.strip()}")
-                    
-    except Exception as e:
-        print(f"解析日志文件时出错: {e}")
-        
-    return id_name_mapping
+                state['id'] = extract_id_from_log_line(line)
+                state['remaining'] = LOOKAHEAD_LINES
+                continue
+            if not state['id']:
+                continue
+            if '- 原始名称:' in line:
+                name = extract_original_name_from_log_line(line)
+                if name:
+                    mapping[state['id']] = name
+                    print(f"找到映射: {state['id']} -> {name}")
+                state['id'] = None
+                continue
+            state['remaining'] -= 1
+            if state['remaining'] <= 0:
+                state['id'] = None
+    return offset
+
+def parse_debug_log():
+    """
+    解析旧版文本调试日志，提取ID和原始文件名的映射
+    依次流式扫描所有分段（含轮转/gzip分段），按文件头识别已解析过的分段并从断点偏移继续，
+    重复运行只解析新追加的内容
+    """
+    checkpoint = load_parse_checkpoint()
+    mapping = checkpoint['mapping']
+    entries = checkpoint['segments']
+    kept = []
+
+    for path in list_legacy_segments():
+        try:
+            head = read_segment_head(path)
+            if not head:
+                continue
+            entry = match_checkpoint_segment(head, entries)
+            if entry is None:
+                entry = {'offset': 0, 'state': {'id': None, 'remaining': 0}}
+            else:
+                entries.remove(entry)
+            # 同一份日志只需扫描一次：分段被轮转或压缩后文件头不变，从原偏移继续
+            offset = scan_log_segment(path, entry['offset'], entry['state'], mapping)
+            head_len = min(len(head), HEAD_BYTES)
+            kept.append({
+                'head': hashlib.sha1(head[:head_len]).hexdigest(),
+                'head_len': head_len,
+                'offset': offset,
+                'state': entry['state'],
+                'path': os.path.basename(path)
+            })
+            print(f"已解析 {os.path.basename(path)} 至偏移 {offset}")
+        except (OSError, EOFError, zlib.error) as e:
+            print(f"解析日志分段 {path} 时出错: {e}")
+
+    save_parse_checkpoint({'segments': kept, 'mapping': mapping})
+    return dict(mapping)
 
 def update_database(id_name_mapping):
     """更新数据库中的标题和分类信息"""
@@ -183,7 +288,10 @@ def update_database(id_name_mapping):
             conn.close()
 
 def update_list_json(id_name_mapping):
-    """更新list.json文件"""
+    """
+    更新list.json文件，并用 update_list.py 的写入函数重新生成前端实际读取的分片和索引、排序索引，
+    再增量刷新这些壁纸的搜索索引（数据库需已在上一步更新）
+    """
     list_file = 'f:\\XAMPP\\htdocs\\static\\data\\list.json'
     
     try:
@@ -213,6 +321,14 @@ def update_list_json(id_name_mapping):
         
         print(f"\nlist.json更新完成，共更新 {updated_count} 条记录")
         
+        if updated_count:
+            # 前端通过 list-index.json 读取分片，排序/搜索数据也不读 list.json，必须一起重新生成
+            data_dir = os.path.dirname(list_file)
+            update_list.write_list_shards(data, data_dir)
+            update_list.write_sort_indexes(data_dir)
+            build_search_index.refresh_wallpapers(
+                item['id'] for item in data if str(item.get('id', '')) in id_name_mapping)
+        
     except Exception as e:
         print(f"更新list.json时出错: {e}")
 
@@ -222,7 +338,11 @@ def main():
     
     # 1. 解析调试日志
     print("\n1. 解析调试日志...")
+    # 旧版文本日志中可能有结构化日志出现之前的ID，两者合并，结构化日志覆盖同ID的旧记录
     id_name_mapping = parse_debug_log()
+    legacy_count = len(id_name_mapping)
+    id_name_mapping.update(load_structured_names())
+    print(f"旧版文本日志 {legacy_count} 个映射，合并结构化日志后共 {len(id_name_mapping)} 个")
     print(f"找到 {len(id_name_mapping)} 个ID和原始文件名的映射")
     
     if not id_name_mapping:
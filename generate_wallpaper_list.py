@@ -1,7 +1,12 @@
 import os
 import json
 import re
+import time
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from difflib import SequenceMatcher
+from functools import lru_cache
 
 def get_image_size(file_path):
     """获取图片尺寸"""
@@ -25,39 +30,227 @@ def get_file_size(file_path):
     except:
         return "未知"
 
+# 综合评分的阈值与权重（标题权重最高，内容次之，标签最低）
+MATCH_THRESHOLD = 0.3
+TITLE_WEIGHT = 0.5
+CONTENT_WEIGHT = 0.3
+TAG_WEIGHT = 0.2
+
+# 候选筛选：按字符n-gram建立提示词倒排索引，每张图片只对评分上界最高的前K个提示词精确打分
+# 同时收录单字（权重较低），没有任何共同字符的提示词相似度必为0，不会漏掉可能超过阈值的候选
+NGRAM_SIZE = 2
+UNIGRAM_FACTOR = 0.25
+TOP_K = 200
+
+# 工作进程内的提示词及索引，由 init_matcher 初始化
+_prompts = []
+_prompt_index = {}
+_top_k = TOP_K
+
+@lru_cache(maxsize=65536)
 def calculate_similarity(str1, str2):
-    """计算两个字符串的相似度"""
+    """计算两个字符串的相似度（同一对字符串只计算一次）"""
     return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
 
+def normalize_image_name(image_name):
+    """移除文件扩展名和数字后缀，得到用于匹配的图片名"""
+    return re.sub(r'\d*\.(jpeg|jpg|png|gif|webp)$', '', image_name.lower())
+
+def char_ngrams(text, n=NGRAM_SIZE):
+    """
+    生成文本的字符n-gram集合，短于n的文本整体作为一个n-gram
+    Args:
+        text (str): 文本
+        n (int): n-gram长度
+    Returns:
+        set: n-gram集合
+    """
+    text = text.lower()
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+def build_prompt_index(prompts):
+    """
+    为提示词的标题、内容单词和标签建立单字+n-gram倒排索引，只需构建一次
+    Args:
+        prompts (list): 提示词列表
+    Returns:
+        dict: {n-gram: [(提示词下标, 字段权重), ...]}
+    """
+    index = defaultdict(list)
+    for idx, prompt in enumerate(prompts):
+        grams = {}
+        fields = (
+            (TITLE_WEIGHT, [prompt['title']]),
+            (CONTENT_WEIGHT, prompt['content'].split()),
+            (TAG_WEIGHT, prompt['tags'])
+        )
+        for weight, texts in fields:
+            for text in texts:
+                for gram in char_ngrams(text, 1):
+                    grams[gram] = max(grams.get(gram, 0), weight * UNIGRAM_FACTOR)
+                for gram in char_ngrams(text):
+                    grams[gram] = max(grams.get(gram, 0), weight)
+        for gram, weight in grams.items():
+            index[gram].append((idx, weight))
+    return index
+
+@lru_cache(maxsize=65536)
+def char_counts(text):
+    """统计字符出现次数（小写）"""
+    return dict(Counter(text.lower()))
+
+@lru_cache(maxsize=65536)
+def similarity_upper_bound(str1, str2):
+    """
+    calculate_similarity 的上界：共同字符数 ×2 / 总长度（同 SequenceMatcher.quick_ratio）
+    计算代价远低于 SequenceMatcher，上界不超过阈值的组合可以直接跳过
+    """
+    total = len(str1) + len(str2)
+    if total == 0:
+        return 1.0
+    counts1, counts2 = char_counts(str1), char_counts(str2)
+    if len(counts1) > len(counts2):
+        counts1, counts2 = counts2, counts1
+    common = sum(min(count, counts2.get(char, 0)) for char, count in counts1.items())
+    return 2.0 * common / total
+
+def best_similarity(base_name, texts):
+    """
+    求图片名与一组文本的最大相似度，按上界从高到低计算，上界不超过当前最大值时提前结束
+    Args:
+        base_name (str): 规范化后的图片名
+        texts (iterable): 文本列表
+    Returns:
+        float: 最大相似度，没有文本时为0
+    """
+    best = 0
+    for text in sorted(set(texts), key=lambda t: similarity_upper_bound(base_name, t), reverse=True):
+        if similarity_upper_bound(base_name, text) <= best:
+            break
+        best = max(best, calculate_similarity(base_name, text))
+    return best
+
+def score_upper_bound(base_name, prompt):
+    """计算综合评分的上界，权重与 score_prompt 一致"""
+    title_bound = similarity_upper_bound(base_name, prompt['title'])
+    content_bound = max((similarity_upper_bound(base_name, word) for word in set(prompt['content'].split())), default=0)
+    tag_bound = max((similarity_upper_bound(base_name, tag) for tag in prompt['tags']), default=0)
+    return (title_bound * TITLE_WEIGHT) + (content_bound * CONTENT_WEIGHT) + (tag_bound * TAG_WEIGHT)
+
+def shortlist_prompts(base_name, prompts, index, top_k=TOP_K):
+    """
+    筛选候选提示词：先通过倒排索引取出有共同字符的提示词，
+    再去掉评分上界不超过阈值的，剩余的按上界从高到低取前K个
+    Args:
+        base_name (str): 规范化后的图片名
+        prompts (list): 提示词列表
+        index (dict): build_prompt_index 生成的索引
+        top_k (int): 候选数量上限，0表示不限制
+    Returns:
+        list: 候选提示词下标
+    """
+    overlap = defaultdict(float)
+    for gram in char_ngrams(base_name, 1) | char_ngrams(base_name):
+        for idx, weight in index.get(gram, ()):
+            overlap[idx] += weight
+    bounds = {}
+    for idx in overlap:
+        bound = score_upper_bound(base_name, prompts[idx])
+        if bound > MATCH_THRESHOLD:
+            bounds[idx] = bound
+    ranked = sorted(bounds, key=lambda idx: (-bounds[idx], -overlap[idx], idx))
+    return ranked[:top_k] if top_k > 0 else ranked
+
+def score_prompt(base_name, prompt):
+    """
+    计算图片名与单个提示词的综合评分
+    Args:
+        base_name (str): 规范化后的图片名
+        prompt (dict): 提示词
+    Returns:
+        float: 综合评分
+    """
+    # 计算标题相似度
+    title_score = calculate_similarity(base_name, prompt['title'])
+
+    # 计算内容相似度（取内容中与图片名最相似的部分）
+    content_score = best_similarity(base_name, prompt['content'].split())
+
+    # 计算标签相似度
+    tag_score = best_similarity(base_name, prompt['tags'])
+
+    return (title_score * TITLE_WEIGHT) + (content_score * CONTENT_WEIGHT) + (tag_score * TAG_WEIGHT)
+
 def find_matching_prompt(image_name, prompts):
     """查找匹配的提示词，使用模糊匹配"""
-    # 移除文件扩展名和数字后缀
-    base_name = re.sub(r'\d*\.(jpeg|jpg|png|gif|webp)$', '', image_name.lower())
-    
+    base_name = normalize_image_name(image_name)
+
     best_match = None
-    best_score = 0.3  # 设置最低相似度阈值
-    
+    best_score = MATCH_THRESHOLD  # 设置最低相似度阈值
+
     for prompt in prompts:
-        # 计算标题相似度
-        title_score = calculate_similarity(base_name, prompt['title'])
-        
-        # 计算内容相似度（取内容中与图片名最相似的部分）
-        content_words = prompt['content'].split()
-        content_score = max(calculate_similarity(base_name, word) for word in content_words)
-        
-        # 计算标签相似度
-        tag_score = max(calculate_similarity(base_name, tag) for tag in prompt['tags'])
-        
-        # 综合评分（标题权重最高，内容次之，标签最低）
-        total_score = (title_score * 0.5) + (content_score * 0.3) + (tag_score * 0.2)
-        
+        total_score = score_prompt(base_name, prompt)
         if total_score > best_score:
             best_score = total_score
             best_match = prompt
-    
+
     return best_match
 
+def init_matcher(prompts, top_k=TOP_K):
+    """
+    初始化匹配器（也用作进程池的 initializer），每个进程只构建一次索引
+    Args:
+        prompts (list): 提示词列表
+        top_k (int): 候选数量上限
+    """
+    global _prompts, _prompt_index, _top_k
+    _prompts = prompts
+    _prompt_index = build_prompt_index(prompts)
+    _top_k = top_k
+
+def match_image(filename):
+    """
+    找出与图片匹配的所有提示词（综合评分超过阈值）
+    Args:
+        filename (str): 图片文件名
+    Returns:
+        list: 匹配的提示词下标
+    """
+    base_name = normalize_image_name(filename)
+    candidates = shortlist_prompts(base_name, _prompts, _prompt_index, _top_k)
+    return sorted(idx for idx in candidates if score_prompt(base_name, _prompts[idx]) > MATCH_THRESHOLD)
+
+def match_wallpapers(filenames, prompts, workers=1, top_k=TOP_K):
+    """
+    并行为所有图片匹配提示词
+    Args:
+        filenames (list): 图片文件名列表
+        prompts (list): 提示词列表
+        workers (int): 进程数，1表示在当前进程中执行
+        top_k (int): 每张图片精确打分的候选数量上限
+    Returns:
+        list: 与 filenames 一一对应的匹配提示词下标列表
+    """
+    if workers <= 1 or len(filenames) < 2:
+        init_matcher(prompts, top_k)
+        return [match_image(filename) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_matcher,
+                             initargs=(prompts, top_k)) as executor:
+        chunksize = max(1, len(filenames) // (workers * 4))
+        return list(executor.map(match_image, filenames, chunksize=chunksize))
+
 def main():
+    parser = argparse.ArgumentParser(description='生成提示词与壁纸的合并列表')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1,
+                        help='匹配使用的进程数，0表示使用全部CPU核心')
+    parser.add_argument('-k', '--top-k', type=int, default=TOP_K,
+                        help=f'每张图片精确打分的候选提示词数量，0表示全部 (默认: {TOP_K})')
+    args = parser.parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    top_k = max(0, args.top_k)
+
     # 定义目录路径
     wallpaper_dir = 'static/wallpapers'
     data_dir = 'static/data'
@@ -99,31 +292,34 @@ def main():
         'wallpapers': []
     }
     
+    # 一次性为所有图片匹配提示词，再按提示词归并
+    start_time = time.time()
+    matches = match_wallpapers([w['filename'] for w in wallpaper_list], prompts,
+                               workers=workers, top_k=top_k)
+    images_by_prompt = defaultdict(list)
+    for wallpaper, prompt_indexes in zip(wallpaper_list, matches):
+        for idx in prompt_indexes:
+            images_by_prompt[idx].append({
+                'filename': wallpaper['filename'],
+                'path': wallpaper['path'],
+                'name': wallpaper['name'],
+                'size': wallpaper['size'],
+                'file_size': wallpaper['file_size']
+            })
+
     # 为每个提示词创建条目
-    for prompt in prompts:
-        prompt_entry = {
-            'id': prompt['id'],
-            'title': prompt['title'],
-            'content': prompt['content'],
-            'tags': prompt['tags'],
-            'images': []
-        }
-        
-        # 查找匹配的图片
-        for wallpaper in wallpaper_list:
-            if find_matching_prompt(wallpaper['filename'], [prompt]):
-                prompt_entry['images'].append({
-                    'filename': wallpaper['filename'],
-                    'path': wallpaper['path'],
-                    'name': wallpaper['name'],
-                    'size': wallpaper['size'],
-                    'file_size': wallpaper['file_size']
-                })
-        
+    for idx, prompt in enumerate(prompts):
         # 只添加有匹配图片的提示词
-        if prompt_entry['images']:
-            merged_data['wallpapers'].append(prompt_entry)
-    
+        if images_by_prompt[idx]:
+            merged_data['wallpapers'].append({
+                'id': prompt['id'],
+                'title': prompt['title'],
+                'content': prompt['content'],
+                'tags': prompt['tags'],
+                'images': images_by_prompt[idx]
+            })
+    print(f'匹配用时 {time.time() - start_time:.2f} 秒')
+
     # 保存合并后的数据
     merged_file = os.path.join(data_dir, 'wallpapers.json')
     with open(merged_file, 'w', encoding='utf-8') as f:
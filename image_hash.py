@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片感知哈希（dHash）与近似重复索引
+- 每张图缩成 9x8 灰度图，比较相邻像素明暗得到64位哈希；缩放/重新压缩/轻微调色后的同一张图哈希只差几位
+- HashIndex 把64位哈希切成 BAND_COUNT 段，每段按取值分桶（多索引哈希）。
+  两个哈希的汉明距离不超过 r 时，至少有一段的距离不超过 r // BAND_COUNT，
+  因此查询只需在每段中探查该半径内的少量桶并比对桶内候选，不用与整个图库两两比较
+- update_list.py 入库时计算哈希、跳过与已有壁纸重复的新图，并生成 instance/image_hash_index.json；
+  api/upload_wallpaper.php 上传时读取该索引拒绝重复图片
+- 直接运行本脚本：按 list.json 扫描整个图库，列出所有疑似重复的图片组
+"""
+import argparse
+import json
+import os
+import time
+
+from PIL import Image
+
+HASH_BITS = 64
+BAND_COUNT = 4
+BAND_BITS = HASH_BITS // BAND_COUNT
+
+# 汉明距离不超过该值视为重复
+DEFAULT_MAX_DISTANCE = 6
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HASH_INDEX_PATH = os.path.join(BASE_DIR, 'instance', 'image_hash_index.json')
+DUPLICATES_PATH = os.path.join(BASE_DIR, 'instance', 'duplicate_images.json')
+
+
+def compute_dhash(img):
+    """
+    计算已打开图片的dHash
+    使用BOX缩放（区域平均），与PHP端 imagecopyresampled 的结果接近
+    Args:
+        img: PIL图片对象
+    Returns:
+        int: 64位哈希
+    """
+    small = img.convert('L').resize((9, 8), Image.BOX)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def file_dhash(image_path):
+    """
+    计算图片文件的dHash，JPEG按小尺寸草稿模式解码，不解码全尺寸像素
+    Args:
+        image_path (str): 图片路径
+    Returns:
+        int: 64位哈希
+    """
+    with Image.open(image_path) as img:
+        if img.format == 'JPEG':
+            img.draft('RGB', (64, 64))
+        return compute_dhash(img)
+
+
+def hash_to_hex(value):
+    """64位哈希转为16位十六进制字符串（list.json和索引文件中的存储格式）"""
+    return f"{value:016x}"
+
+
+def hex_to_hash(text):
+    """十六进制字符串转回整数哈希，无效时返回None"""
+    try:
+        return int(text, 16) if text else None
+    except (TypeError, ValueError):
+        return None
+
+
+def hamming_distance(a, b):
+    """两个哈希的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+def hash_bands(value):
+    """把哈希切成 BAND_COUNT 段，按从高位到低位的顺序返回每段的取值"""
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (HASH_BITS - BAND_BITS * (i + 1))) & mask for i in range(BAND_COUNT)]
+
+
+def band_neighbors(part, radius):
+    """
+    列出与某段取值汉明距离不超过 radius 的所有取值（含自身）
+    Args:
+        part (int): 段取值
+        radius (int): 段内半径
+    Returns:
+        list: 段取值列表
+    """
+    results = [part]
+    frontier = [(part, -1)]
+    for _ in range(radius):
+        next_frontier = []
+        for value, last_bit in frontier:
+            for bit in range(last_bit + 1, BAND_BITS):
+                flipped = value ^ (1 << bit)
+                results.append(flipped)
+                next_frontier.append((flipped, bit))
+        frontier = next_frontier
+    return results
+
+
+class HashIndex:
+    """
+    多索引哈希：按汉明距离半径查询近似重复
+    """
+
+    def __init__(self):
+        # {键: 哈希}
+        self.hashes = {}
+        # 每段一个 {段取值: [键, ...]}
+        self.bands = [{} for _ in range(BAND_COUNT)]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, key, value):
+        """
+        加入一个哈希（同一个键重复加入时以最后一次为准）
+        Args:
+            key: 图片标识（壁纸ID或文件名）
+            value (int): 64位哈希
+        """
+        if key in self.hashes:
+            self.remove(key)
+        self.hashes[key] = value
+        for band, part in zip(self.bands, hash_bands(value)):
+            band.setdefault(part, []).append(key)
+
+    def remove(self, key):
+        """移除一个键"""
+        value = self.hashes.pop(key, None)
+        if value is None:
+            return
+        for band, part in zip(self.bands, hash_bands(value)):
+            bucket = band.get(part, [])
+            if key in bucket:
+                bucket.remove(key)
+            if not bucket:
+                band.pop(part, None)
+
+    def query(self, value, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        查找汉明距离不超过 max_distance 的所有哈希
+        Args:
+            value (int): 待查哈希
+            max_distance (int): 最大汉明距离
+        Returns:
+            list: [(键, 距离), ...]，按距离从小到大排列
+        """
+        band_radius = max_distance // BAND_COUNT
+        seen = set()
+        matches = []
+        for band, part in zip(self.bands, hash_bands(value)):
+            for neighbor in band_neighbors(part, band_radius):
+                for key in band.get(neighbor, ()):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    distance = hamming_distance(value, self.hashes[key])
+                    if distance <= max_distance:
+                        matches.append((key, distance))
+        matches.sort(key=lambda item: item[1])
+        return matches
+
+
+def build_index(files):
+    """
+    根据壁纸列表（带 dhash 字段）建立以壁纸ID为键的索引
+    Args:
+        files (list): list.json 条目
+    Returns:
+        HashIndex: 哈希索引
+    """
+    index = HashIndex()
+    for item in files:
+        value = hex_to_hash(item.get('dhash'))
+        if value is not None:
+            index.add(item['id'], value)
+    return index
+
+
+def write_hash_index(files, index_path=None, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    生成供上传接口查询的索引文件
+    格式: {'bands': [{段取值(4位十六进制): [壁纸ID, ...]}, ...], 'entries': {壁纸ID: [哈希, 路径]}, ...}
+    Args:
+        files (list): list.json 条目（带 dhash 字段）
+        index_path (str): 输出路径，默认 HASH_INDEX_PATH
+        max_distance (int): 写入索引的默认重复阈值
+    Returns:
+        int: 收录的哈希数
+    """
+    index_path = index_path or HASH_INDEX_PATH
+    entries = {}
+    bands = [{} for _ in range(BAND_COUNT)]
+    for item in files:
+        value = hex_to_hash(item.get('dhash'))
+        if value is None:
+            continue
+        entries[str(item['id'])] = [hash_to_hex(value), item.get('path', '')]
+        for band, part in zip(bands, hash_bands(value)):
+            band.setdefault(f"{part:04x}", []).append(item['id'])
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'bits': HASH_BITS,
+            'band_count': BAND_COUNT,
+            'band_bits': BAND_BITS,
+            'max_distance': max_distance,
+            'bands': bands,
+            'entries': entries
+        }, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, index_path)
+    return len(entries)
+
+
+def write_duplicates_report(duplicates, report_path=None):
+    """
+    写出入库时被跳过的重复图片，compress_wallpapers.py 据此不再压缩它们
+    Args:
+        duplicates (dict): {文件名: {'duplicate_of': 已有壁纸文件名, 'distance': 汉明距离}}
+        report_path (str): 输出路径，默认 DUPLICATES_PATH
+    """
+    report_path = report_path or DUPLICATES_PATH
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    tmp_path = report_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(duplicates, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, report_path)
+
+
+def load_duplicates_report(report_path=None):
+    """
+    读取重复图片报告
+    Returns:
+        dict: {文件名: {...}}，文件不存在或损坏时为空
+    """
+    report_path = report_path or DUPLICATES_PATH
+    if not os.path.exists(report_path):
+        return {}
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        return report if isinstance(report, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def find_duplicate_groups(files, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    找出图库中所有疑似重复的图片组（并查集合并相似对）
+    Args:
+        files (list): list.json 条目（带 dhash 字段）
+        max_distance (int): 最大汉明距离
+    Returns:
+        list: [[条目, ...], ...]，每组至少两张
+    """
+    index = build_index(files)
+    by_id = {item['id']: item for item in files}
+    parent = {key: key for key in index.hashes}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key, value in index.hashes.items():
+        for other, _ in index.query(value, max_distance):
+            root_a, root_b = find(key), find(other)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    groups = {}
+    for key in index.hashes:
+        groups.setdefault(find(key), []).append(by_id[key])
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按感知哈希列出图库中疑似重复的壁纸')
+    parser.add_argument('-l', '--list', default=os.path.join(BASE_DIR, 'static', 'data', 'list.json'),
+                        help='list.json 路径（需先运行 update_list.py 生成 dhash 字段）')
+    parser.add_argument('-d', '--distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'最大汉明距离 (默认: {DEFAULT_MAX_DISTANCE})')
+    args = parser.parse_args()
+
+    with open(args.list, 'r', encoding='utf-8') as f:
+        files = json.load(f)
+    distance = max(0, args.distance)
+    start_time = time.time()
+    groups = find_duplicate_groups(files, distance)
+    hashed = sum(1 for item in files if item.get('dhash'))
+    print(f"🔍 已扫描 {hashed}/{len(files)} 张带哈希的壁纸，发现 {len(groups)} 组疑似重复，"
+          f"用时 {(time.time() - start_time) * 1000:.1f} 毫秒")
+    for group in groups:
+        print("—" * 40)
+        for item in group:
+            print(f"  ID {item['id']}: {item.get('path', '')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构化日志读取与索引
+- PHP 端 sendDebugLog 以 JSON Lines 写入 logs/<日志名>.jsonl，超过大小上限后轮转为 <日志名>.<时间>.jsonl
+- 本模块逐行流式读取所有分段，不把整个文件读入内存
+- LogIndex 按壁纸ID记录日志位置（分段名+字节偏移）以及最近一次出现的原始名称/文件名，
+  索引保存在 instance/log_index/<日志名>.json，再次运行只解析新追加的内容
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+LOG_DIR = 'logs'
+INDEX_DIR = os.path.join('instance', 'log_index')
+DEFAULT_LOG_NAME = 'wallpaper_debug_log'
+
+# 用于识别分段是否被轮转/重写的文件头长度
+HEAD_BYTES = 256
+
+# 每个壁纸ID最多保留的日志位置数（保留最新的）
+MAX_OFFSETS_PER_ID = 100
+
+# 从 data.wallpaper 中摘录到索引里的字段
+SUMMARY_FIELDS = ('origin_name', 'filename', 'category')
+
+
+def list_segments(log_name=DEFAULT_LOG_NAME, log_dir=LOG_DIR):
+    """
+    列出日志的所有分段，按时间从旧到新排列，当前文件在最后
+    Args:
+        log_name (str): 日志名（不含扩展名）
+        log_dir (str): 日志目录
+    Returns:
+        list: 分段文件路径
+    """
+    segments = sorted(glob.glob(os.path.join(log_dir, f"{log_name}.[0-9]*.jsonl")))
+    current = os.path.join(log_dir, f"{log_name}.jsonl")
+    if os.path.exists(current):
+        segments.append(current)
+    return segments
+
+
+def iter_records(path, start=0):
+    """
+    从指定字节偏移开始流式读取一个分段
+    末尾没有换行的半行（PHP 正在写入）不会返回，下次从该行开头继续
+    Args:
+        path (str): 分段文件路径
+        start (int): 起始字节偏移（必须位于行首）
+    Yields:
+        tuple: (行起始偏移, 行结束偏移, 日志记录dict)
+    """
+    with open(path, 'rb') as f:
+        f.seek(start)
+        offset = start
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            line_start = offset
+            offset += len(raw)
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield line_start, offset, record
+
+
+def read_record_at(path, offset):
+    """
+    读取指定偏移处的一条日志
+    Args:
+        path (str): 分段文件路径
+        offset (int): 行起始偏移
+    Returns:
+        dict|None: 日志记录
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+    except (OSError, ValueError):
+        return None
+
+
+def record_wallpaper_id(record):
+    """
+    取日志记录关联的壁纸ID
+    Args:
+        record (dict): 日志记录
+    Returns:
+        str|None: 壁纸ID
+    """
+    wallpaper_id = record.get('wallpaper_id')
+    if wallpaper_id is None:
+        data = record.get('data')
+        if isinstance(data, dict) and isinstance(data.get('wallpaper'), dict):
+            wallpaper_id = data['wallpaper'].get('id')
+    if wallpaper_id is None or not str(wallpaper_id).isdigit():
+        return None
+    return str(wallpaper_id)
+
+
+def _file_head(path):
+    """计算分段文件头的摘要，用于判断文件是否被轮转或重写"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(HEAD_BYTES)).hexdigest()
+
+
+class LogIndex:
+    """
+    按壁纸ID索引的结构化日志
+    """
+
+    def __init__(self, log_name=DEFAULT_LOG_NAME, log_dir=LOG_DIR, index_dir=INDEX_DIR):
+        self.log_name = log_name
+        self.log_dir = log_dir
+        self.index_path = os.path.join(index_dir, f"{log_name}.json")
+        # {分段名: {'size': 已索引字节数, 'head': 文件头摘要}}
+        self.segments = {}
+        # {壁纸ID: {'offsets': [[分段名, 偏移], ...], 'origin_name': ..., ...}}
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """读取已保存的索引，文件缺失或损坏时从空索引开始"""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.segments = saved.get('segments', {})
+            self.entries = saved.get('entries', {})
+        except (OSError, ValueError):
+            self.segments = {}
+            self.entries = {}
+
+    def save(self):
+        """原子写入索引文件"""
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'log_name': self.log_name,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'segments': self.segments,
+                'entries': self.entries
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.index_path)
+
+    def _drop_segment(self, name):
+        """移除某个分段的全部日志位置"""
+        self.segments.pop(name, None)
+        for entry in self.entries.values():
+            entry['offsets'] = [item for item in entry['offsets'] if item[0] != name]
+
+    def _add_record(self, name, offset, record):
+        """把一条日志加入索引"""
+        wallpaper_id = record_wallpaper_id(record)
+        if wallpaper_id is None:
+            return
+        entry = self.entries.setdefault(wallpaper_id, {'offsets': []})
+        entry['offsets'].append([name, offset])
+        if len(entry['offsets']) > MAX_OFFSETS_PER_ID:
+            del entry['offsets'][:-MAX_OFFSETS_PER_ID]
+
+        data = record.get('data')
+        wallpaper = data.get('wallpaper') if isinstance(data, dict) else None
+        if isinstance(wallpaper, dict):
+            for field in SUMMARY_FIELDS:
+                value = wallpaper.get(field)
+                if value not in (None, ''):
+                    entry[field] = str(value).strip()
+        entry['last_time'] = record.get('time')
+
+    def update(self):
+        """
+        增量更新索引：已索引且未变化的分段只解析新追加部分，被轮转/重写的分段重新解析
+        Returns:
+            int: 本次新解析的日志条数
+        """
+        paths = list_segments(self.log_name, self.log_dir)
+        present = {os.path.basename(path) for path in paths}
+        for name in list(self.segments):
+            if name not in present:
+                self._drop_segment(name)
+
+        parsed = 0
+        for path in paths:
+            name = os.path.basename(path)
+            size = os.path.getsize(path)
+            head = _file_head(path)
+            info = self.segments.get(name)
+            if info and info.get('head') == head and size >= info.get('size', 0):
+                start = info['size']
+            else:
+                self._drop_segment(name)
+                start = 0
+            if size == start:
+                self.segments[name] = {'size': size, 'head': head}
+                continue
+
+            end = start
+            for line_start, line_end, record in iter_records(path, start):
+                self._add_record(name, line_start, record)
+                end = line_end
+                parsed += 1
+            self.segments[name] = {'size': end, 'head': head}
+        return parsed
+
+    def lookup(self, wallpaper_id):
+        """
+        按壁纸ID查找索引摘要
+        Args:
+            wallpaper_id: 壁纸ID
+        Returns:
+            dict|None: {'origin_name', 'filename', 'category', 'last_time', 'offsets'}
+        """
+        return self.entries.get(str(wallpaper_id))
+
+    def records(self, wallpaper_id):
+        """
+        读取某个壁纸ID的全部日志（按索引定位，不扫描文件）
+        Args:
+            wallpaper_id: 壁纸ID
+        Yields:
+            dict: 日志记录
+        """
+        entry = self.lookup(wallpaper_id)
+        if not entry:
+            return
+        for name, offset in entry['offsets']:
+            record = read_record_at(os.path.join(self.log_dir, name), offset)
+            if record is not None:
+                yield record
+
+    def original_names(self):
+        """
+        所有出现过原始名称的壁纸
+        Returns:
+            dict: {壁纸ID: 原始名称}
+        """
+        return {
+            wallpaper_id: entry['origin_name']
+            for wallpaper_id, entry in self.entries.items()
+            if entry.get('origin_name')
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='更新结构化日志索引并按壁纸ID查询')
+    parser.add_argument('-n', '--name', default=DEFAULT_LOG_NAME, help=f'日志名 (默认: {DEFAULT_LOG_NAME})')
+    parser.add_argument('-i', '--id', help='打印该壁纸ID的全部日志')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    index = LogIndex(args.name)
+    parsed = index.update()
+    index.save()
+    print(f"📚 日志索引已更新: 新解析 {parsed} 条，共 {len(index.entries)} 个壁纸ID，"
+          f"{len(index.segments)} 个分段，用时 {time.time() - start_time:.2f} 秒")
+
+    if args.id:
+        for record in index.records(args.id):
+            print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
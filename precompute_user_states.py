@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重度用户点赞/收藏集合预计算脚本
+- 统计 wallpaper_likes（按IP）和 wallpaper_favorites（按用户ID）中记录数达到阈值的用户
+- 为每个重度用户生成 instance/user_states/<类型>-<标识sha1>.json，内容为已点赞/收藏的壁纸ID有序列表
+- api/wallpaper_states.php 命中缓存时直接做集合查找；用户点赞/收藏变化时接口会删除其缓存，下次运行本脚本再生成
+- 每个缓存记录读取数据库之前的快照时间 snapshot_at，接口同时写入 <类型>-<标识sha1>.changed 记录变化时间；
+  读取与写入之间发生的点赞/收藏会使刚写入的缓存早于变化时间，接口不会使用它
+- 已不满足阈值的旧缓存文件会被清理
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import pymysql
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'wallpaper_db',
+    'charset': 'utf8mb4'
+}
+
+CACHE_DIR = os.path.join('instance', 'user_states')
+
+# 类型: (原始记录表, 用户标识字段)，与 api/user_state_cache.php 保持一致
+STATE_SOURCES = {
+    'likes': ('wallpaper_likes', 'ip_address'),
+    'favorites': ('wallpaper_favorites', 'user_id')
+}
+
+# 记录数达到该值的用户才生成缓存
+DEFAULT_MIN_COUNT = 200
+
+
+def cache_path(kind, owner):
+    """
+    计算缓存文件路径（与 PHP 端 userStateCachePath 一致）
+    Args:
+        kind (str): 类型（likes / favorites）
+        owner: 用户标识（IP或用户ID）
+    Returns:
+        str: 缓存文件路径
+    """
+    digest = hashlib.sha1(str(owner).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{kind}-{digest}.json")
+
+
+def fetch_heavy_owners(cursor, kind, min_count):
+    """
+    查询记录数达到阈值的用户
+    Args:
+        cursor: 数据库游标
+        kind (str): 类型
+        min_count (int): 阈值
+    Returns:
+        list: 用户标识列表
+    """
+    table, owner_column = STATE_SOURCES[kind]
+    cursor.execute(
+        f"SELECT `{owner_column}` FROM `{table}` GROUP BY `{owner_column}` HAVING COUNT(*) >= %s",
+        (min_count,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def fetch_owner_ids(cursor, kind, owner):
+    """
+    查询某个用户点赞/收藏的全部壁纸ID
+    Args:
+        cursor: 数据库游标
+        kind (str): 类型
+        owner: 用户标识
+    Returns:
+        list: 升序壁纸ID
+    """
+    table, owner_column = STATE_SOURCES[kind]
+    cursor.execute(
+        f"SELECT wallpaper_id FROM `{table}` WHERE `{owner_column}` = %s ORDER BY wallpaper_id",
+        (owner,)
+    )
+    return [int(row[0]) for row in cursor.fetchall() if str(row[0]).isdigit()]
+
+
+def write_cache(kind, owner, ids, snapshot_at):
+    """
+    原子写入缓存文件
+    Args:
+        kind (str): 类型
+        owner: 用户标识
+        ids (list): 壁纸ID列表
+        snapshot_at (float): 读取数据库之前的时间戳
+    Returns:
+        str: 缓存文件路径
+    """
+    path = cache_path(kind, owner)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'kind': kind,
+            'count': len(ids),
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'snapshot_at': snapshot_at,
+            'ids': ids
+        }, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def precompute_user_states(min_count=DEFAULT_MIN_COUNT):
+    """
+    为重度用户生成点赞/收藏集合缓存
+    Args:
+        min_count (int): 生成缓存的记录数阈值
+    Returns:
+        bool: 是否成功
+    """
+    start_time = time.time()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = None
+    written = set()
+    try:
+        conn = pymysql.connect(**DB_CONFIG)
+        with conn.cursor() as cursor:
+            for kind in STATE_SOURCES:
+                owners = fetch_heavy_owners(cursor, kind, min_count)
+                total_ids = 0
+                for owner in owners:
+                    # 先记录快照时间再读取，读取之后的变化一定晚于快照时间
+                    snapshot_at = time.time()
+                    ids = fetch_owner_ids(cursor, kind, owner)
+                    written.add(os.path.abspath(write_cache(kind, owner, ids, snapshot_at)))
+                    total_ids += len(ids)
+                print(f"👤 {kind}: {len(owners)} 个重度用户，共 {total_ids} 条记录")
+    except Exception as e:
+        print(f"❌ 用户状态预计算失败: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+    removed = 0
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.json')):
+        if os.path.abspath(path) not in written:
+            os.remove(path)
+            removed += 1
+    # 早于本次运行开始的变化标记已不会晚于任何缓存的快照时间，可以清理
+    for path in glob.glob(os.path.join(CACHE_DIR, '*.changed')):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                changed_at = float(f.read().strip() or 0)
+            if changed_at < start_time:
+                os.remove(path)
+        except (OSError, ValueError):
+            continue
+    print(f"✅ 用户状态缓存已更新: {len(written)} 个文件，清理 {removed} 个过期文件，"
+          f"用时 {time.time() - start_time:.2f} 秒")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为重度用户预计算点赞/收藏壁纸集合')
+    parser.add_argument('-m', '--min-count', type=int, default=DEFAULT_MIN_COUNT,
+                        help=f'记录数达到该值才生成缓存 (默认: {DEFAULT_MIN_COUNT})')
+    args = parser.parse_args()
+    precompute_user_states(min_count=max(1, args.min_count))
+
+
+if __name__ == '__main__':
+    main()
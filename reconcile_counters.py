@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+点赞/收藏计数对账脚本
+- 点赞/收藏接口只把 +1/-1 写入 wallpaper_counter_shards 的随机分片（见 api/counter_shards.php）
+- 本脚本把分片增量合并回 wallpapers.likes / wallpapers.favorites（按壁纸ID分批，锁住分片行后合并并删除）
+- 合并后与原始记录表 wallpaper_likes / wallpaper_favorites 逐张核对，报告偏差；加 --fix 时按原始记录修正
+- 首次运行时先按原始记录填充 likes / favorites 基础字段，再创建分片表（首次运行请加 --fix）
+"""
+import argparse
+import time
+
+import pymysql
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'wallpaper_db',
+    'charset': 'utf8mb4'
+}
+
+SHARD_TABLE = 'wallpaper_counter_shards'
+
+# 计数名: (wallpapers 基础字段, 原始记录表)，与 api/counter_shards.php 的 COUNTER_DEFINITIONS 保持一致
+COUNTERS = {
+    'likes': ('likes', 'wallpaper_likes'),
+    'favorites': ('favorites', 'wallpaper_favorites')
+}
+
+# 每批合并的壁纸数
+FOLD_BATCH_SIZE = 500
+
+# 报告中最多列出的偏差条数
+MAX_DRIFT_REPORT = 20
+
+CREATE_SHARD_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS `{SHARD_TABLE}` (
+        `wallpaper_id` BIGINT NOT NULL COMMENT '壁纸ID',
+        `counter` VARCHAR(16) NOT NULL COMMENT '计数名（likes / favorites）',
+        `shard` TINYINT UNSIGNED NOT NULL COMMENT '分片号',
+        `delta` INT NOT NULL DEFAULT 0 COMMENT '尚未合并的增量',
+        PRIMARY KEY (`wallpaper_id`, `counter`, `shard`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='点赞/收藏计数分片'
+"""
+
+
+def backfill_counters(cursor):
+    """
+    按原始记录表重写 wallpapers 的基础计数字段
+    分片表创建之前接口按原始记录统计计数，基础字段并未维护，启用分片前必须先填充
+    Args:
+        cursor: 数据库游标
+    """
+    for counter, (column, raw_table) in COUNTERS.items():
+        try:
+            cursor.execute(f"""
+                UPDATE wallpapers w
+                LEFT JOIN (
+                    SELECT wallpaper_id, COUNT(*) AS actual FROM `{raw_table}` GROUP BY wallpaper_id
+                ) r ON r.wallpaper_id = w.id
+                SET w.`{column}` = COALESCE(r.actual, 0)
+            """)
+        except pymysql.err.ProgrammingError as e:
+            print(f"⚠️ 无法按 {raw_table} 填充 {counter}: {e}")
+            continue
+        print(f"🧱 已按 {raw_table} 填充 wallpapers.{column}（{cursor.rowcount} 张壁纸有变化）")
+
+
+def ensure_schema(cursor):
+    """
+    确保分片表和 wallpapers.favorites 字段存在
+    首次创建分片表时先按原始记录填充基础字段，再创建分片表：
+    接口在分片表出现后才改为读取 基础字段 + 分片增量，不会读到未填充的计数
+    Args:
+        cursor: 数据库游标
+    """
+    cursor.execute("SHOW COLUMNS FROM wallpapers LIKE 'favorites'")
+    if not cursor.fetchone():
+        cursor.execute("ALTER TABLE wallpapers ADD COLUMN favorites INT NOT NULL DEFAULT 0")
+        print("🧱 已为 wallpapers 添加 favorites 字段")
+    cursor.execute("SHOW TABLES LIKE %s", (SHARD_TABLE,))
+    if not cursor.fetchone():
+        backfill_counters(cursor)
+        cursor.execute(CREATE_SHARD_TABLE_SQL)
+        print(f"🧱 已创建计数分片表 {SHARD_TABLE}")
+
+
+def fold_shards(conn):
+    """
+    把分片增量合并进 wallpapers 表
+    每批锁住一段壁纸ID的分片行，累加到基础字段后删除，期间的新增量会等待锁释放后写入新行
+    Args:
+        conn: 数据库连接
+    Returns:
+        dict: {计数名: 合并的增量总和}
+    """
+    folded = {counter: 0 for counter in COUNTERS}
+    last_id = -1
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute(
+                f"SELECT DISTINCT wallpaper_id FROM `{SHARD_TABLE}` WHERE wallpaper_id > %s "
+                f"ORDER BY wallpaper_id LIMIT %s",
+                (last_id, FOLD_BATCH_SIZE)
+            )
+            wallpaper_ids = [int(row[0]) for row in cursor.fetchall()]
+            if not wallpaper_ids:
+                break
+            last_id = wallpaper_ids[-1]
+
+            cursor.execute(
+                f"SELECT wallpaper_id, counter, SUM(delta) FROM `{SHARD_TABLE}` "
+                f"WHERE wallpaper_id BETWEEN %s AND %s GROUP BY wallpaper_id, counter FOR UPDATE",
+                (wallpaper_ids[0], last_id)
+            )
+            sums = {}
+            for wallpaper_id, counter, delta in cursor.fetchall():
+                if counter in COUNTERS and int(delta):
+                    sums.setdefault(counter, []).append((int(wallpaper_id), int(delta)))
+
+            for counter, items in sums.items():
+                column = COUNTERS[counter][0]
+                cases = ' '.join(['WHEN %s THEN %s'] * len(items))
+                params = [value for item in items for value in item]
+                params += [wallpaper_id for wallpaper_id, _ in items]
+                cursor.execute(
+                    f"""UPDATE wallpapers SET `{column}` = GREATEST(CAST(`{column}` AS SIGNED) + CASE id {cases} ELSE 0 END, 0)
+                        WHERE id IN ({','.join(['%s'] * len(items))})""",
+                    params
+                )
+                folded[counter] += sum(delta for _, delta in items)
+
+            cursor.execute(
+                f"DELETE FROM `{SHARD_TABLE}` WHERE wallpaper_id BETWEEN %s AND %s",
+                (wallpaper_ids[0], last_id)
+            )
+            conn.commit()
+    return folded
+
+
+def find_drift(cursor, counter):
+    """
+    核对某个计数：基础字段 + 未合并增量 应等于原始记录数
+    Args:
+        cursor: 数据库游标
+        counter (str): 计数名
+    Returns:
+        list: [(壁纸ID, 当前计数, 原始记录数), ...]
+    """
+    column, raw_table = COUNTERS[counter]
+    cursor.execute(f"""
+        SELECT w.id,
+               w.`{column}` + COALESCE(s.pending, 0) AS counted,
+               COALESCE(r.actual, 0) AS actual
+        FROM wallpapers w
+        LEFT JOIN (
+            SELECT wallpaper_id, SUM(delta) AS pending FROM `{SHARD_TABLE}`
+            WHERE counter = %s GROUP BY wallpaper_id
+        ) s ON s.wallpaper_id = w.id
+        LEFT JOIN (
+            SELECT wallpaper_id, COUNT(*) AS actual FROM `{raw_table}` GROUP BY wallpaper_id
+        ) r ON r.wallpaper_id = w.id
+        WHERE w.`{column}` + COALESCE(s.pending, 0) <> COALESCE(r.actual, 0)
+        ORDER BY w.id
+    """, (counter,))
+    return [(int(row[0]), int(row[1]), int(row[2])) for row in cursor.fetchall()]
+
+
+def fix_drift(conn, counter, drift):
+    """
+    按原始记录修正基础字段（扣除仍未合并的分片增量）
+    Args:
+        conn: 数据库连接
+        counter (str): 计数名
+        drift (list): find_drift 的结果
+    """
+    column, raw_table = COUNTERS[counter]
+    wallpaper_ids = [wallpaper_id for wallpaper_id, _, _ in drift]
+    with conn.cursor() as cursor:
+        for start in range(0, len(wallpaper_ids), FOLD_BATCH_SIZE):
+            batch = wallpaper_ids[start:start + FOLD_BATCH_SIZE]
+            cursor.execute(f"""
+                UPDATE wallpapers w SET w.`{column}` = GREATEST(
+                    (SELECT COUNT(*) FROM `{raw_table}` r WHERE r.wallpaper_id = w.id)
+                    - COALESCE((SELECT SUM(s.delta) FROM `{SHARD_TABLE}` s
+                                WHERE s.wallpaper_id = w.id AND s.counter = %s), 0),
+                    0)
+                WHERE w.id IN ({','.join(['%s'] * len(batch))})
+            """, [counter] + batch)
+            conn.commit()
+
+
+def reconcile(fix=False, verify=True):
+    """
+    合并分片并核对计数
+    Args:
+        fix (bool): 发现偏差时是否按原始记录修正
+        verify (bool): 是否与原始记录表核对
+    Returns:
+        int: 偏差壁纸总数（修正前），失败时返回-1
+    """
+    start_time = time.time()
+    conn = None
+    total_drift = 0
+    try:
+        conn = pymysql.connect(autocommit=False, **DB_CONFIG)
+        with conn.cursor() as cursor:
+            ensure_schema(cursor)
+        conn.commit()
+
+        folded = fold_shards(conn)
+        print("🧮 分片已合并: " + '，'.join(f"{counter} {delta:+d}" for counter, delta in folded.items()))
+
+        if verify:
+            for counter in COUNTERS:
+                with conn.cursor() as cursor:
+                    drift = find_drift(cursor, counter)
+                conn.commit()
+                total_drift += len(drift)
+                if not drift:
+                    print(f"✅ {counter} 与原始记录一致")
+                    continue
+                gap = sum(actual - counted for _, counted, actual in drift)
+                print(f"⚠️ {counter} 有 {len(drift)} 张壁纸存在偏差，合计差值 {gap:+d}")
+                for wallpaper_id, counted, actual in drift[:MAX_DRIFT_REPORT]:
+                    print(f"   - 壁纸 {wallpaper_id}: 计数 {counted}，原始记录 {actual}")
+                if len(drift) > MAX_DRIFT_REPORT:
+                    print(f"   ... 其余 {len(drift) - MAX_DRIFT_REPORT} 条省略")
+                if fix:
+                    fix_drift(conn, counter, drift)
+                    print(f"🔧 已按原始记录修正 {counter}")
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"❌ 计数对账失败: {e}")
+        return -1
+    finally:
+        if conn:
+            conn.close()
+    print(f"⏱️ 用时 {time.time() - start_time:.2f} 秒")
+    return total_drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并点赞/收藏计数分片并与原始记录核对')
+    parser.add_argument('--fix', action='store_true', help='发现偏差时按原始记录修正 wallpapers 表计数')
+    parser.add_argument('--fold-only', action='store_true', help='只合并分片，不做核对（适合高频计划任务）')
+    args = parser.parse_args()
+    reconcile(fix=args.fix, verify=not args.fold_only)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+壁纸可见性物化脚本
+- 为 wallpapers 表维护反范式字段 is_visible（1=正常显示，0=已流放），列表查询不再联查 wallpaper_exile_status
+- 添加 (is_visible, category, created_at, id) 覆盖索引，按分类和时间翻页只扫描索引
+- 按 wallpaper_operation_log 的自增ID增量刷新：只重算上次处理之后有操作记录的壁纸
+- 生成版本化的 static/data/exiled-ids.json（版本号为已处理的最大日志ID），供流放ID接口配合ETag使用
+"""
+import argparse
+import json
+import os
+import time
+
+import pymysql
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': '',
+    'database': 'wallpaper_db',
+    'charset': 'utf8mb4'
+}
+
+STATE_PATH = os.path.join('instance', 'exile_refresh_state.json')
+EXILED_IDS_PATH = os.path.join('static', 'data', 'exiled-ids.json')
+
+VISIBILITY_INDEX = ('idx_visible_category_created', '(is_visible, category, created_at, id)')
+
+# 增量刷新时每批更新的壁纸数
+UPDATE_BATCH_SIZE = 500
+
+
+def load_state():
+    """
+    读取上次处理到的操作日志ID
+    Returns:
+        int|None: 最大日志ID，没有记录时返回None（需要全量重建）
+    """
+    if not os.path.exists(STATE_PATH):
+        return None
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return int(json.load(f)['last_log_id'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_state(last_log_id):
+    """
+    保存已处理的最大操作日志ID
+    Args:
+        last_log_id (int): 最大日志ID
+    """
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'last_log_id': last_log_id, 'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def ensure_visibility_column(cursor):
+    """
+    确保 is_visible 字段和覆盖索引存在
+    Args:
+        cursor: 数据库游标
+    Returns:
+        bool: 字段是否为本次新建（新建后需要全量重建）
+    """
+    created = False
+    cursor.execute("SHOW COLUMNS FROM wallpapers LIKE 'is_visible'")
+    if not cursor.fetchone():
+        cursor.execute("ALTER TABLE wallpapers ADD COLUMN is_visible TINYINT(1) NOT NULL DEFAULT 1")
+        print("🧱 已为 wallpapers 添加 is_visible 字段")
+        created = True
+
+    index_name, columns = VISIBILITY_INDEX
+    cursor.execute(
+        """SELECT COUNT(*) FROM information_schema.statistics
+           WHERE table_schema = DATABASE() AND table_name = 'wallpapers' AND index_name = %s""",
+        (index_name,)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE wallpapers ADD INDEX `{index_name}` {columns}")
+        print(f"🧱 已为 wallpapers 添加索引 {index_name}")
+    return created
+
+
+def rebuild_all(cursor):
+    """
+    全量重算所有壁纸的 is_visible
+    Args:
+        cursor: 数据库游标
+    Returns:
+        int: 变化的行数
+    """
+    cursor.execute("""
+        UPDATE wallpapers w
+        LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id
+        SET w.is_visible = IF(wes.status = 1, 0, 1)
+    """)
+    return cursor.rowcount
+
+
+def refresh_changed(cursor, last_log_id):
+    """
+    只重算上次处理之后出现在操作日志中的壁纸
+    Args:
+        cursor: 数据库游标
+        last_log_id (int): 上次处理到的日志ID
+    Returns:
+        int: 变化的行数
+    """
+    cursor.execute(
+        "SELECT DISTINCT wallpaper_id FROM wallpaper_operation_log WHERE id > %s",
+        (last_log_id,)
+    )
+    wallpaper_ids = [row[0] for row in cursor.fetchall()]
+    changed = 0
+    for start in range(0, len(wallpaper_ids), UPDATE_BATCH_SIZE):
+        batch = wallpaper_ids[start:start + UPDATE_BATCH_SIZE]
+        placeholders = ','.join(['%s'] * len(batch))
+        cursor.execute(f"""
+            UPDATE wallpapers w
+            LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id
+            SET w.is_visible = IF(wes.status = 1, 0, 1)
+            WHERE w.id IN ({placeholders})
+        """, batch)
+        changed += cursor.rowcount
+    return changed
+
+
+def write_exiled_ids(cursor, version):
+    """
+    生成版本化的流放ID文件，格式与 api/get_exiled_wallpaper_ids.php 的返回数据一致
+    Args:
+        cursor: 数据库游标
+        version (int): 版本号（已处理的最大日志ID）
+    Returns:
+        int: 流放壁纸数量
+    """
+    cursor.execute(
+        "SELECT wallpaper_id, updated_at FROM wallpaper_exile_status WHERE status = 1 ORDER BY updated_at DESC"
+    )
+    data = [
+        {'id': int(wallpaper_id), 'exile_time': updated_at.strftime('%Y-%m-%d %H:%M:%S') if updated_at else None}
+        for wallpaper_id, updated_at in cursor.fetchall()
+    ]
+    os.makedirs(os.path.dirname(EXILED_IDS_PATH), exist_ok=True)
+    tmp_path = EXILED_IDS_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'data': data}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, EXILED_IDS_PATH)
+    return len(data)
+
+
+def refresh_exile_status(full=False):
+    """
+    刷新 is_visible 字段和流放ID文件
+    Args:
+        full (bool): 是否忽略增量状态全量重建
+    Returns:
+        bool: 是否成功
+    """
+    conn = None
+    try:
+        conn = pymysql.connect(autocommit=False, **DB_CONFIG)
+        with conn.cursor() as cursor:
+            created = ensure_visibility_column(cursor)
+
+            # 先取日志高水位，之后写入的日志留给下一次增量处理
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM wallpaper_operation_log")
+            max_log_id = int(cursor.fetchone()[0])
+
+            last_log_id = None if (full or created) else load_state()
+            if last_log_id is None:
+                changed = rebuild_all(cursor)
+                print(f"🔄 已全量重建 is_visible，变化 {changed} 行")
+            elif max_log_id > last_log_id:
+                changed = refresh_changed(cursor, last_log_id)
+                print(f"🔁 增量处理日志 {last_log_id + 1}-{max_log_id}，变化 {changed} 行")
+            else:
+                print("✅ 没有新的流放/召回记录")
+            conn.commit()
+
+            exiled_count = write_exiled_ids(cursor, max_log_id)
+        save_state(max_log_id)
+        print(f"📄 流放ID文件已更新: {EXILED_IDS_PATH}（{exiled_count} 张，版本 {max_log_id}）")
+        return True
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        print(f"❌ 刷新流放状态失败: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='刷新壁纸可见性字段和流放ID文件')
+    parser.add_argument('--full', action='store_true', help='忽略增量状态，全量重建 is_visible')
+    args = parser.parse_args()
+    refresh_exile_status(full=args.full)
+
+
+if __name__ == '__main__':
+    main()
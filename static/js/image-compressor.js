@@ -28,6 +28,17 @@ const ImageCompressor = {
         }
     },
 
+    // 服务器端压缩版本清单（由 compress_wallpapers.py 生成）
+    variantManifestUrl: 'static/data/variants.json',
+    // 生成srcset时参与的压缩类型（从小到大）
+    srcsetTypes: ['thumbnail', 'preview', 'original'],
+    variantManifest: null,
+    _variantManifestPromise: null,
+
+    // blurhash 解码后的占位图尺寸及缓存（同一张壁纸只解码一次）
+    placeholderSize: 32,
+    placeholderCache: new Map(),
+
     // 缓存管理
     cache: new Map(),
     cacheSize: 0,
@@ -100,6 +111,16 @@ const ImageCompressor = {
      */
     async tryLoadCompressedVersion(originalPath, type, config) {
         console.log(`[ImageCompressor] tryLoadCompressedVersion: 处理 ${originalPath} (${type})`);
+
+        // 优先查压缩版本清单，命中或确认不存在时都无需HEAD探测
+        const manifest = await this.loadVariantManifest();
+        if (manifest) {
+            const normalizedPath = originalPath.startsWith('/') ? originalPath.substring(1) : originalPath;
+            const variants = manifest[normalizedPath];
+            const variantPath = variants && variants[type] ? await this.pickBestFormat(variants[type]) : null;
+            console.log(`[ImageCompressor] tryLoadCompressedVersion: 清单查找结果: ${variantPath}`);
+            return variantPath || null;
+        }
         // 构建压缩版本的路径
         const compressedPath = this.buildCompressedPath(originalPath, type, config);
         console.log(`[ImageCompressor] tryLoadCompressedVersion: 构建的压缩路径: ${compressedPath}`);
@@ -123,6 +144,92 @@ const ImageCompressor = {
         return null; // 不存在则返回null，让上层函数回退到原图
     },
 
+    /**
+     * 按浏览器支持情况从格式阶梯中选出最优的图片地址（AVIF → WebP → JPEG）
+     * @param {Object} formats - {avif|webp|jpeg: 图片路径 或 {url, width, height, bytes}}
+     * @returns {Promise<string|null>} 图片路径
+     */
+    async pickBestFormat(formats) {
+        const variant = await this.pickBestVariant(formats);
+        return variant ? variant.url : null;
+    },
+
+    /**
+     * 按浏览器支持情况选出最优格式的压缩版本
+     * @param {Object} formats - {avif|webp|jpeg: 图片路径 或 {url, width, height, bytes}}
+     * @returns {Promise<Object|null>} {url, width, height, bytes, format}，宽高未知时为0
+     */
+    async pickBestVariant(formats) {
+        if (!formats) return null;
+        let format = null;
+        if (formats.avif && await this.checkAvifSupport()) {
+            format = 'avif';
+        } else if (formats.webp && await this.checkWebPSupport()) {
+            format = 'webp';
+        } else if (formats.jpeg) {
+            format = 'jpeg';
+        }
+        if (!format) return null;
+        const entry = formats[format];
+        if (typeof entry === 'string') {
+            return { url: entry, width: 0, height: 0, bytes: 0, format };
+        }
+        return { url: entry.url, width: entry.width || 0, height: entry.height || 0, bytes: entry.bytes || 0, format };
+    },
+
+    /**
+     * 根据列表数据自带的压缩版本信息直接选出图片地址并生成srcset，不发任何探测请求
+     * @param {Object} variants - {thumbnail|preview|original: {avif|webp|jpeg: {url, width, height, bytes}}}
+     * @param {string} type - 作为src的压缩类型
+     * @returns {Promise<Object|null>} {src, srcset, width, height}，没有可用版本时返回null
+     */
+    async resolveVariants(variants, type = 'preview') {
+        if (!variants) return null;
+        const candidates = [];
+        for (const variantType of this.srcsetTypes) {
+            const variant = await this.pickBestVariant(variants[variantType]);
+            if (variant) {
+                candidates.push({ type: variantType, ...variant });
+            }
+        }
+        if (candidates.length === 0) return null;
+
+        const main = candidates.find(item => item.type === type) || candidates[candidates.length - 1];
+        // srcset 以空格分隔地址和宽度描述符，地址中的空格和中文需要编码
+        const srcset = candidates
+            .filter(item => item.width > 0)
+            .map(item => `${encodeURI(item.url)} ${item.width}w`)
+            .join(', ');
+        return { src: main.url, srcset, width: main.width, height: main.height };
+    },
+
+    /**
+     * 加载服务器端压缩版本清单，只请求一次
+     * 清单格式: {原图路径: {压缩类型: {avif|webp|jpeg: 压缩图路径}}}
+     * @returns {Promise<Object|null>} 清单对象，加载失败时返回null（回退到路径推测+HEAD探测）
+     */
+    loadVariantManifest() {
+        if (!this._variantManifestPromise) {
+            this._variantManifestPromise = fetch(this.variantManifestUrl)
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                    }
+                    return response.json();
+                })
+                .then(manifest => {
+                    this.variantManifest = manifest;
+                    console.log(`[ImageCompressor] loadVariantManifest: 已加载 ${Object.keys(manifest).length} 条压缩版本记录`);
+                    return manifest;
+                })
+                .catch(error => {
+                    console.warn('[ImageCompressor] loadVariantManifest: 清单加载失败，回退到路径探测', error);
+                    return null;
+                });
+        }
+        return this._variantManifestPromise;
+    },
+
     /**
      * 构建压缩图片路径
      * @param {string} originalPath - 原图路径
@@ -213,6 +320,131 @@ const ImageCompressor = {
         }
     },
 
+    /**
+     * 检查AVIF支持（解码一张1x1的AVIF图片）
+     * @returns {Promise<boolean>} 是否支持AVIF
+     */
+    checkAvifSupport() {
+        if (this._avifSupportPromise) {
+            return this._avifSupportPromise;
+        }
+
+        this._avifSupportPromise = new Promise(resolve => {
+            const img = new Image();
+            img.onload = () => resolve(img.width > 0 && img.height > 0);
+            img.onerror = () => resolve(false);
+            img.src = 'data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1BMUIAAADrbWV0YQAAAAAAAAAhaGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAAAAAAAOcGl0bQAAAAAAAQAAAB5pbG9jAAAAAEQAAAEAAQAAAAEAAAETAAAAIQAAAChpaW5mAAAAAAABAAAAGmluZmUCAAAAAAEAAGF2MDFDb2xvcgAAAABqaXBycAAAAEtpcGNvAAAAFGlzcGUAAAAAAAAAAQAAAAEAAAAQcGl4aQAAAAADCAgIAAAADGF2MUOBAAwAAAAAE2NvbHJuY2x4AAEADQAGgAAAABdpcG1hAAAAAAAAAAEAAQQBAoMEAAAAKW1kYXQSAAoIGAAGiAhoNCAyExlHh4Yhh5555oAAAJBAyRxgimo=';
+        });
+        return this._avifSupportPromise;
+    },
+
+    /**
+     * 解码 blurhash 为 RGBA 像素（编码由 compress_wallpapers.py 的 encode_blurhash 生成）
+     * @param {string} hash - blurhash 字符串
+     * @param {number} width - 输出宽度
+     * @param {number} height - 输出高度
+     * @returns {Uint8ClampedArray|null} RGBA像素，字符串无效时返回null
+     */
+    decodeBlurhash(hash, width, height) {
+        const chars = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~';
+        const decode83 = (str) => {
+            let value = 0;
+            for (const ch of str) {
+                const digit = chars.indexOf(ch);
+                if (digit < 0) {
+                    return NaN;
+                }
+                value = value * 83 + digit;
+            }
+            return value;
+        };
+        const srgbToLinear = (value) => {
+            const v = value / 255;
+            return v <= 0.04045 ? v / 12.92 : Math.pow((v + 0.055) / 1.055, 2.4);
+        };
+        const linearToSrgb = (value) => {
+            const v = Math.max(0, Math.min(1, value));
+            return v <= 0.0031308 ? Math.round(v * 12.92 * 255) : Math.round((1.055 * Math.pow(v, 1 / 2.4) - 0.055) * 255);
+        };
+        const signPow = (value, exp) => Math.sign(value) * Math.pow(Math.abs(value), exp);
+
+        if (!hash || hash.length < 6) {
+            return null;
+        }
+        const sizeFlag = decode83(hash[0]);
+        const numX = (sizeFlag % 9) + 1;
+        const numY = Math.floor(sizeFlag / 9) + 1;
+        if (Number.isNaN(sizeFlag) || hash.length !== 4 + 2 * numX * numY) {
+            return null;
+        }
+        const maximumValue = (decode83(hash[1]) + 1) / 166;
+        const colors = [];
+        for (let i = 0; i < numX * numY; i++) {
+            if (i === 0) {
+                const value = decode83(hash.substring(2, 6));
+                colors.push([srgbToLinear(value >> 16), srgbToLinear((value >> 8) & 255), srgbToLinear(value & 255)]);
+            } else {
+                const value = decode83(hash.substring(4 + i * 2, 6 + i * 2));
+                colors.push([
+                    signPow((Math.floor(value / (19 * 19)) - 9) / 9, 2) * maximumValue,
+                    signPow((Math.floor(value / 19) % 19 - 9) / 9, 2) * maximumValue,
+                    signPow((value % 19 - 9) / 9, 2) * maximumValue
+                ]);
+            }
+        }
+
+        const pixels = new Uint8ClampedArray(width * height * 4);
+        for (let y = 0; y < height; y++) {
+            for (let x = 0; x < width; x++) {
+                let r = 0, g = 0, b = 0;
+                for (let j = 0; j < numY; j++) {
+                    const basisY = Math.cos(Math.PI * y * j / height);
+                    for (let i = 0; i < numX; i++) {
+                        const basis = Math.cos(Math.PI * x * i / width) * basisY;
+                        const color = colors[i + j * numX];
+                        r += color[0] * basis;
+                        g += color[1] * basis;
+                        b += color[2] * basis;
+                    }
+                }
+                const offset = 4 * (x + y * width);
+                pixels[offset] = linearToSrgb(r);
+                pixels[offset + 1] = linearToSrgb(g);
+                pixels[offset + 2] = linearToSrgb(b);
+                pixels[offset + 3] = 255;
+            }
+        }
+        return pixels;
+    },
+
+    /**
+     * 把 blurhash 渲染为可直接用作背景图的 data URL
+     * @param {string} hash - blurhash 字符串
+     * @returns {string|null} data URL，无法解码时返回null
+     */
+    blurhashToDataURL(hash) {
+        if (this.placeholderCache.has(hash)) {
+            return this.placeholderCache.get(hash);
+        }
+        let url = null;
+        try {
+            const size = this.placeholderSize;
+            const pixels = this.decodeBlurhash(hash, size, size);
+            if (pixels) {
+                const canvas = document.createElement('canvas');
+                canvas.width = size;
+                canvas.height = size;
+                const ctx = canvas.getContext('2d');
+                ctx.putImageData(new ImageData(pixels, size, size), 0, 0);
+                url = canvas.toDataURL();
+            }
+        } catch (error) {
+            console.warn('[ImageCompressor] blurhashToDataURL: 解码失败', error);
+        }
+        this.placeholderCache.set(hash, url);
+        return url;
+    },
+
     /**
      * 添加到缓存
      * @param {string} key - 缓存键
@@ -13,6 +13,9 @@ const ImageLoader = {
     // 滚动加载的阈值（距离底部多少像素开始加载）
     SCROLL_THRESHOLD: 800, // 2024-07-26 修复：增加滚动加载阈值，确保用户拉到底部才加载
 
+    // 卡片图片的显示宽度，与 main.css 中瀑布流的列数断点一致，供 srcset 选择合适尺寸
+    cardImageSizes: '(min-width: 1280px) 25vw, (min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw',
+
     // 状态管理
     state: {
         allWallpapers: [],
@@ -34,6 +37,10 @@ const ImageLoader = {
         isUserAdmin: false, // 2024-07-28 新增：用户是否为管理员
         exiledWallpaperIds: new Set(), // 2024-07-28 新增：存储被流放壁纸的ID
         exiledWallpapersData: [], // 2024-12-19 新增：存储流放壁纸的完整数据（包含时间）
+        listIndex: null, // 壁纸列表分片索引（static/data/list-index.json）
+        loadedShardCount: 0, // 已加载的分片数，其余分片在需要更多壁纸时才加载
+        shardOrder: [], // 分片加载顺序（随机打乱的分片下标）
+        shardLoadPromise: null, // 正在进行的分片加载，避免重复请求同一分片
         isPageReady: false, // 2024-12-19 新增：页面是否加载完成，防止快速点击
         viewSwitchDebounce: null // 2024-12-19 新增：视图切换防抖定时器
     },
@@ -88,16 +95,31 @@ const ImageLoader = {
 
     /**
      * 加载壁纸数据
+     * 优先使用分片索引：只加载一个分片完成首屏，其余分片在翻页/加载更多需要时才加载；
+     * 分片按ID顺序生成（供 sync_wallpapers_db.py 归并比对），加载顺序随机打乱，
+     * 首屏不会总是最早的一批壁纸，随机挑选的范围也随已加载分片扩大到整个图库；
+     * 索引不存在时回退到完整的 list.json
      */
     async loadWallpaperData() {
         try {
-            const response = await fetch('static/data/list.json');
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            // 与列表数据并行加载压缩版本清单，渲染卡片时即可直接解析图片地址
+            if (typeof ImageCompressor !== 'undefined') {
+                ImageCompressor.loadVariantManifest();
             }
-            
-            const data = await response.json();
-            let wallpapers = Array.isArray(data) ? data : [];
+
+            const listIndex = await this._fetchListIndex();
+            let wallpapers;
+            if (listIndex && listIndex.shards.length > 0) {
+                const shardOrder = this._shuffleArray(listIndex.shards.map((_, index) => index));
+                wallpapers = await this._fetchStaticJson(listIndex.shards[shardOrder[0]].file, listIndex.version);
+                this.state.listIndex = listIndex;
+                this.state.shardOrder = shardOrder;
+                this.state.loadedShardCount = 1;
+            } else {
+                const data = await this._fetchStaticJson('static/data/list.json');
+                wallpapers = data;
+            }
+            wallpapers = Array.isArray(wallpapers) ? wallpapers : [];
 
             // 2024-12-19 优化：移除localStorage固定顺序逻辑，实现真正的随机按需加载
             // 不再保存和加载固定顺序，每次都保持原始数据顺序，由_getPaginatedRandomWallpapers负责随机选择
@@ -119,12 +141,130 @@ const ImageLoader = {
         }
     },
 
+    /**
+     * 获取静态JSON数据文件（与接口请求用的_fetchJson区分）
+     * @param {string} url - 请求地址
+     * @param {string} [version] - 数据版本号，用于在列表更新后绕过缓存
+     * @returns {Promise<any>} 解析后的数据
+     */
+    async _fetchStaticJson(url, version) {
+        const response = await fetch(version ? `${url}?v=${encodeURIComponent(version)}` : url);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+        }
+        return response.json();
+    },
+
+    /**
+     * 获取壁纸列表分片索引
+     * @returns {Promise<Object|null>} 索引对象，不存在或加载失败时返回null
+     */
+    async _fetchListIndex() {
+        try {
+            const listIndex = await this._fetchStaticJson('static/data/list-index.json', Date.now().toString());
+            return listIndex && Array.isArray(listIndex.shards) ? listIndex : null;
+        } catch (error) {
+            console.warn('[调试-列表分片] 分片索引加载失败，回退到完整list.json', error);
+            return null;
+        }
+    },
+
+    /**
+     * 是否还有未加载的列表分片
+     * @returns {boolean}
+     */
+    _hasUnloadedShards() {
+        const listIndex = this.state.listIndex;
+        return !!listIndex && this.state.loadedShardCount < listIndex.shards.length;
+    },
+
+    /**
+     * 按 shardOrder 加载下一个分片并并入列表，同一时间只加载一个分片
+     * @returns {Promise<boolean>} 是否加载了新的分片
+     */
+    async _loadNextShard() {
+        if (this.state.shardLoadPromise) {
+            return this.state.shardLoadPromise;
+        }
+        if (!this._hasUnloadedShards()) {
+            return false;
+        }
+        const listIndex = this.state.listIndex;
+        const shard = listIndex.shards[this.state.shardOrder[this.state.loadedShardCount]];
+        this.state.shardLoadPromise = (async () => {
+            try {
+                const items = await this._fetchStaticJson(shard.file, listIndex.version);
+                if (this.state.listIndex !== listIndex) {
+                    return false;
+                }
+                this.state.loadedShardCount++;
+                if (Array.isArray(items)) {
+                    this.state.allWallpapers.push(...items);
+                    this.filterWallpapers();
+                }
+                return true;
+            } catch (error) {
+                // 加载失败的分片跳过，避免翻页一直卡在同一个分片上
+                console.error(`[调试-列表分片] 分片加载失败: ${shard.file}`, error);
+                this.state.loadedShardCount++;
+                return true;
+            } finally {
+                this.state.shardLoadPromise = null;
+            }
+        })();
+        return this.state.shardLoadPromise;
+    },
+
+    /**
+     * 按需加载分片，直到当前过滤条件下有足够的未显示壁纸或分片全部加载
+     * 当前分类在 list-index.json 中的数量已全部加载时不再继续请求；
+     * 流放列表、收藏/点赞视图需要完整数据排序和筛选，直接加载全部分片
+     * @param {number} needed - 需要的未显示壁纸数量
+     */
+    async _ensureWallpapersAvailable(needed) {
+        while (this._canLoadMoreShards()) {
+            if (this.state.currentDisplayMode === 'normal'
+                && this.state.filteredWallpapers.length - this.state.displayedWallpapers.size >= needed) {
+                break;
+            }
+            if (!await this._loadNextShard()) {
+                break;
+            }
+        }
+    },
+
+    /**
+     * 后续分片是否可能提供当前视图的更多壁纸
+     * 选择了分类（未搜索）且该分类在 list-index.json 中的数量已全部加载时返回false
+     * @returns {boolean}
+     */
+    _canLoadMoreShards() {
+        if (!this._hasUnloadedShards()) {
+            return false;
+        }
+        const category = this.state.currentCategory;
+        const categoryCounts = this.state.listIndex.categories || {};
+        if (this.state.currentDisplayMode !== 'normal' || category === 'all'
+            || this.state.searchKeyword || !(category in categoryCounts)) {
+            return true;
+        }
+        const loaded = this.state.allWallpapers.filter(w => w.category === category).length;
+        return loaded < categoryCounts[category];
+    },
+
     /**
      * 提取分类信息
      */
     extractCategories() {
         this.state.categories.clear();
         this.state.categories.add('all');
+
+        // 使用分片索引时分类来自索引，首屏即可显示完整分类导航
+        if (this.state.listIndex && this.state.listIndex.categories) {
+            Object.keys(this.state.listIndex.categories).forEach(category => {
+                this.state.categories.add(category);
+            });
+        }
         
         this.state.allWallpapers.forEach(wallpaper => {
             if (wallpaper.category) {
@@ -464,6 +604,9 @@ const ImageLoader = {
             this.state.currentPage = 0; // 2024-07-30 修复：重置页码以从头开始随机加载
         }
         
+        // 当前已加载的分片不足一页时先加载后续分片
+        await this._ensureWallpapersAvailable(this.state.itemsPerPage);
+        
         // 2024-07-30 修复：从随机分页函数获取壁纸
         const wallpapersToShow = this._getPaginatedRandomWallpapers();
         
@@ -482,28 +625,13 @@ const ImageLoader = {
             const card = await this.createWallpaperCard(wallpaper);
             fragment.appendChild(card);
             this.state.displayedWallpapers.add(wallpaper.id);
-
-            // 2024-07-26 修复：直接在此处检查收藏和点赞状态，确保与当前wallpaper关联
-            const favoriteButton = card.querySelector('.card-favorite-btn');
-            if (favoriteButton) {
-                const wallpaperId = parseInt(favoriteButton.dataset.wallpaperId);
-                if (!isNaN(wallpaperId)) {
-                    await this._checkCardFavoriteStatus(wallpaperId, favoriteButton);
-                }
-            }
-            const likeButton = card.querySelector('.card-like-btn');
-            if (likeButton) {
-                const wallpaperId = parseInt(likeButton.dataset.wallpaperId);
-                if (!isNaN(wallpaperId)) {
-                    await this._checkCardLikeStatus(wallpaperId, likeButton);
-                    // 点赞数在后端每次请求时会更新，这里只需初始显示即可，无需额外请求
-                    // 如果需要实时更新，可以考虑WebSocket或在toggle_like接口返回最新点赞数
-                }
-            }
         }
         
         container.appendChild(fragment);
         
+        // 卡片先显示，本页点赞/收藏状态随后一次批量获取并更新到已插入的卡片上，不阻塞渲染
+        this._applyCardStates(wallpapersToShow.map(w => w.id), container);
+        
         // 更新加载更多按钮状态
         this.updateLoadMoreButton();
     },
@@ -642,6 +770,7 @@ const ImageLoader = {
             if (!placeholder) {
                 return;
             }
+            this._paintPlaceholder(placeholder, wallpaper);
             
             if (!wallpaper.path || typeof wallpaper.path !== 'string') {
                 throw new Error(`无效的图片路径: ${wallpaper.name}`);
@@ -662,9 +791,11 @@ const ImageLoader = {
             
             // 错误处理
             img.onerror = (e) => {
-                // 2024-07-16 修复：尝试使用原始路径
-                if (img.src !== wallpaper.path && wallpaper.path.startsWith('static/')) { // 避免无限循环尝试和非项目内路径
-                    img.src = wallpaper.path;
+                // 2024-07-16 修复：尝试使用原始路径（优先使用内容寻址地址，可长期缓存）
+                const originalUrl = wallpaper.url || wallpaper.path;
+                if (!img.src.endsWith(originalUrl) && originalUrl.startsWith('static/')) { // 避免无限循环尝试和非项目内路径
+                    img.removeAttribute('srcset'); // srcset 优先于 src，回退原图前先移除
+                    img.src = originalUrl;
                     return; // 给原始路径一次机会加载
                 }
                 
@@ -679,8 +810,26 @@ const ImageLoader = {
                 if (errorText) errorText.textContent = '加载失败';
             };
 
-            // 获取压缩图片URL（使用ImageCompressor）
-            const imageUrl = await this.getCompressedImageUrl(wallpaper.path);
+            // 列表数据自带压缩版本信息时直接选图并生成srcset，否则回退到ImageCompressor查找
+            let imageUrl = null;
+            if (wallpaper.variants && typeof ImageCompressor !== 'undefined') {
+                const resolved = await ImageCompressor.resolveVariants(wallpaper.variants, 'preview');
+                if (resolved) {
+                    imageUrl = resolved.src;
+                    if (resolved.srcset) {
+                        img.sizes = this.cardImageSizes;
+                        img.srcset = resolved.srcset;
+                    }
+                    if (resolved.width && resolved.height) {
+                        // 预先给出宽高，图片下载前即可按比例占位
+                        img.width = resolved.width;
+                        img.height = resolved.height;
+                    }
+                }
+            }
+            if (!imageUrl) {
+                imageUrl = await this.getCompressedImageUrl(wallpaper.path);
+            }
             
             // 直接设置src，利用浏览器原生懒加载
             img.src = imageUrl;
@@ -704,6 +853,37 @@ const ImageLoader = {
         }
     },
 
+    /**
+     * 图片下载前先用列表数据中的主色调和 blurhash 绘制占位，并按原图比例撑开高度
+     * @param {HTMLElement} placeholder - 卡片占位元素
+     * @param {Object} wallpaper - 壁纸数据（color / blurhash / width / height 由 update_list.py 写入）
+     */
+    _paintPlaceholder(placeholder, wallpaper) {
+        if (wallpaper.width && wallpaper.height) {
+            placeholder.style.aspectRatio = `${wallpaper.width} / ${wallpaper.height}`;
+            placeholder.style.minHeight = '0';
+        }
+        if (!wallpaper.color && !wallpaper.blurhash) {
+            return;
+        }
+        placeholder.classList.remove('bg-gray-200');
+        if (wallpaper.color) {
+            placeholder.style.backgroundColor = wallpaper.color;
+        }
+        const blurUrl = wallpaper.blurhash && typeof ImageCompressor !== 'undefined'
+            ? ImageCompressor.blurhashToDataURL(wallpaper.blurhash)
+            : null;
+        if (blurUrl) {
+            placeholder.style.backgroundImage = `url(${blurUrl})`;
+            placeholder.style.backgroundSize = '100% 100%';
+        }
+        // 有颜色占位时不再显示"加载中"文字
+        const loadingText = placeholder.querySelector('.text-gray-400');
+        if (loadingText) {
+            loadingText.style.visibility = 'hidden';
+        }
+    },
+
     /**
      * 预加载下一页图片
      */
@@ -733,7 +913,15 @@ const ImageLoader = {
                     if (!this.state.preloadedImages.has(wallpaper.id)) {
                         try {
                             const img = new Image();
-                            const imageUrl = await this.getCompressedImageUrl(wallpaper.path);
+                            // 与卡片使用相同的 srcset，预加载的正是卡片稍后会选用的尺寸
+                            const resolved = wallpaper.variants && typeof ImageCompressor !== 'undefined'
+                                ? await ImageCompressor.resolveVariants(wallpaper.variants, 'preview')
+                                : null;
+                            if (resolved && resolved.srcset) {
+                                img.sizes = this.cardImageSizes;
+                                img.srcset = resolved.srcset;
+                            }
+                            const imageUrl = resolved ? resolved.src : await this.getCompressedImageUrl(wallpaper.path);
                             img.src = imageUrl;
                             this.state.preloadedImages.add(wallpaper.id);
                             await new Promise((resolve, reject) => {
@@ -799,7 +987,8 @@ const ImageLoader = {
         
         // 2024-12-19 修改：支持流放视图的加载更多功能
         // 检查是否有更多数据可以显示
-        const hasMore = this.state.filteredWallpapers.length > this.state.displayedWallpapers.size;
+        const hasMore = this.state.filteredWallpapers.length > this.state.displayedWallpapers.size
+            || this._canLoadMoreShards();
         if (!hasMore) {
             this.updateLoadMoreButton();
             return;
@@ -835,7 +1024,8 @@ const ImageLoader = {
         }
         
         // 2024-07-30 修复：判断是否有更多未显示的壁纸
-        const hasMoreWallpapersToDisplay = this.state.filteredWallpapers.length > this.state.displayedWallpapers.size;
+        const hasMoreWallpapersToDisplay = this.state.filteredWallpapers.length > this.state.displayedWallpapers.size
+            || this._canLoadMoreShards();
         
         loadMoreBtn.disabled = this.state.isLoading || !hasMoreWallpapersToDisplay; // 如果正在加载或没有更多壁纸，则禁用按钮
         
@@ -900,32 +1090,54 @@ const ImageLoader = {
     },
 
     /**
-     * 检查用户收藏状态并更新首页卡片UI
-     * @param {number} wallpaperId - 壁纸ID
-     * @param {HTMLElement} favoriteBtn - 收藏按钮元素
+     * 批量获取壁纸的点赞/收藏状态并更新卡片UI
+     * @param {Array<number>} wallpaperIds - 本页壁纸ID
+     * @param {ParentNode} root - 卡片所在的容器或文档片段
      */
-    async _checkCardFavoriteStatus(wallpaperId, favoriteBtn) {
-        const favoriteIcon = favoriteBtn.querySelector('.card-favorite-icon');
-        if (!favoriteIcon) return;
+    async _applyCardStates(wallpaperIds, root) {
+        const ids = wallpaperIds.filter(id => !isNaN(parseInt(id)));
+        if (ids.length === 0) return;
 
+        let states = {};
         try {
-            const response = await this._fetchJson('api/my_favorites.php', 'GET');
+            const response = await this._fetchJson(`api/wallpaper_states.php?ids=${ids.join(',')}`, 'GET');
             if (response.code === 0 && response.data) {
-                const isFavorited = response.data.some(favWallpaper => favWallpaper.id === wallpaperId);
-                if (isFavorited) {
-                    favoriteIcon.src = 'static/icons/fa-star.svg';
-                    favoriteBtn.classList.add('favorited');
-                } else {
-                    favoriteIcon.src = 'static/icons/fa-star-o.svg';
-                    favoriteBtn.classList.remove('favorited');
-                }
-            } else if (response.code === 401) {
-                // 用户未登录，恢复默认状态
-                favoriteIcon.src = 'static/icons/fa-star-o.svg';
-                favoriteBtn.classList.remove('favorited');
+                states = response.data;
+            } else {
+                console.warn('[调试-壁纸状态] 批量获取点赞/收藏状态失败:', response.msg);
             }
         } catch (error) {
-            // 忽略错误，不显示
+            console.warn('[调试-壁纸状态] 批量获取点赞/收藏状态请求错误:', error);
+        }
+
+        // 请求失败时保留卡片创建时按 userFavorites 设置的初始状态
+        for (const id of ids) {
+            const state = states[id];
+            if (!state) continue;
+            if (state.favorited) {
+                this.state.userFavorites.add(id);
+            } else {
+                this.state.userFavorites.delete(id);
+            }
+            if (state.liked) {
+                this.state.userLikes.add(id);
+            } else {
+                this.state.userLikes.delete(id);
+            }
+
+            const favoriteBtn = root.querySelector(`.card-favorite-btn[data-wallpaper-id="${id}"]`);
+            const favoriteIcon = favoriteBtn && favoriteBtn.querySelector('.card-favorite-icon');
+            if (favoriteIcon) {
+                favoriteIcon.src = state.favorited ? 'static/icons/fa-star.svg' : 'static/icons/fa-star-o.svg';
+                favoriteBtn.classList.toggle('favorited', !!state.favorited);
+            }
+
+            const likeBtn = root.querySelector(`.card-like-btn[data-wallpaper-id="${id}"]`);
+            const likeIcon = likeBtn && likeBtn.querySelector('.card-like-icon');
+            if (likeIcon) {
+                likeIcon.src = state.liked ? 'static/icons/fa-heart.svg' : 'static/icons/fa-heart-o.svg';
+                likeIcon.classList.toggle('liked', !!state.liked);
+            }
         }
     },
 
@@ -989,47 +1201,6 @@ const ImageLoader = {
         }
     },
 
-    /**
-     * 检查并更新图片卡片的点赞状态
-     * @param {string} wallpaperId - 壁纸的唯一ID
-     * @param {HTMLElement} likeBtn - 点赞按钮的DOM元素
-     */
-    async _checkCardLikeStatus(wallpaperId, likeBtn) {
-        /**
-         * 检查并更新图片卡片的点赞状态。
-         * @param {string} wallpaperId - 壁纸的唯一ID。
-         * @param {HTMLElement} likeBtn - 点赞按钮的DOM元素。
-         */
-        const likeIcon = likeBtn.querySelector('.card-like-icon');
-        if (!likeIcon) {
-            return;
-        }
-
-        try {
-            const response = await this._fetchJson('api/my_likes.php', 'GET');
-
-            if (response.code === 0 && response.data) {
-                // 确保 wallpaperId 是数字类型，以便与数组中的数字ID进行比较
-                const isLiked = response.data.some(likedId => parseInt(likedId) === parseInt(wallpaperId)); // 2024-07-26 修复：确保ID类型一致性
-                if (isLiked) {
-                    likeIcon.src = 'static/icons/fa-heart.svg'; // 实心
-                    likeIcon.classList.add('liked');
-                } else {
-                    likeIcon.src = 'static/icons/fa-heart-o.svg'; // 空心
-                    likeIcon.classList.remove('liked');
-                }
-            } else {
-                // 即使获取失败，也恢复默认状态，避免误判
-                likeIcon.src = 'static/icons/fa-heart-o.svg';
-                likeIcon.classList.remove('liked');
-            }
-        } catch (error) {
-            // 网络请求错误，恢复默认状态
-            likeIcon.src = 'static/icons/fa-heart-o.svg';
-            likeIcon.classList.remove('liked');
-        }
-    },
-
     /**
      * 根据点赞状态变化事件更新卡片UI
      * @param {number} wallpaperId - 壁纸ID
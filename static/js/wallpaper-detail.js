@@ -131,7 +131,8 @@ const WallpaperDetail = {
         if (previewBtn) {
             previewBtn.addEventListener('click', () => {
                 if (this.currentWallpaper && this.currentWallpaper.path) {
-                    const originalImagePath = this.currentWallpaper.path; // 获取原始图片路径
+                    // 获取原始图片路径，内容寻址存储中有该图时使用不随改名变化的对象地址
+                    const originalImagePath = this.currentWallpaper.url || this.currentWallpaper.path;
                     // 构建跳转URL，传递原始图片路径作为参数
                     const yulanUrl = `yulan.html?image=${encodeURIComponent(originalImagePath)}`;
                     window.open(yulanUrl, '_blank'); // 在新标签页打开
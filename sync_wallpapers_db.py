@@ -2,15 +2,26 @@
 # -*- coding: utf-8 -*-
 """
 自动同步壁纸主表脚本
-- 检查ID唯一性，防止重复
-- 只为新增图片生成 INSERT 并写入数据库
-- 可选：为已删除图片生成 DELETE（需二次确认）
+- 按ID顺序逐个读取 list.json 分片（update_list.py 按ID升序写分片），内存中只保留一个分片
+- 数据库按ID游标分页读取（WHERE id > 上一页最后ID ORDER BY id LIMIT n），与分片做归并比对，
+  同一遍扫描中找出新增、元数据变化和 list.json 中已不存在的壁纸；ID重复或乱序时中止
+- 新增与元数据变化的图片使用 INSERT ... ON DUPLICATE KEY UPDATE 批量写入
+- 可选：删除 list.json 中已不存在的图片（需 --delete 显式确认）；仍在上传压缩队列中、
+  或入库不足 DELETE_GRACE_HOURS 小时的壁纸（可能尚未被 derivative_worker.py 发布到 list.json）不会被删除
+- 每块单独提交事务并以最后处理的ID记录断点，中断后再次运行会从断点继续
+- 新增和元数据变化的壁纸随每块提交增量更新搜索倒排索引（build_search_index.py）
+- 同步结束后刷新计数汇总表 wallpaper_count_summary，供接口游标分页返回近似总数
 - 日志输出
 """
+import argparse
 import json
-import pymysql
 import os
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pymysql
+
+import build_search_index
 
 DB_CONFIG = {
     'host': 'localhost',
@@ -20,91 +31,496 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
-LIST_PATH = os.path.join('static', 'data', 'list.json')
+DATA_DIR = os.path.join('static', 'data')
+LIST_PATH = os.path.join(DATA_DIR, 'list.json')
+LIST_INDEX_PATH = os.path.join(DATA_DIR, 'list-index.json')
+CHECKPOINT_PATH = os.path.join('instance', 'sync_checkpoint.json')
 
-# 连接数据库
-conn = pymysql.connect(**DB_CONFIG)
-cursor = conn.cursor()
+# derivative_worker.py 的上传任务队列，其中的壁纸尚未发布到 list.json
+DERIVATIVE_QUEUE_DIR = os.path.join('instance', 'derivative_queue')
+DERIVATIVE_QUEUE_STATES = ('pending', 'processing', 'failed')
 
-def get_db_wallpaper_ids():
-    cursor.execute("SELECT id FROM wallpapers")
-    return set(str(row[0]) for row in cursor.fetchall())
+# 入库不足该时长的壁纸不参与删除
+DELETE_GRACE_HOURS = 24
 
-def get_list_wallpapers():
-    with open(LIST_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    return data
+# 每块处理的行数，每块一个事务
+CHUNK_SIZE = 1000
 
-def insert_new_wallpapers(new_wallpapers):
-    if not new_wallpapers:
-        print("✅ 没有新增图片需要同步。")
-        return
-    sql = """
-        INSERT INTO wallpapers (
-            id, title, description, file_path, file_size, width, height, 
-            category, tags, format, views, likes, created_at, updated_at
-        ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, 
-            %s, %s, %s, %s, %s, %s, %s
+# 参与比对与更新的元数据字段（浏览量、点赞数、创建时间由站点维护，同步时不覆盖）
+SYNC_FIELDS = ('title', 'description', 'file_path', 'file_size', 'width', 'height',
+               'category', 'tags', 'format')
+
+UPSERT_SQL = """
+    INSERT INTO wallpapers (
+        id, title, description, file_path, file_size, width, height,
+        category, tags, format, views, likes, created_at, updated_at
+    ) VALUES (
+        %s, %s, %s, %s, %s, %s, %s,
+        %s, %s, %s, %s, %s, %s, %s
+    )
+    ON DUPLICATE KEY UPDATE
+        title = VALUES(title),
+        description = VALUES(description),
+        file_path = VALUES(file_path),
+        file_size = VALUES(file_size),
+        width = VALUES(width),
+        height = VALUES(height),
+        category = VALUES(category),
+        tags = VALUES(tags),
+        format = VALUES(format),
+        updated_at = NOW()
+    """
+
+# 计数汇总表：scope 形如 wallpapers:normal:全部、wallpapers:exiled_list:风景、operation_log
+SUMMARY_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS wallpaper_count_summary (
+        scope VARCHAR(191) NOT NULL PRIMARY KEY,
+        total BIGINT NOT NULL DEFAULT 0,
+        updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """
+
+# 游标分页依赖的联合索引 {表名: (索引名, 列)}
+KEYSET_INDEXES = {
+    'wallpapers': ('idx_created_at_id', '(created_at, id)'),
+    'wallpaper_operation_log': ('idx_operation_time_id', '(operation_time, id)')
+}
+
+
+def get_connection():
+    """
+    创建数据库连接，关闭自动提交以便按块控制事务
+    Returns:
+        pymysql.Connection: 数据库连接
+    """
+    return pymysql.connect(autocommit=False, **DB_CONFIG)
+
+
+def get_list_version():
+    """
+    获取当前 list.json 的版本标识，用于判断断点是否仍然有效
+    Returns:
+        str: 版本标识（分片索引版本或 list.json 的大小与修改时间）
+    """
+    if os.path.exists(LIST_INDEX_PATH):
+        with open(LIST_INDEX_PATH, 'r', encoding='utf-8') as f:
+            return 'index:' + str(json.load(f).get('version', ''))
+    stat = os.stat(LIST_PATH)
+    return f"list:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def load_list_index():
+    """
+    读取 update_list.py 生成的分片索引 list-index.json
+    Returns:
+        dict: 分片索引
+    Raises:
+        ValueError: 分片索引不存在或已损坏
+    """
+    if not os.path.exists(LIST_INDEX_PATH):
+        raise ValueError(f"{LIST_INDEX_PATH} 不存在，请先运行 update_list.py 生成分片")
+    try:
+        with open(LIST_INDEX_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{LIST_INDEX_PATH} 读取失败，请重新运行 update_list.py 生成分片: {e}")
+
+
+def iter_list_wallpapers(after_id=None):
+    """
+    按ID升序逐条读取 list.json 分片中的壁纸，内存中只保留一个分片
+    Args:
+        after_id (int): 只返回ID大于该值的壁纸（断点续传）
+    Yields:
+        dict: 壁纸记录
+    Raises:
+        ValueError: 分片索引不存在，或分片之间ID不是升序（旧版分片，需重新运行 update_list.py）
+    """
+    index = load_list_index()
+    last_id = None
+    for shard in index.get('shards', []):
+        if after_id is not None and shard.get('last_id') is not None and int(shard['last_id']) <= after_id:
+            continue
+        with open(os.path.join(*shard['file'].split('/')), 'r', encoding='utf-8') as f:
+            items = sorted(json.load(f), key=lambda w: int(w['id']))
+        if items and last_id is not None and int(items[0]['id']) <= last_id:
+            raise ValueError(f"分片 {shard['file']} 与前一分片的ID范围重叠，请重新运行 update_list.py 按ID顺序生成分片")
+        for w in items:
+            if after_id is None or int(w['id']) > after_id:
+                yield w
+        if items:
+            last_id = int(items[-1]['id'])
+
+
+def iter_db_rows(conn, after_id, page_size):
+    """
+    按ID游标分页读取数据库中的壁纸元数据
+    Args:
+        conn: 数据库连接
+        after_id (int): 从该ID之后开始，None表示从头开始
+        page_size (int): 每页行数
+    Yields:
+        dict: 行字典（含 id、SYNC_FIELDS 和 created_at）
+    """
+    columns = f"id, {', '.join(SYNC_FIELDS)}, created_at"
+    while True:
+        with conn.cursor(pymysql.cursors.DictCursor) as cursor:
+            if after_id is None:
+                cursor.execute(f"SELECT {columns} FROM wallpapers ORDER BY id LIMIT %s", (page_size,))
+            else:
+                cursor.execute(f"SELECT {columns} FROM wallpapers WHERE id > %s ORDER BY id LIMIT %s",
+                               (after_id, page_size))
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        yield from rows
+        after_id = rows[-1]['id']
+
+
+def load_queued_ids():
+    """
+    读取上传压缩队列中尚未发布的壁纸ID
+    Returns:
+        set: 壁纸ID
+    """
+    queued = set()
+    for state in DERIVATIVE_QUEUE_STATES:
+        directory = os.path.join(DERIVATIVE_QUEUE_DIR, state)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    queued.add(int(json.load(f).get('wallpaper_id') or 0))
+            except (OSError, ValueError, TypeError, AttributeError):
+                continue
+    queued.discard(0)
+    return queued
+
+
+def load_checkpoint(list_version):
+    """
+    读取断点，list.json 版本不一致时断点作废
+    Args:
+        list_version (str): 当前 list.json 版本
+    Returns:
+        dict: 断点信息
+    """
+    empty = {'list_version': list_version, 'after_id': None, 'processed': 0, 'done': False}
+    if not os.path.exists(CHECKPOINT_PATH):
+        return empty
+    try:
+        with open(CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return empty
+    if checkpoint.get('list_version') != list_version or checkpoint.get('done'):
+        return empty
+    return {**empty, **checkpoint}
+
+
+def save_checkpoint(checkpoint):
+    """
+    原子写入断点文件，在对应块的事务提交之后调用
+    Args:
+        checkpoint (dict): 断点信息
+    """
+    os.makedirs(os.path.dirname(CHECKPOINT_PATH), exist_ok=True)
+    tmp_path = CHECKPOINT_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+
+def to_row(w):
+    """
+    将 list.json 中的壁纸记录转换为数据库行
+    Args:
+        w (dict): 壁纸记录
+    Returns:
+        dict: 以数据库字段为键的行
+    """
+    created_at = w.get('created_at', datetime.now().strftime('%Y-%m-%d')) + ' 00:00:00'
+    return {
+        'id': w['id'],
+        'title': w['name'],
+        'description': w.get('description', ''),
+        'file_path': w['path'],
+        'file_size': w['size'],
+        'width': w['width'],
+        'height': w['height'],
+        'category': w['category'],
+        'tags': ' '.join(w.get('tags', [])),
+        'format': w['format'],
+        'created_at': created_at
+    }
+
+
+def row_changed(new_row, db_row):
+    """
+    判断元数据是否有变化
+    Args:
+        new_row (dict): list.json 转换后的行
+        db_row (dict): 数据库中的行
+    Returns:
+        bool: 是否需要更新
+    """
+    return any(str(new_row[field] if new_row[field] is not None else '') !=
+               str(db_row[field] if db_row[field] is not None else '')
+               for field in SYNC_FIELDS)
+
+
+def upsert_values(row):
+    """
+    生成 UPSERT_SQL 的参数
+    Args:
+        row (dict): list.json 转换后的行
+    Returns:
+        tuple: 参数
+    """
+    return (
+        row['id'], row['title'], row['description'], row['file_path'],
+        row['file_size'], row['width'], row['height'], row['category'],
+        row['tags'], row['format'],
+        0,  # views
+        0,  # likes
+        row['created_at'],
+        row['created_at']  # created_at 和 updated_at 初始值一致
+    )
+
+
+def flush_chunk(conn, values, deletes):
+    """
+    写入一块的新增/更新和删除，整块在一个事务内提交
+    Args:
+        conn: 数据库连接
+        values (list): UPSERT_SQL 参数列表
+        deletes (list): 要删除的壁纸ID
+    Returns:
+        int: 实际删除的行数
+    """
+    deleted = 0
+    with conn.cursor() as cursor:
+        if values:
+            cursor.executemany(UPSERT_SQL, values)
+        if deletes:
+            placeholders = ','.join(['%s'] * len(deletes))
+            cursor.execute(f"DELETE FROM wallpapers WHERE id IN ({placeholders})", deletes)
+            deleted = cursor.rowcount
+    conn.commit()
+    return deleted
+
+
+def ensure_keyset_indexes(conn):
+    """
+    确保游标分页使用的联合索引存在，缺失时补建
+    Args:
+        conn: 数据库连接
+    """
+    with conn.cursor() as cursor:
+        for table, (index_name, columns) in KEYSET_INDEXES.items():
+            cursor.execute(
+                """SELECT COUNT(*) FROM information_schema.statistics
+                   WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s""",
+                (table, index_name)
+            )
+            if cursor.fetchone()[0] == 0:
+                try:
+                    cursor.execute(f"ALTER TABLE `{table}` ADD INDEX `{index_name}` {columns}")
+                    print(f"🧱 已为 {table} 添加索引 {index_name}")
+                except pymysql.err.ProgrammingError as e:
+                    print(f"⚠️ 无法为 {table} 添加索引: {e}")
+    conn.commit()
+
+
+def refresh_count_summary(conn):
+    """
+    按显示模式和分类重新统计壁纸数量以及操作日志数量，写入计数汇总表
+    接口只读取汇总结果，不再每页执行 COUNT(*)；流放/召回后的数量变化在下次同步时修正
+    Args:
+        conn: 数据库连接
+    Returns:
+        dict: {scope: total}
+    """
+    totals = defaultdict(int)
+    with conn.cursor() as cursor:
+        cursor.execute(SUMMARY_TABLE_SQL)
+        cursor.execute("""
+            SELECT w.category, IF(wes.status = 1, 'exiled_list', 'normal') AS display_mode, COUNT(*)
+            FROM wallpapers w
+            LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id
+            GROUP BY w.category, display_mode
+        """)
+        for category, display_mode, count in cursor.fetchall():
+            totals[f"wallpapers:{display_mode}:全部"] += count
+            if category:
+                totals[f"wallpapers:{display_mode}:{category}"] += count
+        for display_mode in ('normal', 'exiled_list'):
+            totals.setdefault(f"wallpapers:{display_mode}:全部", 0)
+        try:
+            cursor.execute("SELECT COUNT(*) FROM wallpaper_operation_log")
+            totals['operation_log'] = cursor.fetchone()[0]
+        except pymysql.err.ProgrammingError:
+            pass
+
+        # 整表替换在一个事务内完成，已不存在的分类一并清除
+        cursor.execute("DELETE FROM wallpaper_count_summary")
+        cursor.executemany(
+            "INSERT INTO wallpaper_count_summary (scope, total) VALUES (%s, %s)",
+            list(totals.items())
         )
-        """
-    values_to_insert = []
-    for w in new_wallpapers:
-        tags_str = ' '.join(w.get('tags', []))
-        created_at = w.get('created_at', datetime.now().strftime('%Y-%m-%d')) + ' 00:00:00'
-        updated_at = created_at # created_at 和 updated_at 初始值一致
-        values_to_insert.append((
-            w['id'],
-            w['name'],
-            w.get('description',''),
-            w['path'],
-            w['size'],
-            w['width'],
-            w['height'],
-            w['category'],
-            tags_str,
-            w['format'],
-            0, # views
-            0, # likes
-            created_at,
-            updated_at
-        ))
+    conn.commit()
+    return dict(totals)
+
+
+def sync(chunk_size=CHUNK_SIZE, delete=False, restart=False):
+    """
+    执行一次完整同步：list.json 分片与数据库按ID归并比对
+    Args:
+        chunk_size (int): 每块行数（同时也是数据库分页大小）
+        delete (bool): 是否删除 list.json 中已不存在的壁纸
+        restart (bool): 忽略断点从头开始
+    Returns:
+        dict: 统计信息
+    Raises:
+        ValueError: 分片索引不存在或已损坏
+    """
+    total = load_list_index().get('total', 0)
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'missing': 0, 'deleted': 0, 'protected': 0}
+    list_version = get_list_version()
+    checkpoint = load_checkpoint(None if restart else list_version)
+    checkpoint['list_version'] = list_version
+    if checkpoint['after_id'] is not None:
+        print(f"↩️ 从断点继续：已处理 {checkpoint['processed']} 条（ID ≤ {checkpoint['after_id']}）")
+    queued_ids = load_queued_ids()
+    grace_cutoff = datetime.now() - timedelta(hours=DELETE_GRACE_HOURS)
+    values, deletes, changed_ids = [], [], []
+    pending = 0
+
+    def handle_missing(db_row):
+        created_at = db_row.get('created_at')
+        if db_row['id'] in queued_ids or (isinstance(created_at, datetime) and created_at > grace_cutoff):
+            # 可能是刚上传、尚未发布到 list.json 的壁纸
+            stats['protected'] += 1
+            return
+        stats['missing'] += 1
+        if delete:
+            deletes.append(db_row['id'])
+            if len(deletes) >= chunk_size:
+                # list.json 中小于该ID的壁纸都已处理，可以作为断点
+                commit_chunk(db_row['id'])
+
+    def commit_chunk(last_id):
+        nonlocal pending
+        stats['deleted'] += flush_chunk(conn, values, deletes)
+        try:
+            build_search_index.update_search_index(conn, changed_ids + deletes)
+        except pymysql.MySQLError as e:
+            conn.rollback()
+            print(f"⚠️ 搜索索引增量更新失败: {e}（可运行 build_search_index.py 全量重建）")
+        del values[:]
+        del deletes[:]
+        del changed_ids[:]
+        pending = 0
+        checkpoint['after_id'] = last_id
+        save_checkpoint(checkpoint)
+
+    conn = get_connection()
     try:
-        cursor.executemany(sql, values_to_insert)
-        conn.commit()
-        print(f"✅ 新增壁纸已同步到数据库，共 {len(new_wallpapers)} 条。")
+        db_rows = iter_db_rows(conn, checkpoint['after_id'], chunk_size)
+        db_row = next(db_rows, None)
+        last_id = checkpoint['after_id']
+        for w in iter_list_wallpapers(checkpoint['after_id']):
+            row = to_row(w)
+            wid = int(row['id'])
+            if last_id is not None and wid <= last_id:
+                print(f"❌ 检测到重复ID: {w['id']}，请检查 list.json！")
+                print("同步中止：请先解决ID重复问题！")
+                conn.rollback()
+                return stats
+            while db_row is not None and db_row['id'] < wid:
+                handle_missing(db_row)
+                db_row = next(db_rows, None)
+            if db_row is not None and db_row['id'] == wid:
+                if row_changed(row, db_row):
+                    stats['updated'] += 1
+                    values.append(upsert_values(row))
+                    changed_ids.append(wid)
+                else:
+                    stats['unchanged'] += 1
+                db_row = next(db_rows, None)
+            else:
+                stats['inserted'] += 1
+                values.append(upsert_values(row))
+                changed_ids.append(wid)
+
+            last_id = wid
+            pending += 1
+            checkpoint['processed'] += 1
+            if pending >= chunk_size:
+                commit_chunk(last_id)
+                print(f"  已同步 {checkpoint['processed']}/{total} 条")
+
+        # 数据库中ID大于 list.json 最大ID的剩余行
+        while db_row is not None:
+            handle_missing(db_row)
+            db_row = next(db_rows, None)
+        commit_chunk(last_id)
+        checkpoint['done'] = True
+        save_checkpoint(checkpoint)
+
+        ensure_keyset_indexes(conn)
+        summary = refresh_count_summary(conn)
+        print(f"🧮 计数汇总已刷新: {len(summary)} 项")
     except Exception as e:
-        print(f"❌ 同步失败: {e}")
         conn.rollback()
+        print(f"❌ 同步失败: {e}（已提交的分块保留，再次运行将从断点继续）")
+        raise
+    finally:
+        conn.close()
+    return stats
 
-def check_duplicate_ids(wallpapers):
-    seen = set()
-    for w in wallpapers:
-        if str(w['id']) in seen:
-            print(f"❌ 检测到重复ID: {w['id']}，请检查 list.json！")
-            return True
-        seen.add(str(w['id']))
-    return False
 
 def main():
+    parser = argparse.ArgumentParser(description='同步 list.json 到 wallpapers 表')
+    parser.add_argument('-c', '--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f'每块处理的行数，每块单独提交 (默认: {CHUNK_SIZE})')
+    parser.add_argument('--delete', action='store_true',
+                        help='删除 list.json 中已不存在的壁纸（默认只统计）')
+    parser.add_argument('--restart', action='store_true', help='忽略断点，从头开始同步')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='只刷新计数汇总表（可定时执行），不同步壁纸数据')
+    args = parser.parse_args()
+
+    if args.summary_only:
+        conn = get_connection()
+        try:
+            summary = refresh_count_summary(conn)
+        finally:
+            conn.close()
+        print(f"🧮 计数汇总已刷新: {len(summary)} 项")
+        return
+
     print("--- 壁纸主表自动同步开始 ---")
-    wallpapers = get_list_wallpapers()
-    if check_duplicate_ids(wallpapers):
-        print("同步中止：请先解决ID重复问题！")
+    try:
+        stats = sync(chunk_size=max(1, args.chunk_size), delete=args.delete, restart=args.restart)
+    except ValueError as e:
+        print(f"❌ {e}")
         return
-    db_ids = get_db_wallpaper_ids()
-    list_ids = set(str(w['id']) for w in wallpapers)
-    # 新增图片
-    new_wallpapers = [w for w in wallpapers if str(w['id']) not in db_ids]
-    insert_new_wallpapers(new_wallpapers)
-    # 可选：检测已删除图片
-    deleted_ids = db_ids - list_ids
-    if deleted_ids:
-        print(f"⚠️ 数据库中有 {len(deleted_ids)} 条已删除图片（list.json 不存在），如需同步删除请手动确认：")
-        print(deleted_ids)
+    print(f"✅ 新增 {stats['inserted']} 条，更新 {stats['updated']} 条，未变化 {stats['unchanged']} 条")
+    if stats['missing']:
+        if args.delete:
+            print(f"🗑️ 已删除 {stats['deleted']} 条 list.json 中不存在的图片")
+        else:
+            print(f"⚠️ 数据库中有 {stats['missing']} 条已删除图片（list.json 不存在），"
+                  f"如需同步删除请使用 --delete 重新运行")
+    if stats['protected']:
+        print(f"🛡️ {stats['protected']} 条 list.json 中暂不存在的壁纸仍在上传队列中或入库不足 "
+              f"{DELETE_GRACE_HOURS} 小时，未计入删除")
     print("--- 同步结束 ---")
 
+
 if __name__ == '__main__':
     main()
-    cursor.close()
-    conn.close() 
\ No newline at end of file
@@ -1,9 +1,15 @@
 import os
 import json
+import argparse
 import time
+import hashlib
+import struct
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import pymysql
+import image_hash
 import json.decoder # 2024-07-15 新增：导入JSON解码器，用于捕获特定错误
 
 # 数据库配置
@@ -31,14 +37,220 @@ CATEGORY_TAGS = {
 # 支持的图片格式
 SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
 
-def get_image_dimensions(image_path):
-    """获取图片尺寸"""
+# 图片元数据缓存文件，按 (路径, 大小, 修改时间) 命中，避免重复打开图片
+META_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'image_meta_cache.json')
+
+# 写入数据库失败的占位信息 {壁纸ID: [主色调, 调色板, blurhash]}，下次同步时重试
+PLACEHOLDER_PENDING_PATH = os.path.join(os.path.dirname(__file__), 'instance', 'placeholder_sync_pending.json')
+
+# 读取图片元数据的线程数
+META_WORKERS = 8
+
+# list.json 分片：每个分片的壁纸条数，分片文件位于 static/data/list/list-0001.json ...
+LIST_SHARD_SIZE = 200
+LIST_SHARD_DIR_NAME = 'list'
+LIST_INDEX_NAME = 'list-index.json'
+
+# 紧凑JSON编码，去掉缩进和分隔符后的空格
+COMPACT_SEPARATORS = (',', ':')
+
+# 新增壁纸直接写入数据库，参数化批量插入，每批的行数
+INGEST_BATCH_SIZE = 500
+INSERT_WALLPAPER_SQL = """
+    INSERT INTO wallpapers (
+        id, user_id, title, description, file_path, file_size, width, height,
+        category, tags, format, views, likes, created_at, updated_at, phash
+    ) VALUES (
+        %s, NULL, %s, '', %s, %s, %s, %s,
+        %s, '', %s, 0, 0, %s, %s, %s
+    )
+"""
+
+# 64位感知哈希（dhash 的整数值）存入 wallpapers 表，字段不存在时自动添加并按 list.json 回填
+PHASH_COLUMN_DEFINITION = "BIGINT UNSIGNED NULL DEFAULT NULL COMMENT '64位感知哈希(dHash)'"
+
+# compress_wallpapers.py 生成的压缩版本清单和占位信息清单，按壁纸合并进列表数据
+VARIANTS_JSON_NAME = 'variants.json'
+PLACEHOLDERS_JSON_NAME = 'placeholders.json'
+
+# content_store.py 生成的内容寻址映射 {原图路径: 对象路径}，对象地址写入列表条目的 url 字段
+CONTENT_MAP_JSON_NAME = 'content_map.json'
+
+# 占位信息在列表条目中的字段，以及 wallpapers 表中对应的字段（不存在时自动添加）
+PLACEHOLDER_FIELDS = ('color', 'palette', 'blurhash')
+PLACEHOLDER_COLUMNS = (
+    ('dominant_color', "VARCHAR(7) NOT NULL DEFAULT '' COMMENT '主色调'"),
+    ('palette', "VARCHAR(64) NOT NULL DEFAULT '' COMMENT '调色板，逗号分隔'"),
+    ('blurhash', "VARCHAR(64) NOT NULL DEFAULT '' COMMENT '模糊占位图'")
+)
+
+# 预计算排序索引：static/data/indexes/<排序名>/all.bin 为全部壁纸，<分类名MD5>.bin 为各分类；
+# 文件内容为按顺序排列的小端 int64 壁纸ID，接口按偏移 fseek 读取一页，不必解析整个列表
+SORT_INDEX_DIR_NAME = 'indexes'
+SORT_INDEX_ALL_NAME = 'all'
+# 生成索引时的数据版本（最大壁纸ID、最大操作日志ID），接口据此判断索引是否落后于数据库
+SORT_INDEX_META_NAME = 'meta.json'
+SORT_ORDERS = {
+    'newest': lambda row: (row['created_at'] or datetime.min, row['id']),
+    'most_viewed': lambda row: (row['views'] or 0, row['id']),
+    'most_liked': lambda row: (row['likes'] or 0, row['id'])
+}
+
+# 随机排序：预先生成若干个固定的随机排列（random-0 ...），接口按会话种子选择排列并旋转起点，
+# 同一会话翻页顺序稳定且不重复；数量需与 api/wallpaper.php 中 RANDOM_INDEX_SLOTS 保持一致
+# 排列按 MD5("<排列号>-<壁纸ID>") 排序，与生成时间无关：重新生成后已有壁纸的相对顺序不变，
+# 新壁纸插入到固定位置，正在翻页的会话不会整体错乱；接口按同一规则二分查找旋转起点
+RANDOM_INDEX_SLOTS = 8
+
+_meta_cache = None
+_meta_cache_lock = threading.Lock()
+
+def format_file_size(size_bytes):
+    """把字节数格式化为 list.json 使用的大小字符串"""
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} KB"
+    return f"{size_bytes / (1024 * 1024):.2f} MB"
+
+def load_meta_cache():
+    """读取图片元数据缓存，只在首次调用时读盘"""
+    global _meta_cache
+    if _meta_cache is None:
+        _meta_cache = {}
+        if os.path.exists(META_CACHE_PATH):
+            try:
+                with open(META_CACHE_PATH, 'r', encoding='utf-8') as f:
+                    _meta_cache = json.load(f)
+            except Exception as e:
+                print(f"⚠️ 图片元数据缓存读取失败，将重新生成: {e}")
+                _meta_cache = {}
+    return _meta_cache
+
+def save_meta_cache():
+    """把图片元数据缓存写回磁盘"""
+    if _meta_cache is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(META_CACHE_PATH), exist_ok=True)
+        tmp_path = META_CACHE_PATH + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_meta_cache, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, META_CACHE_PATH)
+    except Exception as e:
+        print(f"⚠️ 图片元数据缓存写入失败: {e}")
+
+def get_image_metadata(image_path):
+    """
+    一次打开图片，只读取文件头获取元数据
+    Image.open 是惰性的，不调用 load() 就不会解码像素数据
+    @param {str} image_path - 图片路径
+    @returns {dict|None} - {width, height, format, mode, size_bytes}，文件不存在时返回None
+    """
+    try:
+        file_stat = os.stat(image_path)
+    except OSError:
+        return None
+
+    cache_key = os.path.abspath(image_path)
+    cache = load_meta_cache()
+    cached = cache.get(cache_key)
+    # 旧版缓存带 orientation 字段，宽高可能按EXIF方向交换过，需重新读取
+    if (cached and 'orientation' not in cached
+            and cached['size_bytes'] == file_stat.st_size and cached['mtime'] == file_stat.st_mtime):
+        return cached
+
+    meta = {
+        'width': 0,
+        'height': 0,
+        'format': '',
+        'mode': '',
+        'size_bytes': file_stat.st_size,
+        'mtime': file_stat.st_mtime
+    }
     try:
         with Image.open(image_path) as img:
-            return img.size  # 返回 (width, height)
+            # 与数据库、压缩脚本和前端一致，使用文件中存储的宽高
+            width, height = img.size
+            meta.update({
+                'width': width,
+                'height': height,
+                'format': img.format or '',
+                'mode': img.mode
+            })
     except Exception as e:
-        print(f"Warning: Cannot get dimensions for {image_path}: {e}")
+        print(f"Warning: Cannot read metadata for {image_path}: {e}")
+
+    with _meta_cache_lock:
+        cache[cache_key] = meta
+    return meta
+
+def probe_images(image_paths, max_workers=META_WORKERS):
+    """
+    使用线程池批量读取图片元数据
+    @param {list} image_paths - 图片路径列表
+    @returns {dict} - {image_path: metadata}
+    """
+    load_meta_cache()
+    unique_paths = list(dict.fromkeys(image_paths))
+    if not unique_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(unique_paths, executor.map(get_image_metadata, unique_paths)))
+
+def get_image_dhash(image_path):
+    """
+    获取图片的感知哈希（dHash），结果随元数据一起缓存，文件未变化时不再解码
+    @param {str} image_path - 图片路径
+    @returns {str|None} - 16位十六进制哈希，文件不存在或无法解码时返回None
+    """
+    meta = get_image_metadata(image_path)
+    if meta is None:
+        return None
+    if 'dhash' not in meta:
+        try:
+            value = image_hash.hash_to_hex(image_hash.file_dhash(image_path))
+        except Exception as e:
+            print(f"Warning: Cannot compute hash for {image_path}: {e}")
+            value = ''
+        with _meta_cache_lock:
+            meta['dhash'] = value
+    return meta['dhash'] or None
+
+def probe_hashes(image_paths, max_workers=META_WORKERS):
+    """
+    使用线程池批量计算图片感知哈希
+    @param {list} image_paths - 图片路径列表
+    @returns {dict} - {image_path: 十六进制哈希或None}
+    """
+    load_meta_cache()
+    unique_paths = list(dict.fromkeys(image_paths))
+    if not unique_paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(unique_paths, executor.map(get_image_dhash, unique_paths)))
+
+def attach_hashes(files, base_dir):
+    """
+    为列表条目写入 dhash 字段（首次运行时计算全部图片，之后命中缓存）
+    @param {list} files - 壁纸列表（原地修改）
+    @param {str} base_dir - 网站根目录
+    @returns {int} - dhash 有变化的条目数
+    """
+    hashes = probe_hashes([os.path.join(base_dir, item['path']) for item in files if item.get('path')])
+    changed = 0
+    for item in files:
+        value = hashes.get(os.path.join(base_dir, item['path'])) if item.get('path') else None
+        if value and item.get('dhash') != value:
+            item['dhash'] = value
+            changed += 1
+    return changed
+
+def get_image_dimensions(image_path):
+    """获取图片尺寸"""
+    meta = get_image_metadata(image_path)
+    if meta is None:
+        print(f"Warning: Cannot get dimensions for {image_path}: 文件不存在")
         return (0, 0)
+    return (meta['width'], meta['height'])  # 返回 (width, height)
 
 def analyze_filename(filename):
     """
@@ -82,12 +294,6 @@ def analyze_filename(filename):
         'tags': final_tags
     }
 
-def escape_sql_string(text):
-    """转义SQL字符串中的特殊字符"""
-    if text is None:
-        return ''
-    return text.replace("'", "\\'").replace('"', '\\"').replace('\\', '\\\\')
-
 def generate_unique_id(base_time, index, used_ids):
     """生成唯一的数字ID"""
     unique_id = int(f"{base_time}{index:04d}")
@@ -146,23 +352,22 @@ def get_all_wallpapers_from_db():
             SELECT id, title, file_path, category, tags, width, height, created_at
             FROM wallpapers
         """)
-        for row in cursor.fetchall():
-            file_path_full = os.path.join(os.path.dirname(__file__), row['file_path']) # Construct full path
-            width, height = (row['width'], row['height']) if row['width'] and row['height'] else get_image_dimensions(file_path_full)
+        rows = cursor.fetchall()
+        base_dir = os.path.dirname(__file__)
+        # 并行读取所有图片的元数据，每个文件只打开一次
+        metadata = probe_images([os.path.join(base_dir, row['file_path']) for row in rows])
+        for row in rows:
+            file_path_full = os.path.join(base_dir, row['file_path']) # Construct full path
+            meta = metadata.get(file_path_full)
+            if row['width'] and row['height']:
+                width, height = row['width'], row['height']
+            elif meta:
+                width, height = meta['width'], meta['height']
+            else:
+                width, height = (0, 0)
 
-            size_str = ''
-            img_format = ''
-            try:
-                if os.path.exists(file_path_full):
-                    size_bytes = os.path.getsize(file_path_full)
-                    if size_bytes < 1024 * 1024:
-                        size_str = f"{size_bytes / 1024:.1f} KB"
-                    else:
-                        size_str = f"{size_bytes / (1024 * 1024):.2f} MB"
-                    with Image.open(file_path_full) as img:
-                        img_format = img.format
-            except Exception as e:
-                print(f"Warning: Could not get size/format for {row['file_path']}: {e}")
+            size_str = format_file_size(meta['size_bytes']) if meta else ''
+            img_format = meta['format'] if meta else ''
 
             wallpapers_data.append({
                 'id': row['id'],
@@ -185,6 +390,436 @@ def get_all_wallpapers_from_db():
             conn.close()
     return wallpapers_data
 
+def random_order_key(slot, wallpaper_id):
+    """
+    随机排列的排序键，需与 api/wallpaper.php 中 randomOrderKey 一致
+    @param {int} slot - 排列编号
+    @param {int} wallpaper_id - 壁纸ID
+    @returns {str} - 32位十六进制MD5
+    """
+    return hashlib.md5(f"{slot}-{wallpaper_id}".encode('utf-8')).hexdigest()
+
+def write_sort_index_file(path, ids):
+    """
+    写入二进制排序索引（小端 int64 ID 序列），先写临时文件再替换
+    @param {str} path - 目标文件路径
+    @param {list} ids - 有序的壁纸ID
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack(f'<{len(ids)}q', *ids))
+    os.replace(tmp_path, path)
+
+def write_json_atomic(path, data):
+    """
+    先写临时文件再替换，避免前端读到写了一半的JSON
+    @param {str} path - 目标文件路径
+    @param {any} data - 要写入的数据
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+    os.replace(tmp_path, path)
+
+def ensure_phash_column(cursor, files):
+    """
+    确保 wallpapers 表有 phash 字段；首次添加时用 list.json 中已有的 dhash 回填
+    @param {Cursor} cursor - 数据库游标（与新增壁纸的插入处于同一事务之前）
+    @param {list} files - 完整的壁纸列表
+    """
+    cursor.execute("SHOW COLUMNS FROM wallpapers LIKE %s", ('phash',))
+    if cursor.fetchone():
+        return
+    cursor.execute(f"ALTER TABLE wallpapers ADD COLUMN `phash` {PHASH_COLUMN_DEFINITION}")
+    print("🧱 已为 wallpapers 添加 phash 字段")
+    rows = [
+        (image_hash.hex_to_hash(item['dhash']), item['id'])
+        for item in files if image_hash.hex_to_hash(item.get('dhash')) is not None
+    ]
+    for start in range(0, len(rows), INGEST_BATCH_SIZE):
+        cursor.executemany("UPDATE wallpapers SET phash = %s WHERE id = %s", rows[start:start + INGEST_BATCH_SIZE])
+    if rows:
+        print(f"🔑 已回填感知哈希: {len(rows)} 张壁纸")
+
+
+def commit_list_and_db(list_path, files, new_rows):
+    """
+    把新增壁纸写入数据库并更新list.json，两者一起生效或一起失败
+    顺序：写临时list.json -> 批量插入（未提交）-> 替换list.json -> 提交事务；
+    提交失败时回滚并还原旧的list.json，不会出现只有一边更新的情况
+    @param {str} list_path - list.json 路径
+    @param {list} files - 完整的壁纸列表
+    @param {list} new_rows - 新增壁纸的插入参数
+    @returns {bool} - 是否成功
+    """
+    if not new_rows:
+        write_json_atomic(list_path, files)
+        return True
+
+    tmp_path = list_path + '.tmp'
+    backup_path = list_path + '.bak'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(files, f, ensure_ascii=False, separators=COMPACT_SEPARATORS)
+
+    conn = None
+    had_old_list = os.path.exists(list_path)
+    swapped = False
+    try:
+        conn = pymysql.connect(
+            host=DB_CONFIG['host'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            database=DB_CONFIG['database'],
+            charset='utf8mb4',
+            autocommit=False
+        )
+        cursor = conn.cursor()
+        ensure_phash_column(cursor, files)
+        for start in range(0, len(new_rows), INGEST_BATCH_SIZE):
+            cursor.executemany(INSERT_WALLPAPER_SQL, new_rows[start:start + INGEST_BATCH_SIZE])
+
+        if had_old_list:
+            os.replace(list_path, backup_path)
+        swapped = True
+        os.replace(tmp_path, list_path)
+        conn.commit()
+    except Exception as e:
+        print(f"❌ 新增壁纸入库失败，已回滚，list.json 保持不变: {e}")
+        if conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        if swapped:
+            if had_old_list:
+                os.replace(backup_path, list_path)
+            elif os.path.exists(list_path):
+                os.remove(list_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+    if had_old_list and os.path.exists(backup_path):
+        os.remove(backup_path)
+    print(f"🗄️ 新增壁纸已写入数据库: {len(new_rows)} 条")
+    return True
+
+def write_list_shards(files, data_dir, shard_size=LIST_SHARD_SIZE):
+    """
+    按固定条数把壁纸列表拆分为分片文件，并生成分页索引
+    索引记录总数、各分类数量和每个分片的范围，首页只需加载索引和第一个分片
+    分片按ID升序写入，分片之间ID范围不重叠，sync_wallpapers_db.py 可逐个分片与数据库按ID归并比对
+    @param {list} files - 完整的壁纸列表
+    @param {str} data_dir - static/data 目录
+    @param {int} shard_size - 每个分片的条数
+    @returns {dict} - 写入的索引内容
+    """
+    shard_dir = os.path.join(data_dir, LIST_SHARD_DIR_NAME)
+    os.makedirs(shard_dir, exist_ok=True)
+
+    shards = []
+    categories = {}
+    files = sorted(files, key=lambda item: int(item['id']))
+    for start in range(0, len(files), shard_size):
+        chunk = files[start:start + shard_size]
+        shard_name = f"list-{len(shards) + 1:04d}.json"
+        write_json_atomic(os.path.join(shard_dir, shard_name), chunk)
+        shards.append({
+            'file': f"static/data/{LIST_SHARD_DIR_NAME}/{shard_name}",
+            'offset': start,
+            'count': len(chunk),
+            'first_id': chunk[0]['id'],
+            'last_id': chunk[-1]['id']
+        })
+        for item in chunk:
+            category = item.get('category') or '其他'
+            categories[category] = categories.get(category, 0) + 1
+
+    # 删除上次生成但本次已不需要的多余分片
+    valid_names = set(os.path.basename(shard['file']) for shard in shards)
+    for name in os.listdir(shard_dir):
+        if name.startswith('list-') and name.endswith('.json') and name not in valid_names:
+            os.remove(os.path.join(shard_dir, name))
+
+    index = {
+        'version': datetime.now().strftime('%Y%m%d%H%M%S'),
+        'total': len(files),
+        'shard_size': shard_size,
+        'categories': categories,
+        'shards': shards
+    }
+    write_json_atomic(os.path.join(data_dir, LIST_INDEX_NAME), index)
+    print(f"🧩 list.json分片已更新: {len(shards)} 个分片，每片 {shard_size} 条")
+    return index
+
+def load_variant_manifest(data_dir, name=VARIANTS_JSON_NAME):
+    """
+    读取 compress_wallpapers.py 生成的清单
+    @param {str} data_dir - static/data 目录
+    @param {str} name - 清单文件名，默认压缩版本清单；占位信息清单为 PLACEHOLDERS_JSON_NAME，内容寻址映射为 CONTENT_MAP_JSON_NAME
+    @returns {dict} - {原图路径: {压缩类型: {格式: {url, width, height, bytes}}}}、{原图路径: 占位信息} 或 {原图路径: 对象路径}，不存在时为空
+    """
+    manifest_path = os.path.join(data_dir, name)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 读取 {name} 失败，列表中不包含其中的信息: {e}")
+        return {}
+
+def attach_object_urls(files, content_map):
+    """
+    把内容寻址存储中的原图地址写入列表条目的 url 字段（path 保持上传时的路径不变，仍作为数据库关联键）
+    对象地址只由内容决定，前端引用原图时优先使用 url，可被浏览器和CDN永久缓存
+    @param {list} files - 壁纸列表（原地修改）
+    @param {dict} content_map - 内容寻址映射
+    @returns {int} - url 有变化的条目数
+    """
+    changed = 0
+    for item in files:
+        url = content_map.get(item.get('path', ''))
+        if url:
+            if item.get('url') != url:
+                item['url'] = url
+                changed += 1
+        elif 'url' in item:
+            del item['url']
+            changed += 1
+    return changed
+
+def lookup_manifest(manifest, item):
+    """
+    按壁纸查找清单条目：内容寻址布局下清单以对象路径为键，否则以原图路径为键
+    @param {dict} manifest - 压缩版本或占位信息清单
+    @param {dict} item - 列表条目
+    @returns {dict|None} - 清单条目
+    """
+    return manifest.get(item.get('url') or '') or manifest.get(item.get('path', ''))
+
+def attach_variants(files, manifest):
+    """
+    把每张壁纸可用的压缩版本（各格式的地址、宽高、字节数）写入列表条目的 variants 字段
+    前端据此直接选图并生成srcset，不再逐张探测压缩图是否存在
+    @param {list} files - 壁纸列表（原地修改）
+    @param {dict} manifest - 压缩版本清单
+    @returns {int} - variants 有变化的条目数
+    """
+    changed = 0
+    for item in files:
+        variants = lookup_manifest(manifest, item)
+        if variants:
+            if item.get('variants') != variants:
+                item['variants'] = variants
+                changed += 1
+        elif 'variants' in item:
+            del item['variants']
+            changed += 1
+    return changed
+
+def attach_placeholders(files, placeholders):
+    """
+    把主色调、调色板和blurhash写入列表条目（color / palette / blurhash 字段），前端据此在图片下载前绘制占位
+    @param {list} files - 壁纸列表（原地修改）
+    @param {dict} placeholders - 占位信息清单
+    @returns {list} - 占位信息有变化的条目
+    """
+    changed = []
+    for item in files:
+        placeholder = lookup_manifest(placeholders, item)
+        if not placeholder:
+            continue
+        if any(item.get(field) != placeholder.get(field) for field in PLACEHOLDER_FIELDS):
+            for field in PLACEHOLDER_FIELDS:
+                item[field] = placeholder.get(field)
+            changed.append(item)
+    return changed
+
+def load_pending_placeholders():
+    """
+    读取上次写入数据库失败的占位信息
+    @returns {dict} - {壁纸ID字符串: [主色调, 调色板, blurhash]}
+    """
+    if not os.path.exists(PLACEHOLDER_PENDING_PATH):
+        return {}
+    try:
+        with open(PLACEHOLDER_PENDING_PATH, 'r', encoding='utf-8') as f:
+            pending = json.load(f)
+    except (OSError, json.decoder.JSONDecodeError) as e:
+        print(f"⚠️ 读取待重试的占位信息失败: {e}")
+        return {}
+    return pending if isinstance(pending, dict) else {}
+
+def save_pending_placeholders(pending):
+    """
+    保存待重试的占位信息，为空时删除文件
+    @param {dict} pending - {壁纸ID字符串: [主色调, 调色板, blurhash]}
+    """
+    if not pending:
+        if os.path.exists(PLACEHOLDER_PENDING_PATH):
+            os.remove(PLACEHOLDER_PENDING_PATH)
+        return
+    os.makedirs(os.path.dirname(PLACEHOLDER_PENDING_PATH), exist_ok=True)
+    write_json_atomic(PLACEHOLDER_PENDING_PATH, pending)
+
+def sync_placeholders_to_db(items):
+    """
+    把占位信息写入 wallpapers 表（dominant_color / palette / blurhash），字段不存在时先添加
+    list.json 写入后不会再报告同一条目有变化，因此写库失败的条目先记录到 PLACEHOLDER_PENDING_PATH，
+    每次调用时与上次失败的条目一起重试，成功后才清除
+    @param {list} items - 占位信息有变化的条目
+    @returns {bool} - 是否成功
+    """
+    pending = load_pending_placeholders()
+    for item in items:
+        pending[str(item['id'])] = [item['color'] or '', ','.join(item['palette'] or []), item['blurhash'] or '']
+    if not pending:
+        return True
+    save_pending_placeholders(pending)
+    rows = [(color, palette, blurhash, int(wallpaper_id))
+            for wallpaper_id, (color, palette, blurhash) in pending.items()]
+    conn = None
+    try:
+        conn = pymysql.connect(
+            host=DB_CONFIG['host'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            database=DB_CONFIG['database'],
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor()
+        for column, definition in PLACEHOLDER_COLUMNS:
+            cursor.execute("SHOW COLUMNS FROM wallpapers LIKE %s", (column,))
+            if not cursor.fetchone():
+                cursor.execute(f"ALTER TABLE wallpapers ADD COLUMN `{column}` {definition}")
+                print(f"🧱 已为 wallpapers 添加 {column} 字段")
+        for start in range(0, len(rows), INGEST_BATCH_SIZE):
+            cursor.executemany(
+                "UPDATE wallpapers SET dominant_color = %s, palette = %s, blurhash = %s WHERE id = %s",
+                rows[start:start + INGEST_BATCH_SIZE]
+            )
+        conn.commit()
+    except Exception as e:
+        print(f"❌ 占位信息写入数据库失败，{len(rows)} 条已记录，下次运行时重试: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+    save_pending_placeholders({})
+    print(f"🎨 占位信息已写入数据库: {len(rows)} 条")
+    return True
+
+def upsert_list_entries(entries, data_dir):
+    """
+    把已入库的壁纸条目合并进list.json（按ID覆盖或追加），并重新挂载内容寻址地址、压缩版本和占位信息，重写分片和感知哈希索引
+    供 derivative_worker.py 在上传壁纸的压缩版本生成后调用，无需整目录重新扫描
+    @param {list} entries - 壁纸条目，字段与list.json一致（必须包含 id）
+    @param {str} data_dir - static/data 目录
+    @returns {int} - 当前壁纸总数
+    """
+    list_path = os.path.join(data_dir, 'list.json')
+    files = []
+    if os.path.exists(list_path):
+        with open(list_path, 'r', encoding='utf-8') as f:
+            files = json.load(f)
+        if not isinstance(files, list):
+            raise ValueError(f"{list_path} 不是有效的JSON数组")
+
+    positions = {int(item['id']): index for index, item in enumerate(files)}
+    for entry in entries:
+        index = positions.get(int(entry['id']))
+        if index is None:
+            positions[int(entry['id'])] = len(files)
+            files.append(entry)
+        else:
+            files[index] = dict(files[index], **entry)
+
+    attach_object_urls(files, load_variant_manifest(data_dir, CONTENT_MAP_JSON_NAME))
+    attach_variants(files, load_variant_manifest(data_dir))
+    placeholder_changes = attach_placeholders(files, load_variant_manifest(data_dir, PLACEHOLDERS_JSON_NAME))
+    # 先写数据库再替换list.json
+    sync_placeholders_to_db(placeholder_changes)
+    write_json_atomic(list_path, files)
+    write_list_shards(files, data_dir)
+    image_hash.write_hash_index(files)
+    return len(files)
+
+def write_sort_indexes(data_dir):
+    """
+    从 wallpapers 表预计算各分类、各排序方式的有序ID列表
+    只收录未被流放的壁纸；一次全表扫描后在内存中分别排序，
+    接口翻页时直接按偏移截取ID，不必每次请求重新排序整个目录
+    同时记录生成时的最大壁纸ID和最大操作日志ID（先于全表扫描读取），之后新增、流放或召回的壁纸
+    会让接口判定索引已过期并回退到SQL查询，直到下次重新生成
+    @param {str} data_dir - static/data 目录
+    @returns {bool} - 是否成功
+    """
+    conn = None
+    try:
+        conn = pymysql.connect(
+            host=DB_CONFIG['host'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            database=DB_CONFIG['database'],
+            charset='utf8mb4'
+        )
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM wallpapers")
+        meta = {'max_wallpaper_id': int(cursor.fetchone()['max_id'])}
+        try:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS max_id FROM wallpaper_operation_log")
+            meta['max_log_id'] = int(cursor.fetchone()['max_id'])
+        except pymysql.err.ProgrammingError:
+            meta['max_log_id'] = 0
+        cursor.execute("""
+            SELECT w.id, w.category, w.created_at, w.views, w.likes
+            FROM wallpapers w
+            LEFT JOIN wallpaper_exile_status wes ON w.id = wes.wallpaper_id
+            WHERE wes.status = 0 OR wes.wallpaper_id IS NULL
+        """)
+        rows = cursor.fetchall()
+    except Exception as e:
+        print(f"❌ 排序索引生成失败，数据库查询出错: {e}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+    index_dir = os.path.join(data_dir, SORT_INDEX_DIR_NAME)
+    orders = [(sort_name, sorted(rows, key=sort_key, reverse=True))
+              for sort_name, sort_key in SORT_ORDERS.items()]
+    for slot in range(RANDOM_INDEX_SLOTS):
+        orders.append((f"random-{slot}", sorted(rows, key=lambda row: random_order_key(slot, row['id']))))
+
+    for sort_name, ordered in orders:
+        sort_dir = os.path.join(index_dir, sort_name)
+        os.makedirs(sort_dir, exist_ok=True)
+        by_category = {}
+        for row in ordered:
+            by_category.setdefault(row['category'] or '其他', []).append(int(row['id']))
+        files = {SORT_INDEX_ALL_NAME: [int(row['id']) for row in ordered]}
+        for category, ids in by_category.items():
+            files[hashlib.md5(category.encode('utf-8')).hexdigest()] = ids
+        for name, ids in files.items():
+            write_sort_index_file(os.path.join(sort_dir, f"{name}.bin"), ids)
+        # 删除已不存在的分类
+        for name in os.listdir(sort_dir):
+            if name.endswith('.bin') and name[:-4] not in files:
+                os.remove(os.path.join(sort_dir, name))
+        # 旧版JSON格式的索引
+        legacy_path = os.path.join(index_dir, f"{sort_name}.json")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+    meta['version'] = datetime.now().strftime('%Y%m%d%H%M%S')
+    write_json_atomic(os.path.join(index_dir, SORT_INDEX_META_NAME), meta)
+    print(f"🗂️ 排序索引已更新: {', '.join(SORT_ORDERS)} 及 {RANDOM_INDEX_SLOTS} 个随机排列 ({len(rows)} 张壁纸)")
+    return True
+
 def generate_short_id(date_str, seq):
     """
     生成短ID，格式为YYYYMMDD+递增号（如202507151、20250715100），递增号不做位数限制
@@ -194,15 +829,16 @@ def generate_short_id(date_str, seq):
     """
     return int(f"{date_str}{seq}")
 
-def update_wallpaper_list():
+def update_wallpaper_list(allow_duplicates=None):
     """
     增量更新壁纸列表，只为新图片分配新ID并导入，老图片ID不变
+    @param {bool|set|None} allow_duplicates - 疑似重复的新图如何处理：None 跳过并写入重复报告，
+        True 全部照常入库，文件名集合则只放行其中的文件（确认不是重复后使用）
     """
     # 路径配置
     base_dir = os.path.dirname(__file__)
     wallpapers_dir = os.path.join(base_dir, 'static', 'wallpapers')
     list_path = os.path.join(base_dir, 'static', 'data', 'list.json')
-    sql_path = os.path.join(base_dir, 'wallpapers_import.sql')
 
     # 读取数据库已存在壁纸
     db_wallpapers = get_existing_wallpapers_from_db()  # {filename: id}
@@ -251,7 +887,8 @@ def update_wallpaper_list():
     print(f"✨ 新增图片: {len(new_files)} 个")
 
     files = []
-    sql_values = []
+    new_rows = []
+    duplicates = {}
 
     if should_regenerate_full_list or new_files:
         if should_regenerate_full_list:
@@ -270,20 +907,36 @@ def update_wallpaper_list():
         if existing_today_ids:
             seq = max(existing_today_ids) + 1
 
+        # 并行读取新增图片的元数据，每个文件只打开一次
+        new_metadata = probe_images([os.path.join(wallpapers_dir, f) for f in new_files])
+
+        # 感知哈希去重：与已有壁纸（或本批更早的新图）重复的新图默认不入库、不压缩，
+        # 确认无误后可用 --allow-duplicates 放行
+        attach_hashes(files, base_dir)
+        hash_index = image_hash.build_index(files)
+        filenames_by_id = {item['id']: item['filename'] for item in files}
+        new_hashes = probe_hashes([os.path.join(wallpapers_dir, f) for f in new_files])
+
         for filename in new_files:
             file_path = os.path.join(wallpapers_dir, filename)
+            dhash = new_hashes.get(file_path)
+            hash_value = image_hash.hex_to_hash(dhash)
+            matches = hash_index.query(hash_value) if hash_value is not None else []
+            if matches:
+                original_id, distance = matches[0]
+                original_name = filenames_by_id.get(original_id)
+                if allow_duplicates is True or (allow_duplicates and filename in allow_duplicates):
+                    print(f"⚠️ 疑似重复但已放行: {filename} ≈ {original_name} (汉明距离 {distance})")
+                else:
+                    duplicates[filename] = {'duplicate_of': original_name, 'distance': distance}
+                    print(f"♻️ 跳过重复图片: {filename} ≈ {original_name} (汉明距离 {distance})")
+                    continue
+
             name_without_ext = os.path.splitext(filename)[0]
-            width, height = get_image_dimensions(file_path)
-            size_bytes = os.path.getsize(file_path)
-            if size_bytes < 1024 * 1024:
-                size_str = f"{size_bytes / 1024:.1f} KB"
-            else:
-                size_str = f"{size_bytes / (1024 * 1024):.2f} MB"
-            try:
-                with Image.open(file_path) as img:
-                    img_format = img.format
-            except Exception as e:
-                img_format = ''
+            meta = new_metadata[file_path] or {'width': 0, 'height': 0, 'format': '', 'size_bytes': 0}
+            width, height = meta['width'], meta['height']
+            size_str = format_file_size(meta['size_bytes'])
+            img_format = meta['format']
             
             analyzed_info = analyze_filename(filename)
             category = analyzed_info['category']
@@ -305,49 +958,86 @@ def update_wallpaper_list():
                 'description': '',
                 'created_at': datetime.now().strftime('%Y-%m-%d')
             }
+            if dhash:
+                file_info['dhash'] = dhash
+                hash_index.add(new_id, hash_value)
+                filenames_by_id[new_id] = filename
             files.append(file_info)
-            tags_string = ','.join(tags_list)
-            sql_value = (
-                f"  ({new_id}, NULL, '{escape_sql_string(name_without_ext)}', '', '{escape_sql_string(f'static/wallpapers/{filename}')}', '{escape_sql_string(size_str)}', "
-                f"{width}, {height}, '{escape_sql_string(category)}', '', '{escape_sql_string(img_format)}', "
-                f"0, 0, '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}', '{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}')"
-            )
-            sql_values.append(sql_value)
+            now_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            new_rows.append((
+                new_id, name_without_ext, f'static/wallpapers/{filename}', size_str,
+                width, height, category, img_format, now_str, now_str, hash_value
+            ))
             print(f"✅ 新增: {filename} -> ID: {new_id}")
 
-        with open(list_path, 'w', encoding='utf-8') as f:
-            json.dump(files, f, ensure_ascii=False, indent=2)
-        print(f"\n📄 list.json已更新: {os.path.abspath(list_path)}")
+        attach_object_urls(files, load_variant_manifest(os.path.dirname(list_path), CONTENT_MAP_JSON_NAME))
+        attach_variants(files, load_variant_manifest(os.path.dirname(list_path)))
+        placeholder_changes = attach_placeholders(
+            files, load_variant_manifest(os.path.dirname(list_path), PLACEHOLDERS_JSON_NAME))
 
-        if sql_values:
-            sql_content = [
-                f"-- 新增壁纸数据导入SQL文件\n",
-                f"-- 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
-                f"-- 数据库: {DB_CONFIG['database']}\n",
-                f"-- 新增 {len(sql_values)} 条记录\n\n",
-                f"USE `{DB_CONFIG['database']}`;\n\n",
-                "INSERT INTO `wallpapers` (`id`, `user_id`, `title`, `description`, `file_path`, `file_size`, `width`, `height`, `category`, `tags`, `format`, `views`, `likes`, `created_at`, `updated_at`) VALUES\n"
-            ]
-            for i, sql_value in enumerate(sql_values):
-                sql_content.append(sql_value)
-                if i < len(sql_values) - 1:
-                    sql_content.append(",\n")
-                else:
-                    sql_content.append(";\n")
-            with open(sql_path, 'w', encoding='utf-8') as f:
-                f.writelines(sql_content)
-            print(f"\n🎉 新增图片SQL已生成: {os.path.abspath(sql_path)}")
-        else:
-            print("无新增图片，无需生成SQL文件")
+        # list.json 与数据库同时生效，新图片无需再手动导入SQL
+        if not commit_list_and_db(list_path, files, new_rows):
+            return False
+        print(f"\n📄 list.json已更新: {os.path.abspath(list_path)}")
+        write_list_shards(files, os.path.dirname(list_path))
+        # 新壁纸的行在上一步才插入，占位信息只能随后写入；失败的条目会记录下来在下次运行时重试
+        sync_placeholders_to_db(placeholder_changes)
     else:
-        print("ℹ️ 无需更新list.json，文件已最新且无新增图片。")
+        files = old_files
+        # 内容寻址映射/压缩版本/占位信息有变化（如刚运行过 content_store.py、compress_wallpapers.py）
+        # 或首次补算感知哈希时只需重写列表文件
+        urls_changed = attach_object_urls(
+            files, load_variant_manifest(os.path.dirname(list_path), CONTENT_MAP_JSON_NAME))
+        variants_changed = attach_variants(files, load_variant_manifest(os.path.dirname(list_path)))
+        placeholder_changes = attach_placeholders(
+            files, load_variant_manifest(os.path.dirname(list_path), PLACEHOLDERS_JSON_NAME))
+        hashes_changed = attach_hashes(files, base_dir)
+        if urls_changed or variants_changed or placeholder_changes or hashes_changed:
+            # 先写数据库再替换list.json
+            sync_placeholders_to_db(placeholder_changes)
+            write_json_atomic(list_path, files)
+            write_list_shards(files, os.path.dirname(list_path))
+            if urls_changed:
+                print(f"🗺️ 内容寻址地址已更新: {urls_changed} 张壁纸")
+            if variants_changed:
+                print(f"🖼️ 压缩版本信息已更新: {variants_changed} 张壁纸")
+            if hashes_changed:
+                print(f"🔑 感知哈希已更新: {hashes_changed} 张壁纸")
+        else:
+            print("ℹ️ 无需更新list.json，文件已最新且无新增图片。")
+            # 重试上次写入数据库失败的占位信息
+            sync_placeholders_to_db([])
+            # 分片索引缺失时（如首次升级）根据现有list.json补生成
+            if not os.path.exists(os.path.join(os.path.dirname(list_path), LIST_INDEX_NAME)):
+                write_list_shards(files, os.path.dirname(list_path))
+
+    # 上传接口据此拒绝重复图片，compress_wallpapers.py 据此跳过被判为重复的文件
+    hashed = image_hash.write_hash_index(files)
+    image_hash.write_duplicates_report(duplicates)
+    print(f"🔑 感知哈希索引已更新: {hashed} 张壁纸，跳过重复图片 {len(duplicates)} 张")
+    if duplicates:
+        print(f"ℹ️ 重复图片列表见 {image_hash.DUPLICATES_PATH}，确认不是重复可运行 "
+              f"python update_list.py --allow-duplicates <文件名...> 放行（不带文件名则全部放行）")
 
+    # 浏览量、点赞数每次运行都可能变化，排序索引总是重新生成
+    write_sort_indexes(os.path.dirname(list_path))
+
+    save_meta_cache()
     print(f"\n📊 当前壁纸总数: {len(files)}")
     return True
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='更新壁纸列表并把新增图片写入数据库')
+    parser.add_argument('--allow-duplicates', nargs='*', metavar='FILE', default=None,
+                        help='放行疑似重复的新图：指定文件名只放行这些文件，不带文件名则全部放行')
+    args = parser.parse_args()
+    if args.allow_duplicates is None:
+        allow_duplicates = None
+    else:
+        allow_duplicates = set(args.allow_duplicates) or True
+
     print("🚀 开始更新壁纸列表...")
-    success = update_wallpaper_list()
+    success = update_wallpaper_list(allow_duplicates)
     if success:
         print("\n✨ 所有操作完成！")
     else: